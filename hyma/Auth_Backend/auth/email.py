@@ -1,6 +1,9 @@
 import resend
 import os
 
+from metrics import email_dispatch
+from tracing import traced
+
 # Resend API Key (set in Render ENV)
 resend.api_key = os.getenv("RESEND_API_KEY")
 
@@ -8,6 +11,7 @@ resend.api_key = os.getenv("RESEND_API_KEY")
 FROM_EMAIL = "onboarding@resend.dev"
 
 
+@traced("email.send_magic_link")
 def send_magic_link(email: str, link: str, purpose: str):
     """
     Sends magic link email via Resend (HTTP-based, Render-safe)
@@ -54,9 +58,10 @@ def send_magic_link(email: str, link: str, purpose: str):
     </div>
     """
 
-    resend.Emails.send({
-        "from": FROM_EMAIL,
-        "to": email,
-        "subject": subject,
-        "html": html
-    })
+    with email_dispatch(purpose):
+        resend.Emails.send({
+            "from": FROM_EMAIL,
+            "to": email,
+            "subject": subject,
+            "html": html
+        })
@@ -2,6 +2,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
+try:
+    from .metrics import instrument_engine as measure_engine
+    from .tracing import instrument_engine
+except ImportError:
+    from metrics import instrument_engine as measure_engine
+    from tracing import instrument_engine
+
 # --------------------------------------------------
 # DATABASE CONFIG
 # --------------------------------------------------
@@ -11,6 +18,8 @@ engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False}
 )
+instrument_engine(engine)
+measure_engine(engine)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -31,9 +40,9 @@ def init_db():
     try:
         # Try relative import first (for Streamlit), fall back to direct import (for FastAPI)
         try:
-            from .models import User, ContentHistory
+            from .models import User, ContentHistory, ContentVariants
         except ImportError:
-            from models import User, ContentHistory
+            from models import User, ContentHistory, ContentVariants
         
         # Create all tables
         Base.metadata.create_all(bind=engine)
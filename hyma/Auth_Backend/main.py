@@ -1,6 +1,9 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from database import Base, engine
+from metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
 from routes.auth import router
+from tracing import TracingMiddleware, configure
 
 # --------------------------------------------------
 # DATABASE INITIALIZATION
@@ -15,6 +18,17 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# --------------------------------------------------
+# TRACING (TRACING_EXPORTER / TRACING_SAMPLE_RATE)
+# --------------------------------------------------
+configure(service="auth-backend")
+app.add_middleware(TracingMiddleware)
+
+# --------------------------------------------------
+# METRICS (outermost, so it also times the tracing middleware)
+# --------------------------------------------------
+app.add_middleware(MetricsMiddleware)
+
 # --------------------------------------------------
 # ROUTES
 # --------------------------------------------------
@@ -26,3 +40,10 @@ app.include_router(router)
 @app.get("/")
 def health_check():
     return {"status": "ok"}
+
+# --------------------------------------------------
+# METRICS ENDPOINT (Prometheus text format)
+# --------------------------------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
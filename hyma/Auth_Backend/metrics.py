@@ -0,0 +1,265 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# Seconds. Requests that only touch SQLite land in the low buckets; requests
+# that send a magic link land wherever the email provider puts them.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Requests that match no route are counted under one label, so probes of
+# random paths cannot grow the series count without bound.
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --------------------------------------------------
+# METRICS
+# --------------------------------------------------
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items: list) -> list:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. observe() is one bisect and a few integer adds
+    under a lock; cumulative bucket counts are only worked out on render().
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, items: list) -> list:
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# --------------------------------------------------
+# BACKEND METRICS
+# --------------------------------------------------
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "auth_http_requests_total", "HTTP requests by route template, method and status code.",
+    ("method", "route", "status"),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "auth_http_request_duration_seconds", "HTTP request latency by route template and method.",
+    ("method", "route"),
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "auth_http_requests_in_flight", "HTTP requests currently being handled.",
+))
+DB_SESSIONS = REGISTRY.register(Counter(
+    "auth_db_sessions_total", "Database sessions opened.",
+))
+DB_SESSIONS_OPEN = REGISTRY.register(Gauge(
+    "auth_db_sessions_open", "Database sessions currently open.",
+))
+DB_CONNECTIONS_IN_USE = REGISTRY.register(Gauge(
+    "auth_db_connections_in_use", "Pooled database connections currently checked out.",
+))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "auth_db_query_duration_seconds", "Database statement latency.",
+    buckets=QUERY_BUCKETS,
+))
+EMAIL_SECONDS = REGISTRY.register(Histogram(
+    "auth_email_dispatch_duration_seconds", "Time spent sending a magic link email, by purpose and outcome.",
+    ("purpose", "outcome"),
+))
+
+
+@contextmanager
+def db_session_opened():
+    """Count a database session for as long as the block runs"""
+    DB_SESSIONS.inc()
+    DB_SESSIONS_OPEN.inc()
+    try:
+        yield
+    finally:
+        DB_SESSIONS_OPEN.dec()
+
+
+@contextmanager
+def email_dispatch(purpose: str):
+    """Time an email send, labelled ok or error"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EMAIL_SECONDS.observe(time.perf_counter() - started, purpose=purpose, outcome=outcome)
+
+
+# --------------------------------------------------
+# SQLALCHEMY
+# --------------------------------------------------
+def instrument_engine(engine):
+    """Connections in use and per-statement latency for an engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_CONNECTIONS_IN_USE.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        DB_CONNECTIONS_IN_USE.dec()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_SECONDS.observe(time.perf_counter() - context._metrics_started)
+
+    return engine
+
+
+# --------------------------------------------------
+# ASGI
+# --------------------------------------------------
+class MetricsMiddleware:
+    """Latency, status and in-flight counts per route template (/verify, not /verify?token=...)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # What the client sees if the app raises before responding
+
+        async def send_observed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_observed)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=str(status))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, LargeBinary, ForeignKey, Index
 from datetime import datetime
 
 # Try relative import first (for Streamlit), fall back to direct import (for FastAPI)
@@ -17,6 +17,11 @@ class User(Base):
 
 class ContentHistory(Base):
     __tablename__ = "content_history"
+    # Keyset pagination of a user's history: filter on user_email, newest
+    # first by created_at with id breaking ties, all from the index
+    __table_args__ = (
+        Index("ix_content_history_user_created_id", "user_email", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_email = Column(String, index=True)
@@ -28,3 +33,12 @@ class ContentHistory(Base):
     word_limit = Column(Integer)
     generated_content = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class ContentVariants(Base):
+    __tablename__ = "content_variants"
+    
+    # All variants of one generation live under its single history row;
+    # generated_content there holds the selected variant
+    history_id = Column(Integer, ForeignKey("content_history.id"), primary_key=True)
+    selected = Column(Integer, default=0)
+    data = Column(LargeBinary)  # zlib-compressed JSON list of {"content", "score"}, best first
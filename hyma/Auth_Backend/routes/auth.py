@@ -9,6 +9,7 @@ from models import User
 from auth.magic_link import create_magic_token, verify_magic_token
 from auth.jwt import create_jwt
 from auth.email import send_magic_link
+from metrics import db_session_opened
 
 router = APIRouter()
 
@@ -25,11 +26,12 @@ if not APP_URL or not FRONTEND_URL:
 # DATABASE DEPENDENCY
 # --------------------------------------------------
 def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    with db_session_opened():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
 
 # --------------------------------------------------
 # REGISTER
@@ -0,0 +1,466 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+# TRACING_EXPORTER: "" (off), "jsonl:<path>" or "otlp:<collector url>"
+# TRACING_SAMPLE_RATE: share of new traces kept; spans follow their trace's decision
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_QUEUE = 5000
+
+TRACEPARENT = "traceparent"
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+# --------------------------------------------------
+# SPAN CONTEXT (W3C traceparent)
+# --------------------------------------------------
+class SpanContext:
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: str):
+    """SpanContext from a traceparent header, or None if it is missing or malformed"""
+    try:
+        version, trace_id, span_id, flags = value.strip().split("-")
+        int(trace_id, 16), int(span_id, 16)
+        if len(trace_id) != 32 or len(span_id) != 16 or version == "ff":
+            return None
+        return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+# --------------------------------------------------
+# SPANS
+# --------------------------------------------------
+class Span:
+    """
+    One timed operation. Spans of unsampled traces still carry ids, so the
+    sampling decision travels with them to child spans and other services,
+    but they are never exported.
+    """
+
+    __slots__ = ("tracer", "name", "context", "parent_id", "attributes", "status", "start_ns", "end_ns")
+
+    def __init__(self, tracer, name: str, context: SpanContext, parent_id: str, attributes: dict, start_ns: int = None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+
+    @property
+    def ended(self) -> bool:
+        return self.end_ns is not None
+
+    def set(self, **attributes):
+        if self.context.sampled:
+            self.attributes.update(attributes)
+
+    def error(self, exc: BaseException):
+        self.status = "error"
+        self.set(**{"error.type": type(exc).__name__, "error.message": str(exc)[:300]})
+
+    def end(self, end_ns: int = None, **attributes):
+        if self.ended:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.set(**attributes)
+        if self.context.sampled:
+            self.tracer._export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.tracer.service,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# --------------------------------------------------
+# EXPORTERS
+# --------------------------------------------------
+class JsonlExporter:
+    """One JSON object per span, appended to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON to a collector, e.g. http://localhost:4318 (the /v1/traces path is added if missing)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        endpoint = endpoint.rstrip("/")
+        self.endpoint = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.timeout = timeout
+
+    def _span(self, span: Span) -> dict:
+        otlp = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2 if span.status == "error" else 1},
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+    def export(self, spans: list):
+        by_service = {}
+        for span in spans:
+            by_service.setdefault(span.tracer.service, []).append(self._span(span))
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+                    "scopeSpans": [{"scope": {"name": "content-studio.tracing"}, "spans": otlp_spans}],
+                }
+                for service, otlp_spans in by_service.items()
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        urllib.request.urlopen(request, timeout=self.timeout).close()
+
+
+def exporter_from(spec: str):
+    """Exporter for a TRACING_EXPORTER value; None means tracing is off"""
+    spec = (spec or "").strip()
+    if not spec or spec == "none":
+        return None
+    kind, _, target = spec.partition(":")
+    if kind == "jsonl":
+        return JsonlExporter(target or "traces.jsonl")
+    if kind == "otlp":
+        return OtlpHttpExporter(target or "http://localhost:4318")
+    raise ValueError(f"unknown TRACING_EXPORTER {spec!r}")
+
+
+# --------------------------------------------------
+# TRACER
+# --------------------------------------------------
+class Tracer:
+    """
+    Head-sampled tracing with a background exporter.
+
+    A new trace is kept with probability sample_rate; every span in it, here
+    or in a service it calls with inject()'s headers, follows that decision.
+    Ended spans are queued and exported in batches every flush_interval
+    seconds; when the exporter falls behind the oldest spans are dropped.
+    With no exporter nothing is sampled, so a span costs little more than its ids.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        exporter=None,
+        sample_rate: float = DEFAULT_SAMPLE_RATE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+    ):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter else 0.0
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._queue = deque(maxlen=max_queue)
+        self._counters = {"traces": 0, "sampled_traces": 0, "exported": 0, "dropped": 0, "export_errors": 0}
+        if exporter:
+            threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+            atexit.register(self.flush)
+
+    # --------------------------------------------------
+    # SPANS
+    # --------------------------------------------------
+    def start_span(self, name: str, parent=None, start_ns: int = None, **attributes) -> Span:
+        """
+        Start a span under parent: a Span, a SpanContext or a traceparent
+        string; the current span when parent is None. Without any parent the
+        span starts a new trace and the sampling decision is made here.
+        """
+        if parent is None:
+            parent = _current.get()
+        if isinstance(parent, Span):
+            parent = parent.context
+        elif isinstance(parent, str):
+            parent = parse_traceparent(parent)
+
+        if parent is None:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+            with self._lock:
+                self._counters["traces"] += 1
+                self._counters["sampled_traces"] += 1 if sampled else 0
+            context, parent_id = SpanContext(_new_id(128), _new_id(64), sampled), None
+        else:
+            context, parent_id = SpanContext(parent.trace_id, _new_id(64), parent.sampled), parent.span_id
+        return Span(self, name, context, parent_id, attributes if context.sampled else {}, start_ns)
+
+    @contextmanager
+    def span(self, name: str, parent=None, **attributes):
+        """A span that is current inside the block; an exception marks it as an error and propagates"""
+        span = self.start_span(name, parent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def record(self, name: str, start: float, end: float, parent=None, **attributes) -> Span:
+        """A span that has already happened, timed in epoch seconds"""
+        span = self.start_span(name, parent, int(start * 1e9), **attributes)
+        span.end(int(end * 1e9))
+        return span
+
+    def record_call(self, call: dict):
+        """Sink for ModelRouter: one Bedrock call as a child of the current span"""
+        current = _current.get()
+        if current is None or not current.context.sampled:
+            return
+        span = self.record(
+            f"bedrock.{call['site']}", call["time"] - call["latency"], call["time"],
+            **{
+                "bedrock.site": call["site"],
+                "bedrock.model": call["model"],
+                "bedrock.route_reason": call["reason"],
+                "bedrock.status": str(call["status"]),
+                "bedrock.input_tokens": call["input_tokens"],
+                "bedrock.output_tokens": call["output_tokens"],
+            },
+        )
+        if call["status"] != 200:
+            span.status = "error"
+
+    # --------------------------------------------------
+    # EXPORT
+    # --------------------------------------------------
+    def _export(self, span: Span):
+        with self._lock:
+            if len(self._queue) == self._queue.maxlen:
+                self._counters["dropped"] += 1
+            self._queue.append(span)
+
+    def flush(self):
+        with self._lock:
+            spans = list(self._queue)
+            self._queue.clear()
+        if not spans:
+            return
+        try:
+            self.exporter.export(spans)
+        except Exception:
+            with self._lock:
+                self._counters["export_errors"] += 1
+                self._counters["dropped"] += len(spans)
+            return
+        with self._lock:
+            self._counters["exported"] += len(spans)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "queued": len(self._queue), "sample_rate": self.sample_rate}
+
+
+# --------------------------------------------------
+# PROCESS-WIDE TRACER
+# --------------------------------------------------
+_tracer = None
+_tracer_lock = threading.RLock()
+
+
+def configure(service: str = None, exporter=None, sample_rate: float = None) -> Tracer:
+    """
+    Set up this process's tracer. Anything not given comes from the
+    TRACING_SERVICE, TRACING_EXPORTER and TRACING_SAMPLE_RATE variables.
+    """
+    global _tracer
+    tracer = Tracer(
+        service or os.getenv("TRACING_SERVICE", "content-studio"),
+        exporter if exporter is not None else exporter_from(os.getenv("TRACING_EXPORTER", "")),
+        sample_rate if sample_rate is not None else float(os.getenv("TRACING_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)),
+    )
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def get_tracer() -> Tracer:
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                return configure()
+    return _tracer
+
+
+def span(name: str, parent=None, **attributes):
+    return get_tracer().span(name, parent, **attributes)
+
+
+def traced(name: str = None):
+    """Decorator: run the function inside a span (named after it by default)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__qualname__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span():
+    return _current.get()
+
+
+def activate(span_or_none):
+    """Make a span current without a with-block (for spans that end in a later call); None clears it"""
+    _current.set(span_or_none)
+
+
+def inject(headers: dict = None) -> dict:
+    """Headers that carry the current span to another service"""
+    headers = dict(headers or {})
+    current = _current.get()
+    if current is not None:
+        headers[TRACEPARENT] = current.context.traceparent
+    return headers
+
+
+# --------------------------------------------------
+# SQLALCHEMY
+# --------------------------------------------------
+def instrument_engine(engine):
+    """A db.query span per statement, for statements run inside a sampled trace"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current.get()
+        if parent is None or not parent.context.sampled:
+            return
+        context._trace_span = get_tracer().start_span(
+            "db.query", parent, **{"db.system": engine.dialect.name, "db.statement": statement[:500]}
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_span = getattr(context, "_trace_span", None)
+        if query_span is not None:
+            query_span.end(**{"db.rows": cursor.rowcount})
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        query_span = getattr(exception_context.execution_context, "_trace_span", None)
+        if query_span is not None:
+            query_span.error(exception_context.original_exception)
+            query_span.end()
+
+    return engine
+
+
+# --------------------------------------------------
+# ASGI
+# --------------------------------------------------
+class TracingMiddleware:
+    """A server span per HTTP request, continuing the caller's trace from its traceparent header"""
+
+    def __init__(self, app, tracer: Tracer = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = self.tracer or get_tracer()
+        parent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+
+        method = scope["method"]
+        with tracer.span(f"{method} {scope['path']}", parent,
+                         **{"http.method": method, "http.target": scope["path"]}) as request_span:
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    request_span.set(**{"http.status_code": message["status"]})
+                    if message["status"] >= 500:
+                        request_span.status = "error"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    request_span.name = f"{method} {route.path}"
+                    request_span.set(**{"http.route": route.path})
@@ -0,0 +1,353 @@
+"""
+Local stand-in for the Bedrock runtime, for load and latency testing
+without spending quota.
+
+Implements the two endpoints Content Studio uses with the same request and
+response shapes:
+
+    POST /model/<model-id>/invoke
+    POST /model/<model-id>/invoke-with-response-stream
+    GET  /stats
+
+Requests whose system blocks end in a cachePoint get provider-style prompt
+caching: the prefix is written on first use and read for five minutes
+after, reported as cacheWriteInputTokenCount / cacheReadInputTokenCount.
+--prefill-per-1k adds first-byte latency per 1K uncached input tokens so
+the latency effect of caching shows up too.
+
+Run it and point the app at it:
+
+    python benchmarks/bedrock_stub.py --port 8089 --latency lognormal --latency-median 1.2
+    BEDROCK_URL=http://127.0.0.1:8089/model/amazon.nova-micro-v1:0/invoke streamlit run app.py
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if FRONTEND_DIR not in sys.path:
+    sys.path.insert(0, FRONTEND_DIR)
+
+from utils.event_stream import encode_chunk, encode_message
+
+PREFIX_CACHE_TTL = 300
+
+FILLER = (
+    "This milestone reflects months of focused work, steady collaboration and a willingness "
+    "to learn from every setback. The team pushed through tight deadlines, shared ideas openly "
+    "and kept the people we serve at the center of every decision. I am grateful for the mentors "
+    "who challenged me, the teammates who trusted me and the community that keeps raising the bar. "
+    "There is still plenty to build, and I am excited about what comes next."
+).split()
+
+
+# -------------------------------
+# BEHAVIOUR CONFIG
+# -------------------------------
+class StubConfig:
+    def __init__(self, args):
+        self.latency = args.latency
+        self.latency_median = args.latency_median
+        self.latency_sigma = args.latency_sigma
+        self.latency_max = args.latency_max
+        self.token_delay = args.token_delay
+        self.max_concurrency = args.max_concurrency
+        self.rps = args.rps
+        self.error_rate = args.error_rate
+        self.throttle_rate = args.throttle_rate
+        self.midstream_error_rate = args.midstream_error_rate
+        self.prefill_per_1k = args.prefill_per_1k
+        self.canned = {}
+        if args.canned:
+            with open(args.canned) as f:
+                self.canned = json.load(f)
+
+    def sample_latency(self) -> float:
+        if self.latency == "fixed":
+            value = self.latency_median
+        elif self.latency == "uniform":
+            value = random.uniform(0, 2 * self.latency_median)
+        elif self.latency == "exponential":
+            value = random.expovariate(1 / self.latency_median) if self.latency_median else 0
+        else:
+            value = random.lognormvariate(math.log(max(self.latency_median, 1e-6)), self.latency_sigma)
+        return min(max(value, 0.0), self.latency_max)
+
+
+class StubState:
+    """Counters plus the admission controls (concurrency cap and token bucket)"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.tokens = float(config.rps or 0)
+        self.refilled_at = time.monotonic()
+        self.counters = {
+            "requests": 0, "streams": 0, "ok": 0, "throttled": 0, "errors": 0, "midstream_errors": 0,
+            "cache_reads": 0, "cache_writes": 0,
+        }
+        self.prefixes = {}
+
+    def admit(self) -> bool:
+        with self.lock:
+            self.counters["requests"] += 1
+            if random.random() < self.config.throttle_rate:
+                self.counters["throttled"] += 1
+                return False
+            if self.config.max_concurrency and self.in_flight >= self.config.max_concurrency:
+                self.counters["throttled"] += 1
+                return False
+            if self.config.rps:
+                now = time.monotonic()
+                self.tokens = min(self.tokens + (now - self.refilled_at) * self.config.rps, self.config.rps)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    self.counters["throttled"] += 1
+                    return False
+                self.tokens -= 1
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def cache_prefix(self, prefix: str) -> bool:
+        """Record a cacheable prefix; True if it was already cached"""
+        now = time.monotonic()
+        with self.lock:
+            hit = self.prefixes.get(prefix, 0) > now
+            self.prefixes[prefix] = now + PREFIX_CACHE_TTL
+            self.counters["cache_reads" if hit else "cache_writes"] += 1
+            return hit
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"in_flight": self.in_flight, **self.counters}
+
+
+# -------------------------------
+# CANNED / TEMPLATED OUTPUT
+# -------------------------------
+def prompt_text(body: dict) -> str:
+    parts = [block["text"] for block in body.get("system", []) if "text" in block]
+    for message in body.get("messages", []):
+        for block in message.get("content", []):
+            if "text" in block:
+                parts.append(block["text"])
+    return "\n".join(parts)
+
+
+def cacheable_prefix(body: dict) -> str:
+    """System text up to the last cachePoint, if there is one"""
+    parts, prefix = [], ""
+    for block in body.get("system", []):
+        if "text" in block:
+            parts.append(block["text"])
+        elif "cachePoint" in block:
+            prefix = "\n".join(parts)
+    return prefix
+
+
+def make_output(prompt: str, canned: dict) -> str:
+    for needle, reply in canned.items():
+        if needle in prompt:
+            return reply
+
+    if '"prompt1"' in prompt:
+        match = re.search(r'from: "(.*?)"', prompt, re.S)
+        idea = (match.group(1) if match else "your idea").strip()[:200]
+        count = re.search(r"Generate (\d+)", prompt)
+        count = int(count.group(1)) if count else 2
+        return json.dumps({
+            f"prompt{i}": {
+                "title": f"Angle {i}",
+                "prompt": f"Write about {idea} focusing on angle {i}: the journey, the result and the lesson."
+            }
+            for i in range(1, count + 1)
+        })
+
+    if '"clarity"' in prompt:
+        keys = ["clarity", "engagement", "tone_consistency", "audience_relevance", "professionalism"]
+        return json.dumps({key: random.randint(65, 95) for key in keys}, indent=4)
+
+    words = re.search(r"approximately (\d+) words", prompt)
+    words = int(words.group(1)) if words else 120
+    return " ".join(FILLER[i % len(FILLER)] for i in range(words))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, int(len(text.split()) * 1.3))
+
+
+def limit_tokens(text: str, max_tokens: int):
+    """Cut text to roughly max_tokens, returning (text, stop_reason)"""
+    words = text.split(" ")
+    allowed = int(max_tokens / 1.3)
+    if len(words) <= allowed:
+        return text, "end_turn"
+    return " ".join(words[:allowed]), "max_tokens"
+
+
+# -------------------------------
+# HTTP HANDLER
+# -------------------------------
+class BedrockStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: dict, error_type: str = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if error_type:
+            self.send_header("x-amzn-ErrorType", error_type)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(200, self.state.snapshot())
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_json(400, {"message": "Malformed JSON"}, "ValidationException")
+            return
+
+        match = re.match(r"^/model/([^/]+)/(invoke|invoke-with-response-stream)$", self.path)
+        if not match:
+            self.send_json(404, {"message": "Unknown operation"}, "UnknownOperationException")
+            return
+        model_id, operation = match.groups()
+
+        config = self.state.config
+        if not self.state.admit():
+            self.send_json(429, {"message": "Too many requests, please wait before trying again."}, "ThrottlingException")
+            return
+
+        try:
+            prompt = prompt_text(body)
+            max_tokens = body.get("inferenceConfig", {}).get("maxTokens", 500)
+            text, stop_reason = limit_tokens(make_output(prompt, config.canned), max_tokens)
+            usage = {
+                "inputTokens": estimate_tokens(prompt),
+                "outputTokens": estimate_tokens(text),
+            }
+            prefix = cacheable_prefix(body)
+            if prefix:
+                cached = estimate_tokens(prefix)
+                usage["inputTokens"] -= cached
+                usage["cacheReadInputTokenCount" if self.state.cache_prefix(prefix) else "cacheWriteInputTokenCount"] = cached
+            usage["totalTokens"] = usage["inputTokens"] + usage["outputTokens"]
+
+            time.sleep(config.sample_latency() + usage["inputTokens"] / 1000 * config.prefill_per_1k)
+            if random.random() < config.error_rate:
+                self.state.count("errors")
+                self.send_json(500, {"message": "Internal server error"}, "InternalServerException")
+                return
+
+            if operation == "invoke":
+                self.send_json(200, {
+                    "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+                    "stopReason": stop_reason,
+                    "usage": usage,
+                })
+            else:
+                self.stream(text, stop_reason, usage)
+            self.state.count("ok")
+        finally:
+            self.state.release()
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def stream(self, text: str, stop_reason: str, usage: dict):
+        self.state.count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        config = self.state.config
+        self.write_chunk(encode_chunk({"messageStart": {"role": "assistant"}}))
+        words = text.split(" ")
+        fail_at = random.randrange(len(words)) if random.random() < config.midstream_error_rate else None
+        for i in range(0, len(words), 3):
+            if fail_at is not None and i >= fail_at:
+                self.state.count("midstream_errors")
+                self.write_chunk(encode_message(
+                    {":message-type": "exception", ":exception-type": "throttlingException", ":content-type": "application/json"},
+                    json.dumps({"message": "Too many tokens, please wait before trying again."}).encode("utf-8"),
+                ))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            piece = " ".join(words[i:i + 3]) + (" " if i + 3 < len(words) else "")
+            self.write_chunk(encode_chunk({"contentBlockDelta": {"delta": {"text": piece}, "contentBlockIndex": 0}}))
+            if config.token_delay:
+                time.sleep(config.token_delay)
+
+        self.write_chunk(encode_chunk({"contentBlockStop": {"contentBlockIndex": 0}}))
+        self.write_chunk(encode_chunk({"messageStop": {"stopReason": stop_reason}}))
+        self.write_chunk(encode_chunk({"metadata": {"usage": usage, "metrics": {}}}))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "exponential", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-median", type=float, default=0.8, help="seconds before the first byte")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--latency-max", type=float, default=30.0)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="429 beyond this many in flight (0 = unlimited)")
+    parser.add_argument("--rps", type=float, default=0, help="token-bucket request rate limit (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of random 429 responses")
+    parser.add_argument("--midstream-error-rate", type=float, default=0.0, help="fraction of streams that fail part way")
+    parser.add_argument("--canned", help="JSON file mapping prompt substrings to fixed replies")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0,
+                        help="extra seconds before the first byte per 1K uncached input tokens")
+    return parser
+
+
+def serve(args, block: bool = True):
+    BedrockStubHandler.state = StubState(StubConfig(args))
+    server = ThreadingHTTPServer((args.host, args.port), BedrockStubHandler)
+    server.daemon_threads = True
+    if not block:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"Bedrock stub listening on http://{args.host}:{args.port}/model/<model-id>/invoke")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return server
+
+
+if __name__ == "__main__":
+    serve(build_parser().parse_args())
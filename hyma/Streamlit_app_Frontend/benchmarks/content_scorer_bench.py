@@ -0,0 +1,91 @@
+"""
+Local content scoring: score_content() one text at a time versus
+score_many() over a whole batch, on LinkedIn-sized posts.
+
+    python benchmarks/content_scorer_bench.py
+    python benchmarks/content_scorer_bench.py --texts 1000 10000 --words 120 250 --repeats 5
+
+Each post is --words words (a random length in that range) of varied filler
+with a hook, a question, a call to action, hashtags and an emoji, so every
+lexicon and feature path is exercised.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if FRONTEND_DIR not in sys.path:
+    sys.path.insert(0, FRONTEND_DIR)
+
+from benchmarks.bedrock_stub import FILLER
+from utils.content_scorer import score_content, score_many
+
+HOOKS = ["Big news!", "I never expected this.", "Here is what I learned.", "Three lessons from this year:"]
+ENDINGS = [
+    "What would you have done differently?",
+    "Let me know in the comments.",
+    "Follow along for more.",
+    "Thanks to everyone who made this possible.",
+]
+HASHTAGS = ["#Leadership", "#AI", "#Hackathon", "#Careers", "#Engineering", "#Growth"]
+TONES = ["Professional", "Casual", "Inspirational", "Friendly"]
+AUDIENCES = ["Recruiters", "Peers", "Students", "Industry Leaders"]
+PURPOSES = ["Share Experience", "Inspire Others", "Announce News", "Seek Advice"]
+
+
+def linkedin_post(rng: random.Random, low: int, high: int) -> str:
+    words = [rng.choice(FILLER) for _ in range(rng.randint(low, high))]
+    sentences, start = [], 0
+    while start < len(words):
+        end = start + rng.randint(8, 22)
+        sentences.append(" ".join(words[start:end]).capitalize().rstrip(",.") + ".")
+        start = end
+    tags = " ".join(rng.sample(HASHTAGS, 3))
+    return f"{rng.choice(HOOKS)} 🚀\n\n" + " ".join(sentences) + f"\n\n{rng.choice(ENDINGS)}\n\n{tags}"
+
+
+def items_for(count: int, rng: random.Random, low: int, high: int) -> list:
+    return [
+        {
+            "content": linkedin_post(rng, low, high),
+            "content_type": "LinkedIn Post",
+            "tone": rng.choice(TONES),
+            "audience": rng.choice(AUDIENCES),
+            "purpose": rng.choice(PURPOSES),
+            "word_limit": 200,
+        }
+        for _ in range(count)
+    ]
+
+
+def timed(fn, repeats: int):
+    samples, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--words", type=int, nargs=2, default=[120, 250], metavar=("MIN", "MAX"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    print(f"{'texts':>7} {'one at a time s':>16} {'score_many s':>13} {'ms/text':>8} {'speedup':>8}")
+    for count in args.texts:
+        items = items_for(count, rng, *args.words)
+        single, singles = timed(lambda: [score_content(**item) for item in items], args.repeats)
+        bulk, bulks = timed(lambda: score_many(items), args.repeats)
+        assert singles == bulks, "score_many disagrees with score_content"
+        print(f"{count:>7} {single:>16.2f} {bulk:>13.2f} {bulk / count * 1000:>8.3f} {single / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Saved Drafts queries for one heavy user: the old load-everything query
+versus keyset pages of list columns on (user_email, created_at, id), with
+and without the composite index, and fetching one body when it is opened.
+
+    python benchmarks/history_page_bench.py
+    python benchmarks/history_page_bench.py --rows 10000 100000 --page-size 20 --repeats 7
+
+Each size is seeded into a fresh SQLite file (plus --other-users rows
+belonging to someone else) with bodies of about --body-words words. The
+deep page starts 90% of the way down the user's history; the OFFSET query
+fetches the same page the way offset pagination would.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ROOT_DIR = os.path.abspath(os.path.join(FRONTEND_DIR, ".."))
+for path in (FRONTEND_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bedrock_stub import FILLER
+from Auth_Backend.models import ContentHistory
+from utils.history import HISTORY_INDEX_NAME, history_body, history_counts, history_page
+
+USER = "heavy@example.com"
+CONTENT_TYPES = ["LinkedIn Post", "Email", "Blog Post", "Tweet Thread", "Instagram Caption"]
+
+
+# -------------------------------
+# SEEDING
+# -------------------------------
+def seed(engine, rows: int, other_users: int, body_words: int):
+    rng = random.Random(rows)
+    start = datetime(2024, 1, 1)
+    table = ContentHistory.__table__
+
+    def batch(email: str, count: int):
+        for i in range(count):
+            yield {
+                "user_email": email,
+                "title": f"Draft {i}",
+                "content_type": CONTENT_TYPES[i % len(CONTENT_TYPES)],
+                "tone": "Professional",
+                "audience": "Recruiters",
+                "purpose": "Share Experience",
+                "word_limit": 150,
+                "generated_content": " ".join(rng.choice(FILLER) for _ in range(body_words)),
+                # Several drafts per second share a timestamp, so id has to break ties
+                "created_at": start + timedelta(seconds=i // 3),
+            }
+
+    with engine.begin() as conn:
+        for email, count in ((USER, rows), ("someone@example.com", other_users)):
+            chunk = []
+            for row in batch(email, count):
+                chunk.append(row)
+                if len(chunk) == 5000:
+                    conn.execute(table.insert(), chunk)
+                    chunk = []
+            if chunk:
+                conn.execute(table.insert(), chunk)
+
+
+# -------------------------------
+# MEASUREMENT
+# -------------------------------
+def payload_bytes(items) -> int:
+    """Text pulled out of the database; pages carry no generated_content"""
+    return sum(
+        len(getattr(item, "generated_content", None) or "") + len(item.title or "") + len(item.content_type or "")
+        for item in items
+    )
+
+
+def timed(fn, repeats: int):
+    samples, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def query_plan(engine, sql: str, params: dict) -> str:
+    with engine.connect() as conn:
+        return "; ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql), params))
+
+
+def measure(session_factory, engine, rows: int, page_size: int, repeats: int) -> list:
+    depth = int(rows * 0.9)
+
+    def all_rows():
+        db = session_factory()
+        items = (
+            db.query(ContentHistory)
+            .filter(ContentHistory.user_email == USER)
+            .order_by(ContentHistory.created_at.desc())
+            .all()
+        )
+        db.close()
+        return items
+
+    def page(after=None):
+        db = session_factory()
+        result = history_page(db, USER, page_size, after)
+        db.close()
+        return result[0]
+
+    def offset_page():
+        db = session_factory()
+        items = (
+            db.query(ContentHistory)
+            .filter(ContentHistory.user_email == USER)
+            .order_by(ContentHistory.created_at.desc(), ContentHistory.id.desc())
+            .offset(depth)
+            .limit(page_size)
+            .all()
+        )
+        db.close()
+        return items
+
+    def body():
+        db = session_factory()
+        result = history_body(db, cursor[1])
+        db.close()
+        return result
+
+    def counts():
+        db = session_factory()
+        result = history_counts(db, USER)
+        db.close()
+        return result
+
+    db = session_factory()
+    anchor = (
+        db.query(ContentHistory.created_at, ContentHistory.id)
+        .filter(ContentHistory.user_email == USER)
+        .order_by(ContentHistory.created_at.desc(), ContentHistory.id.desc())
+        .offset(depth - 1)
+        .first()
+    )
+    db.close()
+    cursor = (anchor.created_at, anchor.id)
+
+    results = []
+    for name, fn in (
+        ("all rows (before)", all_rows),
+        ("first page", page),
+        ("deep page (keyset)", lambda: page(cursor)),
+        ("deep page (OFFSET)", offset_page),
+        ("open one body", body),
+        ("counts by type", counts),
+    ):
+        ms, result = timed(fn, repeats)
+        if isinstance(result, str):
+            count, size = 1, len(result)
+        else:
+            count, size = len(result), payload_bytes(result) if isinstance(result, list) else 0
+        results.append({
+            "query": name,
+            "median_ms": round(ms, 2),
+            "rows": count,
+            "payload_kb": round(size / 1024, 1),
+        })
+
+    first_ids = [item.id for item in page()]
+    walked = page(cursor)
+    assert walked and walked[0].id == offset_page()[0].id, "keyset and OFFSET pages disagree"
+    assert len(first_ids) == len(set(first_ids))
+    return results
+
+
+def run_size(rows: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        table = ContentHistory.__table__
+        composite = next(index for index in table.indexes if index.name == HISTORY_INDEX_NAME)
+
+        # The schema as it was: only the single-column user_email index
+        table.create(bind=engine)
+        composite.drop(bind=engine)
+        started = time.perf_counter()
+        seed(engine, rows, args.other_users, args.body_words)
+        seed_seconds = time.perf_counter() - started
+        session_factory = sessionmaker(bind=engine)
+
+        page_sql = (
+            "SELECT id, title, content_type, tone, audience, purpose, word_limit, created_at "
+            "FROM content_history WHERE user_email = :email AND (created_at, id) < (:c, :i) "
+            "ORDER BY created_at DESC, id DESC LIMIT 21"
+        )
+        plan_params = {"email": USER, "c": "2025-01-01 00:00:00.000000", "i": 0}
+        report = {"rows": rows, "seed_seconds": round(seed_seconds, 1)}
+        report["without_index"] = measure(session_factory, engine, rows, args.page_size, args.repeats)
+        report["plan_without_index"] = query_plan(engine, page_sql, plan_params)
+
+        composite.create(bind=engine)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+        report["with_index"] = measure(session_factory, engine, rows, args.page_size, args.repeats)
+        report["plan_with_index"] = query_plan(engine, page_sql, plan_params)
+        engine.dispose()
+    return report
+
+
+def print_report(report: dict):
+    print(f"\n{report['rows']} rows for one user (seeded in {report['seed_seconds']} s)")
+    print(f"{'query':<22} {'index':<10} {'median ms':>10} {'rows':>7} {'payload KB':>11}")
+    for label, key in (("user_email", "without_index"), ("composite", "with_index")):
+        for row in report[key]:
+            print(f"{row['query']:<22} {label:<10} {row['median_ms']:>10} {row['rows']:>7} {row['payload_kb']:>11}")
+    print(f"page plan, user_email index: {report['plan_without_index']}")
+    print(f"page plan, composite index:  {report['plan_with_index']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--other-users", type=int, default=10000)
+    parser.add_argument("--body-words", type=int, default=180)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    reports = [run_size(rows, args) for rows in args.rows]
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
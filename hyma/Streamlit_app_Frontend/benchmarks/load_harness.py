@@ -0,0 +1,442 @@
+"""
+Concurrent-session load test for the Content Studio wizard.
+
+Drives N headless sessions (Streamlit AppTest) through
+input -> prompt_selection -> preferences -> generation -> evaluation, ramping
+the session count, and reports per-step latency percentiles, script runs per
+flow, throughput and process RSS/CPU for each stage.
+
+    python benchmarks/load_harness.py --ramp 1,4,8,16 --flows 3
+    python benchmarks/load_harness.py --stub-args "--latency lognormal --latency-median 1.5"
+    python benchmarks/load_harness.py --bedrock-url https://bedrock-runtime.../invoke --ramp 1,2
+
+Without --bedrock-url an in-process bedrock_stub is started. All sessions
+share this process the way sessions share one Streamlit server, so
+st.cache_resource singletons (Bedrock client, caches) are shared too.
+The run happens in a scratch directory so users.db and response_cache.db
+start empty.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shlex
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if FRONTEND_DIR not in sys.path:
+    sys.path.insert(0, FRONTEND_DIR)
+
+import streamlit as st
+import streamlit.logger
+from streamlit.runtime.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bedrock_stub import build_parser as build_stub_parser, serve as serve_stub
+
+PAGE = os.path.join(FRONTEND_DIR, "pages", "Content_Studio.py")
+STEPS = ["load", "input", "prompt_selection", "preferences", "generation", "evaluation"]
+
+WORDS = (
+    "won hackathon promoted launched startup shipped feature graduated internship "
+    "award team project healthcare ai app mentor conference talk published paper "
+    "certification cloud data python leadership first national open source release"
+).split()
+
+PREFERENCES = {
+    "sel_content_type": "LinkedIn Post",
+    "sel_tone": "Professional",
+    "sel_audience": "Recruiters",
+    "sel_purpose": "Share Experience",
+}
+
+
+# -------------------------------
+# APPTEST ADJUSTMENTS
+# -------------------------------
+def share_runtime():
+    """
+    AppTest installs a mock Runtime for each run and clears it when the run
+    ends, which pulls it out from under sessions still running on other
+    threads. Keep the last one visible to everybody instead.
+    """
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in last:
+            return last["runtime"]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def share_script_cache():
+    """
+    A server compiles each page once; AppTest builds a fresh ScriptCache per
+    run. Share the bytecode, compiling under a lock since concurrent
+    ast.parse calls are not thread-safe on every Python version.
+    """
+    lock = threading.Lock()
+    compiled = {}
+    original = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = original(self, script_path)
+            return compiled[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+# AppTest folds st.rerun() into a single run() call, so count them at the source
+RERUNS = defaultdict(int)
+RERUNS_LOCK = threading.Lock()
+
+
+def count_reruns():
+    original = st.rerun
+
+    def rerun(*args, **kwargs):
+        session = st.session_state.get("_load_session")
+        with RERUNS_LOCK:
+            RERUNS[session] += 1
+        return original(*args, **kwargs)
+
+    st.rerun = rerun
+
+
+def reruns_of(session: str) -> int:
+    with RERUNS_LOCK:
+        return RERUNS[session]
+
+
+# -------------------------------
+# PROCESS SAMPLING
+# -------------------------------
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ProcessSampler:
+    """Samples RSS and CPU utilisation of this process on a background thread"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._rss = []
+        self._thread = None
+        self._cpu_start = None
+        self._wall_start = None
+
+    def __enter__(self):
+        times = os.times()
+        self._cpu_start = times.user + times.system
+        self._wall_start = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        times = os.times()
+        self.cpu_seconds = times.user + times.system - self._cpu_start
+        self.wall_seconds = time.monotonic() - self._wall_start
+        self._rss.append(rss_bytes())
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._rss.append(rss_bytes())
+            self._stop.wait(self.interval)
+
+    def snapshot(self) -> dict:
+        return {
+            "rss_mb_peak": round(max(self._rss) / 1e6, 1),
+            "rss_mb_end": round(self._rss[-1] / 1e6, 1),
+            "cpu_percent": round(100 * self.cpu_seconds / self.wall_seconds, 1) if self.wall_seconds else 0.0,
+        }
+
+
+# -------------------------------
+# ONE SESSION
+# -------------------------------
+class FlowError(Exception):
+    pass
+
+
+def button(at: AppTest, label: str):
+    for candidate in at.button:
+        if candidate.label.startswith(label):
+            return candidate
+    labels = [candidate.label for candidate in at.button]
+    raise FlowError(f"button {label!r} not found on step {at.session_state.step!r} (have {labels})")
+
+
+def check(at: AppTest, expected_step: str):
+    if at.exception:
+        raise FlowError(at.exception[0].message)
+    if at.error:
+        raise FlowError(at.error[0].value)
+    if at.session_state.step != expected_step:
+        raise FlowError(f"expected step {expected_step!r}, got {at.session_state.step!r}")
+
+
+def settle(at: AppTest, ready, timeout: float, interval: float = 0.1):
+    """
+    Model calls run as background jobs that the page polls from a fragment;
+    rerun the script until ready(at) holds, the way the fragment timer would.
+    """
+    deadline = time.monotonic() + timeout
+    while not ready(at):
+        if at.exception or at.error:
+            return
+        if time.monotonic() > deadline:
+            raise FlowError(f"timed out waiting on step {at.session_state.step!r}")
+        time.sleep(interval)
+        at.run()
+
+
+def has_button(label: str):
+    return lambda at: any(candidate.label.startswith(label) for candidate in at.button)
+
+
+def random_idea(rng: random.Random, session: str, flow: int) -> str:
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+    return f"I {words} ({session}-{flow})"
+
+
+class VirtualUser:
+    """One browser session walking the wizard repeatedly"""
+
+    def __init__(self, name: str, args, results):
+        self.name = name
+        self.args = args
+        self.results = results
+        self.rng = random.Random(name)
+        self.at = None
+
+    def timed(self, step: str, action):
+        start = time.perf_counter()
+        action()
+        self.results.record(step, time.perf_counter() - start)
+        if self.args.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.args.think_time))
+
+    def open(self):
+        self.at = AppTest.from_file(PAGE, default_timeout=self.args.timeout)
+        self.at.session_state["jwt"] = "load-test"
+        self.at.session_state["email"] = f"{self.name}@load.test"
+        self.at.session_state["name"] = self.name
+        self.at.session_state["_load_session"] = self.name
+        self.timed("load", self.at.run)
+        check(self.at, "input")
+
+    def flow(self, index: int):
+        at = self.at
+        reruns_before = reruns_of(self.name)
+
+        idea = self.rng.choice(self.args.ideas) if self.args.ideas else random_idea(self.rng, self.name, index)
+        at.text_area[0].input(idea)
+        self.timed("input", lambda: (
+            button(at, "🎯 Generate Prompts").click().run(),
+            settle(at, has_button("Select This Prompt"), self.args.timeout),
+        ))
+        check(at, "prompt_selection")
+
+        self.timed("prompt_selection", button(at, "Select This Prompt").click().run)
+        check(at, "preferences")
+
+        # Every selectbox change is its own script run, as in the browser
+        self.timed("preferences", lambda: [at.selectbox(key=key).select(value).run() for key, value in PREFERENCES.items()])
+        check(at, "preferences")
+
+        self.timed("generation", lambda: (
+            button(at, "✨ Generate Content").click().run(),
+            settle(at, lambda at: at.session_state.final_content, self.args.timeout),
+        ))
+        check(at, "generation")
+        if not at.session_state.final_content:
+            raise FlowError("no content generated")
+
+        self.timed("evaluation", button(at, "✨ Analyze Content Quality").click().run)
+        check(at, "generation")
+        if not at.session_state.evaluation_scores:
+            raise FlowError("no evaluation scores")
+
+        # One run per user action, plus every st.rerun() they triggered
+        self.results.record_flow(4 + len(PREFERENCES) + reruns_of(self.name) - reruns_before)
+
+        button(at, "🆕 New Content").click().run()
+        check(at, "input")
+
+    def run(self, flows: int):
+        for index in range(flows):
+            try:
+                if self.at is None:
+                    self.open()
+                self.flow(index)
+            except Exception as e:
+                self.results.record_failure(f"{type(e).__name__}: {e}")
+                # Start over with a fresh session after a failure
+                self.at = None
+
+
+# -------------------------------
+# RESULTS
+# -------------------------------
+def percentile(values, p: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+class StageResults:
+    def __init__(self, sessions: int):
+        self.sessions = sessions
+        self.lock = threading.Lock()
+        self.steps = defaultdict(list)
+        self.runs_per_flow = []
+        self.failures = defaultdict(int)
+
+    def record(self, step: str, seconds: float):
+        with self.lock:
+            self.steps[step].append(seconds)
+
+    def record_flow(self, runs: int):
+        with self.lock:
+            self.runs_per_flow.append(runs)
+
+    def record_failure(self, message: str):
+        with self.lock:
+            self.failures[message[:160]] += 1
+
+    def summary(self, wall_seconds: float, process: dict) -> dict:
+        completed = len(self.runs_per_flow)
+        return {
+            "sessions": self.sessions,
+            "completed_flows": completed,
+            "failed_flows": sum(self.failures.values()),
+            "flows_per_minute": round(60 * completed / wall_seconds, 2) if wall_seconds else 0.0,
+            "wall_seconds": round(wall_seconds, 2),
+            "runs_per_flow": round(statistics.mean(self.runs_per_flow), 2) if self.runs_per_flow else None,
+            "steps": {
+                step: {
+                    "count": len(self.steps[step]),
+                    "p50": percentile(self.steps[step], 50),
+                    "p95": percentile(self.steps[step], 95),
+                    "p99": percentile(self.steps[step], 99),
+                }
+                for step in STEPS if self.steps[step]
+            },
+            "failures": dict(self.failures),
+            **process,
+        }
+
+
+def run_stage(sessions: int, args) -> dict:
+    results = StageResults(sessions)
+    users = [VirtualUser(f"s{sessions}-{i}", args, results) for i in range(sessions)]
+    with ProcessSampler() as sampler:
+        with ThreadPoolExecutor(max_workers=sessions) as pool:
+            for user in users:
+                pool.submit(user.run, args.flows)
+    return results.summary(sampler.wall_seconds, sampler.snapshot())
+
+
+def print_stage(summary: dict):
+    print(
+        f"\n== {summary['sessions']} sessions: {summary['completed_flows']} flows ok, "
+        f"{summary['failed_flows']} failed, {summary['flows_per_minute']} flows/min, "
+        f"{summary['runs_per_flow']} script runs/flow"
+    )
+    print(
+        f"   rss {summary['rss_mb_peak']} MB peak / {summary['rss_mb_end']} MB end, "
+        f"cpu {summary['cpu_percent']}%"
+    )
+    print(f"   {'step':<18}{'n':>6}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}")
+    for step, stats in summary["steps"].items():
+        print(f"   {step:<18}{stats['count']:>6}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['p99']:>10.3f}")
+    for message, count in summary["failures"].items():
+        print(f"   ! {count}x {message}")
+
+
+# -------------------------------
+# MAIN
+# -------------------------------
+def prepare_workdir(path: str, api_key: str):
+    """Scratch cwd with its own databases and a secrets file (AppTest secrets are process-global)"""
+    os.makedirs(os.path.join(path, ".streamlit"), exist_ok=True)
+    with open(os.path.join(path, ".streamlit", "secrets.toml"), "w") as f:
+        f.write(f"BEDROCK_API_KEY = {json.dumps(api_key)}\n")
+    os.chdir(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ramp", default="1,2,4,8", help="comma-separated session counts, one stage each")
+    parser.add_argument("--flows", type=int, default=2, help="wizard runs per session per stage")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between steps (seconds)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-step script timeout (seconds)")
+    parser.add_argument("--bedrock-url", help="invoke URL to test against instead of the local stub")
+    parser.add_argument("--stub-port", type=int, default=8089)
+    parser.add_argument("--stub-args", default="--latency lognormal --latency-median 0.8 --token-delay 0.01",
+                        help="options passed to benchmarks/bedrock_stub.py")
+    parser.add_argument("--ideas", nargs="*", help="fixed idea pool (exercises the caches); default is a unique idea per flow")
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--json", help="also write the stage summaries to this file")
+    args = parser.parse_args()
+
+    if args.bedrock_url:
+        os.environ["BEDROCK_URL"] = args.bedrock_url
+    else:
+        stub_args = build_stub_parser().parse_args(shlex.split(args.stub_args) + ["--port", str(args.stub_port)])
+        serve_stub(stub_args, block=False)
+        os.environ["BEDROCK_URL"] = f"http://127.0.0.1:{args.stub_port}/model/amazon.nova-micro-v1:0/invoke"
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    prepare_workdir(args.workdir or tempfile.mkdtemp(prefix="content_studio_load_"),
+                    os.getenv("BEDROCK_API_KEY", "load-test"))
+    # Harness threads read session_state outside a script run; don't warn about it
+    streamlit.logger.set_log_level("error")
+    share_runtime()
+    share_script_cache()
+    count_reruns()
+    print(f"Bedrock endpoint: {os.environ['BEDROCK_URL']}")
+    print(f"Working directory: {os.getcwd()}")
+
+    summaries = []
+    for sessions in [int(n) for n in args.ramp.split(",") if n.strip()]:
+        summary = run_stage(sessions, args)
+        summaries.append(summary)
+        print_stage(summary)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
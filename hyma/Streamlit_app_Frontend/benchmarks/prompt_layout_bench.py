@@ -0,0 +1,187 @@
+"""
+Input tokens and latency per call site: the old inline prompts versus the
+template registry's static-prefix layout with cache points.
+
+    python benchmarks/prompt_layout_bench.py --rounds 20
+    python benchmarks/prompt_layout_bench.py --stub-args "--latency fixed --latency-median 0.3 --prefill-per-1k 0.5"
+    BEDROCK_API_KEY=... python benchmarks/prompt_layout_bench.py --bedrock-url https://bedrock-runtime.../invoke
+
+Without --bedrock-url an in-process bedrock_stub is started. Cache points
+are attached from --min-cache-tokens up (default 0, so every call site gets
+one; the app's default is the provider minimum). Billable input counts
+cache reads at --cache-read-price of the normal input price.
+"""
+import argparse
+import json
+import os
+import shlex
+import statistics
+import sys
+import time
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if FRONTEND_DIR not in sys.path:
+    sys.path.insert(0, FRONTEND_DIR)
+
+from benchmarks.bedrock_stub import FILLER, build_parser as build_stub_parser, serve as serve_stub
+from utils.bedrock_client import BedrockClient, build_payload
+from utils.prompt_templates import PromptRegistry
+
+SITES = ["prompts", "generation", "evaluation"]
+LAYOUTS = ["inline", "templated"]
+
+IDEAS = [
+    "I won first place at a national hackathon for an AI healthcare app",
+    "I was promoted to senior data engineer after leading our cloud migration",
+    "I gave my first conference talk on open source observability tooling",
+    "I finished a six month internship building payment fraud models",
+]
+
+
+# -------------------------------
+# CALL SITE INPUTS
+# -------------------------------
+def sample_values(site: str, i: int) -> dict:
+    idea = IDEAS[i % len(IDEAS)]
+    if site == "prompts":
+        return {"idea": idea, "count": 2}
+    preferences = {"content_type": "LinkedIn Post", "tone": "Professional", "audience": "Recruiters",
+                   "purpose": "Share Experience"}
+    if site == "generation":
+        return {**preferences, "word_limit": 150, "topic": idea}
+    content = " ".join(FILLER[(i + n) % len(FILLER)] for n in range(150))
+    return {**preferences, "content": f"{idea}. {content}"}
+
+
+def inline_prompt(site: str, v: dict) -> str:
+    """The prompts as they were built before the template registry"""
+    if site == "prompts":
+        return f"""Generate 2 different refined prompts from: "{v['idea']}"
+Return JSON: {{"prompt1": {{"title": "...", "prompt": "..."}}, "prompt2": {{"title": "...", "prompt": "..."}}}}"""
+    if site == "generation":
+        return f"""Write a {v['tone']} {v['content_type']} in approximately {v['word_limit']} words.
+Audience: {v['audience']}
+Purpose: {v['purpose']}
+Content: {v['topic']}
+
+Create engaging, authentic content that resonates with the target audience."""
+    return f"""Analyze this {v['content_type']} and provide quality scores (0-100) for each criterion.
+
+Content to evaluate:
+{v['content']}
+
+Expected characteristics:
+- Tone: {v['tone']}
+- Audience: {v['audience']}
+- Purpose: {v['purpose']}
+
+Provide scores in this exact JSON format:
+{{
+    "clarity": 85,
+    "engagement": 78,
+    "tone_consistency": 92,
+    "audience_relevance": 88,
+    "professionalism": 90
+}}
+
+Only return the JSON, no other text."""
+
+
+# -------------------------------
+# MEASUREMENT
+# -------------------------------
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def run(client: BedrockClient, registry: PromptRegistry, rounds: int, max_tokens: dict) -> dict:
+    samples = {(site, layout): [] for site in SITES for layout in LAYOUTS}
+    for i in range(rounds):
+        # Alternate which layout goes first so neither always sees a warm connection
+        for layout in LAYOUTS if i % 2 == 0 else reversed(LAYOUTS):
+            for site in SITES:
+                values = sample_values(site, i)
+                prompt = inline_prompt(site, values) if layout == "inline" else registry.render(site, **values)
+                started = time.monotonic()
+                response = client.invoke(build_payload(prompt, max_tokens[site], 0.0))
+                latency = time.monotonic() - started
+                if response.status_code != 200:
+                    print(f"{site}/{layout}: HTTP {response.status_code} {response.text[:200]}")
+                    continue
+                usage = response.json().get("usage", {})
+                samples[(site, layout)].append({
+                    "latency": latency,
+                    "input": usage.get("inputTokens", 0),
+                    "cache_read": usage.get("cacheReadInputTokenCount", 0),
+                    "cache_write": usage.get("cacheWriteInputTokenCount", 0),
+                })
+    return samples
+
+
+def summarize(samples: dict, cache_read_price: float) -> list:
+    rows = []
+    for (site, layout), calls in samples.items():
+        if not calls:
+            continue
+        mean = lambda key: statistics.mean(call[key] for call in calls)
+        latencies = [call["latency"] for call in calls]
+        rows.append({
+            "site": site,
+            "layout": layout,
+            "calls": len(calls),
+            "input_tokens": round(mean("input"), 1),
+            "cache_read_tokens": round(mean("cache_read"), 1),
+            "cache_write_tokens": round(mean("cache_write"), 1),
+            "billable_input_tokens": round(mean("input") + mean("cache_write") + cache_read_price * mean("cache_read"), 1),
+            "p50_latency": round(percentile(latencies, 50), 4),
+            "p95_latency": round(percentile(latencies, 95), 4),
+        })
+    return rows
+
+
+def print_rows(rows: list):
+    print(f"{'site':<11} {'layout':<10} {'calls':>5} {'input':>8} {'cache rd':>9} {'cache wr':>9} "
+          f"{'billable':>9} {'p50 s':>8} {'p95 s':>8}")
+    for row in rows:
+        print(f"{row['site']:<11} {row['layout']:<10} {row['calls']:>5} {row['input_tokens']:>8} "
+              f"{row['cache_read_tokens']:>9} {row['cache_write_tokens']:>9} {row['billable_input_tokens']:>9} "
+              f"{row['p50_latency']:>8} {row['p95_latency']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--bedrock-url", help="invoke URL to measure against instead of the local stub")
+    parser.add_argument("--stub-port", type=int, default=8090)
+    parser.add_argument("--stub-args", default="--latency fixed --latency-median 0.2 --prefill-per-1k 0.4",
+                        help="options passed to benchmarks/bedrock_stub.py")
+    parser.add_argument("--min-cache-tokens", type=int, default=0)
+    parser.add_argument("--cache-read-price", type=float, default=0.25,
+                        help="cache read price as a fraction of the input token price")
+    parser.add_argument("--json", help="also write the summary rows to this file")
+    args = parser.parse_args()
+
+    url = args.bedrock_url
+    if not url:
+        stub_args = build_stub_parser().parse_args(shlex.split(args.stub_args) + ["--port", str(args.stub_port)])
+        serve_stub(stub_args, block=False)
+        url = f"http://127.0.0.1:{args.stub_port}/model/amazon.nova-micro-v1:0/invoke"
+
+    client = BedrockClient(url, os.getenv("BEDROCK_API_KEY", "bench"))
+    registry = PromptRegistry(min_cache_tokens=args.min_cache_tokens)
+    print(f"Bedrock endpoint: {url}")
+    print("Static prefixes: " + ", ".join(
+        f"{site}={stats['prefix_tokens']} tokens" for site, stats in registry.stats().items()
+    ))
+
+    samples = run(client, registry, args.rounds, {"prompts": 800, "generation": 300, "evaluation": 300})
+    rows = summarize(samples, args.cache_read_price)
+    print_rows(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
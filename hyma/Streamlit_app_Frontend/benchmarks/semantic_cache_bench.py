@@ -0,0 +1,119 @@
+"""
+Lookup latency and hit rate of the semantic prompt cache at a given index
+size. Half the queries rephrase an indexed idea with different filler words
+and should hit; the other half are new ideas and should miss. The matching
+rules are checked first on a handful of known pairs.
+
+    python benchmarks/semantic_cache_bench.py --entries 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+FRONTEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if FRONTEND_DIR not in sys.path:
+    sys.path.insert(0, FRONTEND_DIR)
+
+from utils.semantic_cache import STOPWORDS, SemanticCache
+
+WORDS = (
+    "won hackathon promoted launched startup shipped feature graduated internship "
+    "award team project healthcare ai app mentor conference talk published paper "
+    "certification cloud data python leadership first national open source release"
+).split()
+
+
+FILLER = sorted(STOPWORDS)
+
+# (indexed, query, should hit)
+MATCHING_CASES = [
+    ("I won a hackathon", "we won a hackathon today", True),
+    ("I won a hackathon", "I won the hackathon!", True),
+    ("I won a hackathon", "just won a hackathon with my team", True),
+    ("I joined Google as an intern", "I joined google as an intern", True),
+    ("I joined Google as an intern", "I joined Meta as an intern", False),
+    ("We hit 10k users on our app", "We hit 20k users on our app", False),
+    ("Got promoted to senior engineer", "Got promoted to staff engineer", False),
+]
+
+
+def vocabulary(size: int, rng: random.Random) -> list:
+    """WORDS plus made-up words, so that unrelated ideas rarely share most of their words"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    made_up = {"".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)}
+    return WORDS + sorted(made_up - STOPWORDS)
+
+
+def random_idea(rng: random.Random, words: list) -> str:
+    return "I " + " ".join(rng.choice(words) for _ in range(rng.randint(6, 16)))
+
+
+def rephrase(idea: str, rng: random.Random) -> str:
+    """The same idea with a few filler words dropped in"""
+    words = idea.split()
+    for _ in range(rng.randint(1, 4)):
+        words.insert(rng.randint(0, len(words)), rng.choice(FILLER))
+    return " ".join(words)
+
+
+def check_matching():
+    for indexed, query, should_hit in MATCHING_CASES:
+        cache = SemanticCache(max_entries=16)
+        cache.add(indexed, "value", owner="user")
+        hit = cache.lookup(query, owner="user") is not None
+        assert hit == should_hit, f"{query!r} against {indexed!r}: hit={hit}, expected {should_hit}"
+        assert cache.lookup(query, owner="someone else") is None, "entries leaked across owners"
+    print(f"matching: {len(MATCHING_CASES)} cases ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    args = parser.parse_args()
+
+    check_matching()
+
+    rng = random.Random(42)
+    words = vocabulary(args.vocabulary, rng)
+    cache = SemanticCache(dim=args.dim, max_entries=args.entries)
+
+    indexed = []
+    start = time.perf_counter()
+    for i in range(args.entries):
+        idea = random_idea(rng, words)
+        cache.add(idea, {"prompt1": i, "prompt2": i})
+        indexed.append(idea)
+    fill_seconds = time.perf_counter() - start
+
+    timings, rephrased_hits, new_hits = [], 0, 0
+    for i in range(args.queries):
+        rephrased = i % 2 == 0
+        idea = rephrase(rng.choice(indexed), rng) if rephrased else random_idea(rng, words)
+        start = time.perf_counter()
+        hit = cache.lookup(idea) is not None
+        timings.append((time.perf_counter() - start) * 1000)
+        if rephrased:
+            rephrased_hits += hit
+        else:
+            new_hits += hit
+
+    timings.sort()
+    print(f"entries={len(cache)} dim={args.dim} matrix={cache.stats()['matrix_bytes'] / 1e6:.1f} MB")
+    print(f"fill: {fill_seconds:.1f}s ({args.entries / fill_seconds:.0f} inserts/s)")
+    print(
+        f"lookup ms: p50={statistics.median(timings):.2f} "
+        f"p95={timings[int(len(timings) * 0.95) - 1]:.2f} "
+        f"p99={timings[int(len(timings) * 0.99) - 1]:.2f}"
+    )
+    half = args.queries // 2
+    print(f"hits: rephrased {rephrased_hits}/{args.queries - half}, new ideas {new_hits}/{half}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import streamlit as st
-import requests
 import time
 import re
 import sys
 import os
 import json
 import base64
+import hashlib
+import zlib
+import functools
 from datetime import datetime
 
 # -------------------------------
@@ -27,9 +29,23 @@ if ROOT_DIR not in sys.path:
 
 # Import database and auth
 try:
-    from Auth_Backend.database import SessionLocal, init_db
-    from Auth_Backend.models import ContentHistory
+    from Auth_Backend.database import SessionLocal, engine, init_db
+    from Auth_Backend.models import ContentHistory, ContentVariants
     from utils.auth_gaurd import protect
+    from utils.bedrock_client import BedrockClient, build_payload, response_text
+    from utils.resilience import CircuitBreaker, CircuitOpenError
+    from utils.concurrency import AdaptiveLimiter, LimiterRejected
+    from utils.model_router import ModelRouter
+    from utils.response_cache import ResponseCache, make_cache_key
+    from utils.semantic_cache import SemanticCache
+    from utils.content_scorer import SCORE_KEYS, score_content, score_many
+    from utils.structured_output import StructuredOutput
+    from utils.token_budget import TokenBudgetPlanner, continuation_prompt, stitch
+    from utils.prompt_templates import PromptRegistry
+    from utils.job_queue import ACTIVE, CANCELLED, DONE, JobQueue
+    from utils.telemetry import TelemetryWriter, tagged
+    from utils.history import create_history_index, history_body, history_counts, history_page
+    from Auth_Backend.tracing import activate, current_span, get_tracer, inject, span, traced
     
     # Initialize database tables if needed
     import os
@@ -45,12 +61,215 @@ except ImportError as e:
 # AWS BEDROCK CONFIG
 # -------------------------------
 BEDROCK_API_KEY = st.secrets["BEDROCK_API_KEY"]
-BEDROCK_URL = "https://bedrock-runtime.us-east-1.amazonaws.com/model/amazon.nova-micro-v1:0/invoke"
+# BEDROCK_URL can point at benchmarks/bedrock_stub.py for load and latency testing
+BEDROCK_URL = os.getenv("BEDROCK_URL") or st.secrets.get(
+    "BEDROCK_URL",
+    "https://bedrock-runtime.us-east-1.amazonaws.com/model/amazon.nova-micro-v1:0/invoke"
+)
+
+# Stream the generation step token by token; UI updates are coalesced to this cadence
+BEDROCK_STREAMING = str(st.secrets.get("BEDROCK_STREAMING", "true")).lower() == "true"
+STREAM_RENDER_INTERVAL = float(st.secrets.get("STREAM_RENDER_INTERVAL", 0.15))
+
+# "hybrid" shows rule-based scores at once and refines them with Bedrock in the background;
+# "local" uses only the rule-based engine; "llm" waits for Bedrock's scores
+EVALUATION_MODE = str(st.secrets.get("EVALUATION_MODE", "hybrid")).lower()
+REFINE_POLL_INTERVAL = float(st.secrets.get("REFINE_POLL_INTERVAL", 1.0))
+
+# Follow-up calls allowed to finish a generation that hit its token budget
+MAX_CONTINUATIONS = int(st.secrets.get("MAX_CONTINUATIONS", 2))
+
+# Prompts keep a static prefix per call site; a cache point follows it once it is long enough to cache
+PROMPT_CACHE_POINTS = str(st.secrets.get("PROMPT_CACHE_POINTS", "true")).lower() == "true"
+PROMPT_CACHE_MIN_TOKENS = int(st.secrets.get("PROMPT_CACHE_MIN_TOKENS", 1024))
+
+# Variants requested concurrently per generation; above 1 the best-scoring one is shown first
+GENERATION_VARIANTS = max(1, int(st.secrets.get("GENERATION_VARIANTS", 1)))
+# Seconds each variant call may take, fallbacks included, before it is given up on
+VARIANT_TIMEOUT = float(st.secrets.get("VARIANT_TIMEOUT", 45))
+
+# Number of refined prompt options offered for an idea
+PROMPT_OPTIONS = max(1, int(st.secrets.get("PROMPT_OPTIONS", 2)))
+
+# Model calls run as background jobs that outlive reruns and refreshes; the page polls them at this cadence
+JOB_WORKERS = int(st.secrets.get("JOB_WORKERS", 4))
+JOB_POLL_INTERVAL = float(st.secrets.get("JOB_POLL_INTERVAL", 0.3))
+# How long (seconds) a generation started before a browser refresh is offered for resuming
+JOB_RESUME_WINDOW = float(st.secrets.get("JOB_RESUME_WINDOW", 600))
+
+# Saved drafts fetched per "Load more"
+HISTORY_PAGE_SIZE = max(1, int(st.secrets.get("HISTORY_PAGE_SIZE", 20)))
+# Opened draft bodies kept per session, so reruns do not fetch them again
+HISTORY_BODY_CACHE = max(1, int(st.secrets.get("HISTORY_BODY_CACHE", 20)))
+
+DEGRADED_MESSAGE = "⚠️ The AI service is having trouble right now. Showing a simplified result - please try again shortly."
+
+# Response cache lifetimes per call site (seconds)
+CACHE_TTL_PROMPTS = 24 * 3600
+CACHE_TTL_GENERATION = 3600
+CACHE_TTL_EVALUATION = 7 * 24 * 3600
+
+@st.cache_resource
+def get_bedrock_client():
+    """Create the pooled Bedrock client once and share it across all sessions"""
+    return BedrockClient(
+        BEDROCK_URL,
+        BEDROCK_API_KEY,
+        pool_maxsize=int(st.secrets.get("BEDROCK_POOL_SIZE", 20)),
+        connect_timeout=float(st.secrets.get("BEDROCK_CONNECT_TIMEOUT", 3.05)),
+        read_timeout=float(st.secrets.get("BEDROCK_READ_TIMEOUT", 30)),
+        hedging=str(st.secrets.get("BEDROCK_HEDGING", "false")).lower() == "true",
+        breaker=CircuitBreaker(
+            failure_threshold=int(st.secrets.get("BEDROCK_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(st.secrets.get("BEDROCK_BREAKER_RESET", 30)),
+        ),
+        limiter=AdaptiveLimiter(
+            initial_limit=int(st.secrets.get("BEDROCK_INITIAL_CONCURRENCY", 8)),
+            max_limit=int(st.secrets.get("BEDROCK_MAX_IN_FLIGHT", 16)),
+            max_queue=int(st.secrets.get("BEDROCK_MAX_QUEUE", 64)),
+            queue_timeout=float(st.secrets.get("BEDROCK_QUEUE_TIMEOUT", 20)),
+        ),
+    )
+
+@st.cache_resource
+def get_telemetry():
+    """Per-call tokens, latency, status and cost, written in batches next to users.db"""
+    return TelemetryWriter(
+        st.secrets.get("TELEMETRY_DB_PATH", "telemetry.db"),
+        flush_interval=float(st.secrets.get("TELEMETRY_FLUSH_INTERVAL", 2.0)),
+        snapshot_interval=float(st.secrets.get("TELEMETRY_STATS_INTERVAL", 60)),
+    )
 
-HEADERS = {
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {BEDROCK_API_KEY}"
-}
+@st.cache_resource
+def get_model_router():
+    """Per-call-site model routing on top of the shared Bedrock client"""
+    routes = st.secrets.get("BEDROCK_ROUTES", {})
+    telemetry = get_telemetry()
+    tracer = get_tracer()
+    
+    def record_call(call):
+        telemetry.record_call(call)
+        tracer.record_call(call)
+    
+    return ModelRouter(
+        get_bedrock_client(),
+        routes={site: dict(route) for site, route in routes.items()},
+        probe_interval=float(st.secrets.get("BEDROCK_ROUTE_PROBE_INTERVAL", 30)),
+        sink=record_call,
+    )
+
+@st.cache_resource
+def get_response_cache():
+    """Create the shared two-tier response cache once per process"""
+    return ResponseCache(
+        st.secrets.get("RESPONSE_CACHE_PATH", "response_cache.db"),
+        max_memory_bytes=int(st.secrets.get("RESPONSE_CACHE_MEMORY_MB", 8)) * 1024 * 1024,
+        max_disk_bytes=int(st.secrets.get("RESPONSE_CACHE_DISK_MB", 64)) * 1024 * 1024,
+    )
+
+@st.cache_resource
+def get_idea_cache():
+    """Near-duplicate index of ideas already turned into prompt pairs, per user"""
+    return SemanticCache(
+        threshold=float(st.secrets.get("IDEA_CACHE_THRESHOLD", 0.85)),
+        max_entries=int(st.secrets.get("IDEA_CACHE_MAX_ENTRIES", 20000)),
+    )
+
+@st.cache_resource
+def get_structured_output():
+    """Schema validation, local repair and re-ask bookkeeping shared by all sessions"""
+    return StructuredOutput()
+
+@st.cache_resource
+def ensure_variants_table():
+    """content_variants was added after users.db files already existed; create it if missing"""
+    ContentVariants.__table__.create(bind=engine, checkfirst=True)
+    return True
+
+@st.cache_resource
+def ensure_history_index():
+    """The (user_email, created_at, id) index came after users.db files already existed"""
+    create_history_index(engine)
+    return True
+
+@st.cache_resource
+def get_prompt_registry():
+    return PromptRegistry(cache_points=PROMPT_CACHE_POINTS, min_cache_tokens=PROMPT_CACHE_MIN_TOKENS)
+
+@st.cache_resource
+def get_token_planner():
+    """Generation token budgets, with per-content-type ratios seeded from stored history"""
+    planner = TokenBudgetPlanner()
+    try:
+        db = SessionLocal()
+        rows = (
+            db.query(ContentHistory.content_type, ContentHistory.word_limit, ContentHistory.generated_content)
+            .order_by(ContentHistory.created_at.desc())
+            .limit(int(st.secrets.get("TOKEN_PLANNER_HISTORY", 1000)))
+            .all()
+        )
+        db.close()
+        planner.learn(rows)
+    except Exception:
+        pass  # Built-in priors are a fine start
+    return planner
+
+@st.cache_resource
+def get_job_queue():
+    """
+    Background jobs shared by all sessions. Handlers run on worker threads
+    outside any script run, so they are handed the shared resources here
+    instead of reaching for st.* themselves.
+    """
+    router = get_model_router()
+    cache = get_response_cache()
+    planner = get_token_planner()
+    registry = get_prompt_registry()
+    structured = get_structured_output()
+    telemetry = get_telemetry()
+    
+    def attributed(kind, handler):
+        """
+        Charge the job's calls to the user who submitted it and the content
+        type it is for, and trace them under the script run that submitted it
+        """
+        def run(payload, job):
+            with tagged(user=job.owner, content_type=payload["values"].get("content_type")), \
+                    span(f"job.{kind}", parent=job.trace, **{"job.id": job.id}):
+                return handler(payload, job)
+        return run
+    
+    jobs = JobQueue(
+        st.secrets.get("JOB_DB_PATH", "jobs.db"),
+        workers=JOB_WORKERS,
+        progress_interval=STREAM_RENDER_INTERVAL,
+    )
+    jobs.register("prompts", attributed("prompts",
+        lambda payload, job: run_prompts_job(payload, job, router, cache, registry)
+    ))
+    jobs.register("generation", attributed("generation",
+        lambda payload, job: run_generation_job(payload, job, router, cache, planner, registry)
+    ))
+    jobs.register("evaluation", attributed("evaluation",
+        lambda payload, job: run_evaluation_job(payload, job, router, cache, structured, registry, telemetry)
+    ))
+    return jobs.start()
+
+@st.cache_resource
+def watch_component_stats():
+    """
+    Snapshot the shared components' counters into telemetry every
+    TELEMETRY_STATS_INTERVAL seconds (the stats table in telemetry.db)
+    """
+    telemetry = get_telemetry()
+    telemetry.watch("bedrock_client", get_bedrock_client().stats)
+    telemetry.watch("model_router", get_model_router().stats)
+    telemetry.watch("response_cache", get_response_cache().stats)
+    telemetry.watch("idea_cache", get_idea_cache().stats)
+    telemetry.watch("structured_output", get_structured_output().stats)
+    telemetry.watch("job_queue", get_job_queue().stats)
+    telemetry.watch("telemetry", telemetry.stats)
+    return True
 
 # -------------------------------
 # SESSION STATE INITIALIZATION
@@ -60,8 +279,12 @@ def init_session_state():
         "page": "new_content",
         "step": "input",
         "generated_prompts": [],
+        "prompts_pending": False,
         "selected_prompt": None,
         "final_content": None,
+        "variants": [],
+        "variant_index": 0,
+        "history_id": None,
         "user_idea": "",
         "content_type": None,
         "tone": None,
@@ -76,6 +299,17 @@ def init_session_state():
         "theme": "dark",
         "show_evaluation": False,
         "evaluation_scores": None,
+        "local_scores": None,
+        "evaluation_refined": False,
+        "refine_failed": False,
+        "models_used": {},
+        "jobs": {},
+        "generation_error": None,
+        "history_items": [],
+        "history_cursor": None,
+        "history_query": None,
+        "history_counts": None,
+        "history_bodies": {},
         "user_templates": [],
         "default_templates": [
             {
@@ -109,39 +343,171 @@ def init_session_state():
             st.session_state[key] = value
 
 init_session_state()
+watch_component_stats()
+
+# -------------------------------
+# RERUN TRACING
+# -------------------------------
+def begin_rerun_span():
+    """
+    Trace this script run. A run cut short by st.rerun() or st.stop() never
+    reaches end_rerun_span(), so its span is closed when the session's next
+    run starts (marked ended_by="next_run").
+    """
+    previous = st.session_state.get("_rerun_span")
+    if previous is not None:
+        previous.end(ended_by="next_run")
+    rerun = get_tracer().start_span(
+        "streamlit.rerun", **{"app.page": st.session_state.page, "app.step": st.session_state.step}
+    )
+    st.session_state._rerun_span = rerun
+    st.session_state._rerun_traceparent = rerun.context.traceparent
+    activate(rerun)
+
+def end_rerun_span():
+    rerun = st.session_state.pop("_rerun_span", None)
+    if rerun is not None:
+        rerun.end(ended_by="completed")
+    activate(None)
+
+def traced_fragment(name: str):
+    """
+    traced() for st.fragment functions. A fragment's own timed rerun runs
+    without the page script, so there is no rerun span to nest under; its
+    span joins the trace of the session's last full run instead of starting
+    a new trace every poll.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            current = current_span()
+            parent = current or st.session_state.get("_rerun_traceparent")
+            with span(name, parent=parent, **{"streamlit.fragment_rerun": current is None}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+begin_rerun_span()
 
 # -------------------------------
 # DATABASE UTILITIES
 # -------------------------------
-def get_user_history(email: str):
-    """Fetch all history for a user"""
+@traced("db.get_history_page")
+def get_history_page(email: str, after: tuple = None, search: str = None):
+    """One page of a user's history, newest first, and the cursor of the next page"""
     try:
+        ensure_history_index()
         db = SessionLocal()
-        items = (
-            db.query(ContentHistory)
-            .filter(ContentHistory.user_email == email)
-            .order_by(ContentHistory.created_at.desc())
-            .all()
-        )
+        page = history_page(db, email, HISTORY_PAGE_SIZE, after, search)
+        db.close()
+        return page
+    except Exception as e:
+        st.error(f"Database error: {str(e)}")
+        return [], None
+
+@traced("db.get_history_counts")
+def get_history_counts(email: str) -> dict:
+    """Saved items per content type"""
+    try:
+        ensure_history_index()
+        db = SessionLocal()
+        counts = history_counts(db, email)
+        db.close()
+        return counts
+    except Exception as e:
+        st.error(f"Database error: {str(e)}")
+        return {}
+
+def current_history(email: str, search: str) -> list:
+    """The pages of history loaded so far; the first page is fetched when the email or search changes"""
+    query = (email, search)
+    if st.session_state.history_query != query:
+        st.session_state.history_items, st.session_state.history_cursor = get_history_page(email, search=search)
+        st.session_state.history_query = query
+    return st.session_state.history_items
+
+def load_more_history():
+    email, search = st.session_state.history_query
+    items, cursor = get_history_page(email, after=st.session_state.history_cursor, search=search)
+    st.session_state.history_items = st.session_state.history_items + items
+    st.session_state.history_cursor = cursor
+
+def user_history_counts(email: str) -> dict:
+    if st.session_state.history_counts is None:
+        st.session_state.history_counts = get_history_counts(email)
+    return st.session_state.history_counts
+
+@traced("db.get_history_body")
+def get_history_body(item_id: int) -> str:
+    try:
+        db = SessionLocal()
+        body = history_body(db, item_id)
         db.close()
-        return items
+        return body or ""
     except Exception as e:
         st.error(f"Database error: {str(e)}")
-        return []
+        return ""
+
+def history_item_body(item_id: int) -> str:
+    """A draft's content, from the session's small cache of recently opened bodies"""
+    bodies = st.session_state.history_bodies
+    if item_id in bodies:
+        bodies[item_id] = bodies.pop(item_id)  # Most recently used last
+    else:
+        bodies[item_id] = get_history_body(item_id)
+        while len(bodies) > HISTORY_BODY_CACHE:
+            bodies.pop(next(iter(bodies)))
+    return bodies[item_id]
+
+def invalidate_history(item_id: int = None):
+    """Saved items changed: fetch the list and counts (and that item's body) again when next shown"""
+    st.session_state.history_query = None
+    st.session_state.history_counts = None
+    st.session_state.history_bodies.pop(item_id, None)
+
+def pack_variants(variants: list) -> bytes:
+    return zlib.compress(json.dumps(variants, separators=(",", ":")).encode("utf-8"))
+
+def unpack_variants(data: bytes) -> list:
+    return json.loads(zlib.decompress(data).decode("utf-8")) if data else []
+
+def get_history_variants(history_id: int):
+    """(variants, selected index) stored for a history item; ([], 0) if it has none"""
+    try:
+        ensure_variants_table()
+        db = SessionLocal()
+        row = db.query(ContentVariants).filter(ContentVariants.history_id == history_id).first()
+        db.close()
+        return (unpack_variants(row.data), row.selected or 0) if row else ([], 0)
+    except Exception:
+        return [], 0
+
+def select_history_variant(history_id: int, index: int, content: str):
+    """Make a different variant the one a history item shows"""
+    try:
+        db = SessionLocal()
+        db.query(ContentHistory).filter(ContentHistory.id == history_id).update({"generated_content": content})
+        db.query(ContentVariants).filter(ContentVariants.history_id == history_id).update({"selected": index})
+        db.commit()
+        db.close()
+    except Exception as e:
+        st.error(f"Save error: {str(e)}")
 
 def delete_history_item(item_id: int):
     """Delete a single history item"""
     try:
+        ensure_variants_table()
         db = SessionLocal()
         item = db.query(ContentHistory).filter(ContentHistory.id == item_id).first()
         if item:
+            db.query(ContentVariants).filter(ContentVariants.history_id == item_id).delete()
             db.delete(item)
             db.commit()
         db.close()
     except Exception as e:
         st.error(f"Delete error: {str(e)}")
 
-def load_history_item(item: ContentHistory):
+def load_history_item(item):
     """Load history back into session"""
     st.session_state.selected_prompt = item.title
     st.session_state.content_type = item.content_type
@@ -149,13 +515,21 @@ def load_history_item(item: ContentHistory):
     st.session_state.audience = item.audience
     st.session_state.purpose = item.purpose
     st.session_state.word_limit = item.word_limit
-    st.session_state.final_content = item.generated_content
+    st.session_state.final_content = history_item_body(item.id)
+    st.session_state.history_id = item.id
+    st.session_state.variants, st.session_state.variant_index = get_history_variants(item.id)
+    st.session_state.jobs = {}
+    st.session_state.generation_error = None
+    reset_evaluation()
     st.session_state.step = "generation"
     st.session_state.page = "new_content"
 
-def save_to_database(email, title, content_type, tone, audience, purpose, word_limit, content):
-    """Save generated content to database"""
+@traced("db.save_to_database")
+def save_to_database(email, title, content_type, tone, audience, purpose, word_limit, content, variants=None):
+    """Save generated content to database, with any alternative variants packed into one row; returns the history id"""
     try:
+        if variants:
+            ensure_variants_table()
         db = SessionLocal()
         history = ContentHistory(
             user_email=email,
@@ -168,9 +542,13 @@ def save_to_database(email, title, content_type, tone, audience, purpose, word_l
             generated_content=content
         )
         db.add(history)
+        if variants:
+            db.flush()
+            db.add(ContentVariants(history_id=history.id, selected=0, data=pack_variants(variants)))
         db.commit()
+        history_id = history.id
         db.close()
-        return True
+        return history_id
     except Exception as e:
         st.error(f"Save error: {str(e)}")
         return False
@@ -183,68 +561,653 @@ def clean_model_output(text: str) -> str:
     text = text.replace("<", "").replace(">", "")
     return text.strip()
 
-def call_bedrock_api(prompt: str, max_tokens: int = 500, temperature: float = 0.7):
-    """Call Bedrock API"""
-    payload = {
-        "messages": [{"role": "user", "content": [{"text": prompt}]}],
-        "inferenceConfig": {"maxTokens": max_tokens, "temperature": temperature}
-    }
-    
+def clean_model_stream(chunks):
+    """Incrementally clean streamed model output, holding back partially received tags"""
+    pending = ""
+    started = False
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind("<")
+        if cut != -1 and ">" not in pending[cut:] and len(pending) - cut < 200:
+            ready, pending = pending[:cut], pending[cut:]
+        else:
+            ready, pending = pending, ""
+
+        ready = re.sub(r"</?[^>]+>", "", ready).replace("<", "").replace(">", "")
+        if not started:
+            ready = ready.lstrip()
+            started = bool(ready)
+        if ready:
+            yield ready
+
+    tail = re.sub(r"</?[^>]+>", "", pending).replace("<", "").replace(">", "")
+    if not started:
+        tail = tail.lstrip()
+    if tail:
+        yield tail
+
+def record_model(site: str, model_id: str):
+    """Remember which model served this session's latest call at a call site"""
+    if model_id:
+        st.session_state.models_used[site] = model_id
+
+def response_cache_key(prompt: str, max_tokens: int, temperature: float, site: str = "generation") -> str:
+    return make_cache_key(get_model_router().primary(site), prompt, max_tokens, temperature)
+
+def session_tags():
+    """Telemetry attribution for calls made from this session's script run"""
+    return tagged(user=st.session_state.get("email"), content_type=st.session_state.get("content_type"))
+
+def record_cache_hit(site: str, started: float):
+    """A response served from a cache still counts as a call site hit, at no token cost"""
+    with session_tags():
+        get_telemetry().record(site, get_model_router().primary(site), latency=time.monotonic() - started, cache_hit=True)
+
+def cached_response(site: str, key: str):
+    """Response cache lookup; a hit is recorded in telemetry"""
+    started = time.monotonic()
+    value = get_response_cache().get(key)
+    if value is not None:
+        record_cache_hit(site, started)
+    return value
+
+def call_bedrock_api(prompt: str, max_tokens: int = 500, temperature: float = 0.7, site: str = "generation"):
+    """One uncached Bedrock call through the model router (used to re-ask for a valid reply)"""
     try:
-        response = requests.post(BEDROCK_URL, headers=HEADERS, json=payload, timeout=30)
+        with session_tags():
+            response, model_id = get_model_router().invoke(site, build_payload(prompt, max_tokens, temperature))
+        record_model(site, model_id)
         if response.status_code == 200:
-            return response.json()["output"]["message"]["content"][0]["text"]
+            return response_text(response)
+    except (CircuitOpenError, LimiterRejected):
+        st.warning(DEGRADED_MESSAGE)
     except Exception as e:
         st.error(f"API Error: {str(e)}")
     return None
 
-def evaluate_content(content: str, content_type: str, tone: str, audience: str, purpose: str):
-    """Evaluate content quality and return scores"""
-    evaluation_prompt = f"""Analyze this {content_type} and provide quality scores (0-100) for each criterion.
+def show_variant(index: int):
+    """Put another variant on screen (no API call) and remember the choice in history"""
+    variant = st.session_state.variants[index]
+    cancel_background_evaluation()
+    st.session_state.variant_index = index
+    st.session_state.final_content = variant["content"]
+    reset_evaluation()
+    if st.session_state.history_id:
+        select_history_variant(st.session_state.history_id, index, variant["content"])
+        invalidate_history(st.session_state.history_id)
+    if EVALUATION_MODE in ("llm", "hybrid"):
+        start_background_evaluation()
+
+def render_variant_picker():
+    variants = st.session_state.variants
+    index = st.session_state.variant_index
+    col_prev, col_info, col_next = st.columns([1, 4, 1])
+    with col_prev:
+        if st.button("◀ Previous", key="variant_prev", disabled=index == 0, use_container_width=True):
+            show_variant(index - 1)
+            st.rerun()
+    with col_info:
+        label = "best match" if index == 0 else f"#{index + 1} by local score"
+        words = len(variants[index]["content"].split())
+        st.markdown(
+            f'<div style="text-align: center; color: {theme_colors["text_secondary"]}; padding-top: 0.5rem;">'
+            f'Variant {index + 1} of {len(variants)} · {label} · score {variants[index]["score"]} · {words} words</div>',
+            unsafe_allow_html=True
+        )
+    with col_next:
+        if st.button("Next ▶", key="variant_next", disabled=index == len(variants) - 1, use_container_width=True):
+            show_variant(index + 1)
+            st.rerun()
 
-Content to evaluate:
-{content}
+def fallback_prompts(idea: str) -> str:
+    """Locally built prompt pair, served while Bedrock is unavailable"""
+    return json.dumps({
+        "prompt1": {"title": "Tell the Story", "prompt": f"Share the story behind this, what happened and why it matters: {idea}"},
+        "prompt2": {"title": "Highlight the Impact", "prompt": f"Focus on the results, the skills involved and the lessons learned: {idea}"}
+    })
 
-Expected characteristics:
-- Tone: {tone}
-- Audience: {audience}
-- Purpose: {purpose}
+def build_prompts_prompt(idea: str, count: int) -> str:
+    return get_prompt_registry().render("prompts", idea=idea, count=count)
 
-Provide scores in this exact JSON format:
-{{
-    "clarity": 85,
-    "engagement": 78,
-    "tone_consistency": 92,
-    "audience_relevance": 88,
-    "professionalism": 90
-}}
+def prompts_max_tokens(count: int) -> int:
+    return 300 * count + 200
 
-Only return the JSON, no other text."""
-    
-    response = call_bedrock_api(evaluation_prompt, 300, 0.3)
-    
-    if response:
+def order_prompts(prompts_data: dict) -> list:
+    """Prompt options in prompt1, prompt2, ... order"""
+    return [prompts_data[key] for key in sorted(prompts_data, key=lambda k: int(re.sub(r"\D", "", k) or 0))]
+
+def settle_prompts(idea: str, prompt: str, max_tokens: int, response: str, degraded: str):
+    """Validate a prompt suggestions reply and keep the options for the prompt_selection step"""
+    prompts_data = parse_structured(
+        "prompts", response, max_tokens,
+        response_cache_key(prompt, max_tokens, 0.8, "prompts"), CACHE_TTL_PROMPTS
+    )
+    if prompts_data is None:
+        st.warning("⚠️ We couldn't read the AI's suggestions, so here are two starting points instead.")
+        response, prompts_data = degraded, json.loads(degraded)
+    st.session_state.generated_prompts = order_prompts(prompts_data)
+    if response != degraded:
+        get_idea_cache().add(idea, st.session_state.generated_prompts, owner=st.session_state.get("email"))
+
+def prompt_card_slots(count: int) -> list:
+    """One placeholder per prompt option, laid out in rows of two or three"""
+    per_row = min(count, 3 if count % 3 == 0 else 2)
+    slots = []
+    for start in range(0, count, per_row):
+        for col in st.columns(per_row)[:count - start]:
+            slots.append(col.empty())
+    return slots
+
+def render_prompt_card(slot, opt: dict, idx: int = None):
+    """Fill a slot with a prompt option; the select button is added once all options are in"""
+    with slot.container():
+        st.markdown(f"""
+            <div class="prompt-card">
+                <div class="prompt-title">{opt['title']}</div>
+                <div class="prompt-text">{opt['prompt']}</div>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        if idx is not None and st.button("Select This Prompt", key=f"sel_{idx}", use_container_width=True):
+            st.session_state.selected_prompt = opt['prompt']
+            st.session_state.step = "preferences"
+            st.rerun()
+
+def render_pending_card(slot, idx: int):
+    slot.markdown(f"""
+        <div class="prompt-card" style="opacity: 0.55;">
+            <div class="prompt-title">Option {idx + 1}</div>
+            <div class="prompt-text">✍️ Crafting this option...</div>
+        </div>
+    """, unsafe_allow_html=True)
+
+@traced_fragment("fragment.poll_prompts_job")
+def poll_prompts_job():
+    """
+    Fill the prompt cards from the job's partial output as each option's
+    JSON object completes; settle the options with a full rerun once it ends.
+    """
+    job_id = st.session_state.jobs.get("prompts")
+    if not job_id:
+        return
+    jobs = get_job_queue()
+    job = jobs.get(job_id)
+    if job is not None and job["status"] in ACTIVE:
+        options = [opt for _, opt in get_structured_output().members("prompts", [job["progress"] or ""])]
+        for idx, slot in enumerate(prompt_card_slots(PROMPT_OPTIONS)):
+            if idx < len(options):
+                render_prompt_card(slot, options[idx])
+            else:
+                render_pending_card(slot, idx)
+        return
+    
+    del st.session_state.jobs["prompts"]
+    if job is None:
+        st.rerun()  # Purged before we saw it; the step submits it again
+    jobs.ack(job_id)
+    idea = st.session_state.user_idea
+    degraded = fallback_prompts(idea)
+    response = None
+    if job["status"] == DONE:
+        record_model("prompts", job["result"]["model"])
+        response = job["result"]["text"]
+    elif job["status"] != CANCELLED:
+        show_job_error(job)
+    st.session_state.prompts_pending = False
+    settle_prompts(
+        idea, build_prompts_prompt(idea, PROMPT_OPTIONS), prompts_max_tokens(PROMPT_OPTIONS),
+        response or degraded, degraded
+    )
+    st.rerun()
+
+def evaluation_values(content: str, content_type: str, tone: str, audience: str, purpose: str) -> dict:
+    return {"content": content, "content_type": content_type, "tone": tone, "audience": audience, "purpose": purpose}
+
+def with_overall(scores: dict) -> dict:
+    """The five validated scores plus "overall", their rounded-down mean"""
+    scores = {key: scores[key] for key in SCORE_KEYS}
+    scores["overall"] = int(sum(scores.values()) / len(scores))
+    return scores
+
+def parse_structured(site: str, response: str, max_tokens: int, cache_key: str = None, cache_ttl: float = None):
+    """
+    Validate a reply against the call site's schema, repairing it locally and
+    re-asking the model at most once. A repaired or re-asked result replaces
+    the raw reply in the response cache so the fix is not paid for twice.
+    """
+    value, outcome = get_structured_output().resolve(
+        site,
+        clean_model_output(response),
+        lambda reask_prompt: call_bedrock_api(reask_prompt, max_tokens, 0.0, site=site)
+    )
+    if value is not None and outcome != "clean" and cache_key:
+        get_response_cache().set(cache_key, json.dumps(value), cache_ttl)
+    return value
+
+def evaluate_content(content: str, content_type: str, tone: str, audience: str, purpose: str,
+                     word_limit: int = None):
+    """
+    Evaluate content quality and return scores. In "llm" mode this waits on
+    the session's background evaluation of final_content (queued now if
+    there is none yet) rather than submitting a second job
+    """
+    if EVALUATION_MODE != "llm":
+        return score_content(content, content_type, tone, audience, purpose, word_limit)
+    
+    if current_evaluation_job() is None:
+        start_background_evaluation()
+    scores = background_evaluation_result()
+    if scores:
+        return scores
+    
+    # Rule-based estimate rather than made-up numbers
+    return score_content(content, content_type, tone, audience, purpose, word_limit)
+
+# -------------------------------
+# BACKGROUND JOBS
+# -------------------------------
+# Handlers run on JobQueue worker threads, outside any script run: no st.* in
+# here. Partial text goes out through job.progress() for the polling fragments.
+def stream_job_text(router, site: str, payload: dict, job, prefix: str = ""):
+    """Stream a call, publishing prefix plus the text so far as job progress; returns (text, meta)"""
+    meta = {}
+    text = ""
+    shown = f"{prefix} " if prefix else ""
+    for delta in clean_model_stream(router.invoke_stream(site, payload, meta, job.cancel_event)):
+        text += delta
+        job.progress(shown + text)
+    text = text.strip()
+    job.progress(shown + text, force=True)
+    return text, meta
+
+def invoke_job_text(router, site: str, payload: dict, job):
+    """One non-streamed call; returns (text, meta) and raises on an error status"""
+    response, model_id = router.invoke(site, payload, job.cancel_event)
+    if response.status_code != 200:
+        raise RuntimeError(f"Bedrock returned HTTP {response.status_code}")
+    body = response.json()
+    meta = {"model": model_id, "stopReason": body.get("stopReason"), "usage": body.get("usage")}
+    return clean_model_output(response_text(response)), meta
+
+def generation_cache_key(router, prompt: str, word_limit: int, variants: int) -> str:
+    # Cached content is always finished, so the key ignores the (learned, drifting) token budget
+    key = make_cache_key(router.primary("generation"), prompt, word_limit, 0.7)
+    return key if variants == 1 else f"{key}:variants:{variants}"
+
+def run_prompts_job(payload: dict, job, router, cache, registry):
+    prompt = registry.render("prompts", **payload["values"])
+    call = build_payload(prompt, payload["max_tokens"], 0.8)
+    if payload["stream"]:
+        text, meta = stream_job_text(router, "prompts", call, job)
+    else:
+        text, meta = invoke_job_text(router, "prompts", call, job)
+    job.check()
+    if text:
+        cache.set(make_cache_key(router.primary("prompts"), prompt, payload["max_tokens"], 0.8), text, CACHE_TTL_PROMPTS)
+    return {"text": text, "model": meta.get("model")}
+
+def generate_complete(router, planner, prompt: str, values: dict, stream: bool, job):
+    """
+    Generate within the planned token budget. If the reply was cut off (by its
+    stop reason, or its shape when there is none), ask only for the rest and
+    stitch it on, up to MAX_CONTINUATIONS times. Returns (content, model).
+    """
+    content_type, word_limit = values["content_type"], values["word_limit"]
+    
+    def generate(text_prompt: str, max_tokens: int, prefix: str = ""):
+        call = build_payload(text_prompt, max_tokens, 0.7)
+        if stream:
+            return stream_job_text(router, "generation", call, job, prefix)
+        return invoke_job_text(router, "generation", call, job)
+    
+    content, meta = generate(prompt, planner.plan(content_type, word_limit))
+    model = meta.get("model")
+    if not content:
+        return None, model
+    
+    truncated = first_truncated = planner.is_truncated(content, meta.get("stopReason"))
+    output_tokens = (meta.get("usage") or {}).get("outputTokens", 0)
+    continuations = 0
+    while truncated and continuations < MAX_CONTINUATIONS:
+        job.check()
+        budget = planner.plan_continuation(content_type, word_limit, content)
         try:
-            cleaned = clean_model_output(response)
-            if "```json" in cleaned:
-                cleaned = cleaned.split("```json")[1].split("```")[0].strip()
-            elif "```" in cleaned:
-                cleaned = cleaned.split("```")[1].split("```")[0].strip()
-            
-            scores = json.loads(cleaned)
-            scores["overall"] = int(sum(scores.values()) / len(scores))
-            return scores
-        except Exception as e:
-            return {
-                "clarity": 75,
-                "engagement": 70,
-                "tone_consistency": 80,
-                "audience_relevance": 75,
-                "professionalism": 78,
-                "overall": 76
-            }
+            rest, meta = generate(continuation_prompt(prompt, content), budget, prefix=content)
+        except Exception:
+            break  # Keep what we have rather than fail the whole generation
+        if not rest:
+            break
+        continuations += 1
+        content = stitch(content, rest)
+        output_tokens += (meta.get("usage") or {}).get("outputTokens", 0)
+        truncated = planner.is_truncated(rest, meta.get("stopReason"))
+    
+    planner.record(content_type, first_truncated, continuations, finished=not truncated)
+    if not truncated:
+        planner.observe(content_type, word_limit, content, output_tokens or None)
+    return content, meta.get("model") or model
+
+def variant_temperatures(count: int) -> list:
+    """Distinct temperatures from 0.7 to 1.0, so variants differ (and are not collapsed as duplicates)"""
+    if count == 1:
+        return [0.7]
+    return [round(0.7 + 0.3 * i / (count - 1), 3) for i in range(count)]
+
+def invoke_drafts(router, payloads: list, job):
+    """
+    Run generation calls concurrently, each limited to VARIANT_TIMEOUT;
+    returns ((text, stopReason) or None per payload, model). If every call
+    failed, the first error is raised.
+    """
+    drafts = []
+    errors = []
+    model = None
+    for result in router.invoke_many("generation", payloads, VARIANT_TIMEOUT, job.cancel_event):
+        if isinstance(result, BaseException):
+            errors.append(result)
+            drafts.append(None)
+            continue
+        response, model_id = result
+        if response.status_code != 200:
+            errors.append(RuntimeError(f"Bedrock returned HTTP {response.status_code}"))
+            drafts.append(None)
+            continue
+        model = model_id
+        drafts.append((clean_model_output(response_text(response)), response.json().get("stopReason")))
+    if errors and not any(drafts):
+        raise errors[0]
+    return drafts, model
+
+def generate_variants(router, planner, prompt: str, values: dict, count: int, job):
+    """
+    Request count variants concurrently, finish any that were truncated, and
+    rank them with the local scorer (which weighs word-limit fit and tone).
+    Returns ([{"content", "score"}] best first, model).
+    """
+    content_type, word_limit = values["content_type"], values["word_limit"]
+    budget = planner.plan(content_type, word_limit)
+    temperatures = variant_temperatures(count)
+    
+    variants = []
+    drafts, model = invoke_drafts(router, [build_payload(prompt, budget, t) for t in temperatures], job)
+    for temperature, draft in zip(temperatures, drafts):
+        if draft and draft[0]:
+            truncated = planner.is_truncated(*draft)
+            variants.append({"content": draft[0], "temperature": temperature, "first_truncated": truncated,
+                             "truncated": truncated, "continuations": 0})
+    
+    for _ in range(MAX_CONTINUATIONS):
+        job.check()
+        pending = [v for v in variants if v["truncated"]]
+        if not pending:
+            break
+        payloads = [
+            build_payload(continuation_prompt(prompt, v["content"]),
+                          planner.plan_continuation(content_type, word_limit, v["content"]), v["temperature"])
+            for v in pending
+        ]
+        try:
+            drafts, _ = invoke_drafts(router, payloads, job)
+        except Exception:
+            break
+        for variant, draft in zip(pending, drafts):
+            if draft and draft[0]:
+                variant["content"] = stitch(variant["content"], draft[0])
+                variant["continuations"] += 1
+                variant["truncated"] = planner.is_truncated(*draft)
+    
+    for variant in variants:
+        planner.record(content_type, variant["first_truncated"], variant["continuations"], finished=not variant["truncated"])
+        if not variant["truncated"]:
+            planner.observe(content_type, word_limit, variant["content"])
+    
+    scores = score_many([
+        {
+            "content": variant["content"],
+            "content_type": content_type,
+            "tone": values["tone"],
+            "audience": values["audience"],
+            "purpose": values["purpose"],
+            "word_limit": word_limit,
+        }
+        for variant in variants
+    ])
+    ranked = sorted(zip(variants, scores), key=lambda pair: -pair[1]["overall"])
+    return [{"content": variant["content"], "score": score["overall"]} for variant, score in ranked], model
+
+def run_generation_job(payload: dict, job, router, cache, planner, registry):
+    values = payload["values"]
+    count = payload["variants"]
+    prompt = registry.render("generation", **values)
+    key = generation_cache_key(router, prompt, values["word_limit"], count)
+    
+    if count > 1:
+        variants, model = generate_variants(router, planner, prompt, values, count, job)
+        job.check()
+        if not variants:
+            raise RuntimeError("the model returned no content")
+        cache.set(key, json.dumps(variants), CACHE_TTL_GENERATION)
+        return {"content": variants[0]["content"], "variants": variants, "model": model}
+    
+    content, model = generate_complete(router, planner, prompt, values, payload["stream"], job)
+    job.check()
+    if not content:
+        raise RuntimeError("the model returned no content")
+    cache.set(key, content, CACHE_TTL_GENERATION)
+    return {"content": content, "variants": [], "model": model}
+
+def run_evaluation_job(payload: dict, job, router, cache, structured, registry, telemetry):
+    """LLM scores for one piece of content; None if the reply could not be made valid"""
+    values = payload["values"]
+    prompt = registry.render("evaluation", **values)
+    key = make_cache_key(router.primary("evaluation"), prompt, 300, 0.3)
+    started = time.monotonic()
+    text = cache.get(key)
+    if text is not None:
+        telemetry.record("evaluation", router.primary("evaluation"), latency=time.monotonic() - started, cache_hit=True)
+    else:
+        text, _ = invoke_job_text(router, "evaluation", build_payload(prompt, 300, 0.3), job)
+        job.check()
+        cache.set(key, text, CACHE_TTL_EVALUATION)
     
-    return None
+    def reask(reask_prompt):
+        try:
+            return invoke_job_text(router, "evaluation", build_payload(reask_prompt, 300, 0.0), job)[0]
+        except Exception:
+            return None
+    
+    scores, outcome = structured.resolve("evaluation", clean_model_output(text), reask)
+    job.check()
+    if not scores:
+        return None
+    if outcome != "clean":
+        cache.set(key, json.dumps(scores), CACHE_TTL_EVALUATION)
+    scores = with_overall(scores)
+    cache.set(refined_evaluation_key(**values), json.dumps(scores), CACHE_TTL_EVALUATION)
+    return scores
+
+# Page side: job ids live in session_state.jobs, keyed by kind
+def submit_job(kind: str, payload: dict, dedup: bool = True) -> str:
+    job_id = get_job_queue().submit(
+        kind, payload, owner=st.session_state.get("email"), dedup=dedup, trace=inject().get("traceparent")
+    )
+    st.session_state.jobs[kind] = job_id
+    return job_id
+
+def show_job_error(job: dict):
+    if job["error_type"] in ("CircuitOpenError", "LimiterRejected"):
+        st.warning(DEGRADED_MESSAGE)
+    else:
+        st.error(f"API Error: {job['error']}")
+
+def generation_values() -> dict:
+    return {
+        "tone": st.session_state.tone,
+        "content_type": st.session_state.content_type,
+        "word_limit": st.session_state.word_limit,
+        "audience": st.session_state.audience,
+        "purpose": st.session_state.purpose,
+        "topic": st.session_state.selected_prompt,
+    }
+
+def finish_generation(result: dict):
+    """Put a finished generation on screen, save it and start evaluating it"""
+    record_model("generation", result.get("model"))
+    variants = result["variants"]
+    st.session_state.final_content = result["content"]
+    st.session_state.variants = variants if len(variants) > 1 else []
+    st.session_state.variant_index = 0
+    
+    st.session_state.history_id = save_to_database(
+        st.session_state.get("email", ""),
+        st.session_state.selected_prompt,
+        st.session_state.content_type,
+        st.session_state.tone,
+        st.session_state.audience,
+        st.session_state.purpose,
+        st.session_state.word_limit,
+        st.session_state.final_content,
+        st.session_state.variants
+    )
+    invalidate_history()
+    if EVALUATION_MODE in ("llm", "hybrid"):
+        start_background_evaluation()
+
+@traced_fragment("fragment.poll_generation_job")
+def poll_generation_job():
+    """Show the generation's partial text while it runs; pick up its result with a full rerun"""
+    job_id = st.session_state.jobs.get("generation")
+    if not job_id:
+        return
+    jobs = get_job_queue()
+    job = jobs.get(job_id)
+    if job is not None and job["status"] in ACTIVE:
+        if job["progress"]:
+            st.markdown(f'<div class="generated-output">{job["progress"]}▌</div>', unsafe_allow_html=True)
+        else:
+            count = job["payload"]["variants"]
+            st.info("🎨 Creating your content..." if count == 1 else f"🎨 Creating {count} variants...")
+        return
+    
+    del st.session_state.jobs["generation"]
+    if job is not None:
+        jobs.ack(job_id)
+        if job["status"] == DONE:
+            finish_generation(job["result"])
+        elif job["status"] != CANCELLED:
+            st.session_state.generation_error = {"error": job["error"], "error_type": job["error_type"]}
+    st.rerun()
+
+def resumable_generation():
+    """A generation this user started before a browser refresh that this session has not picked up"""
+    if st.session_state.jobs or st.session_state.final_content:
+        return None
+    return get_job_queue().latest(st.session_state.get("email"), "generation", JOB_RESUME_WINDOW)
+
+def resume_generation(job: dict):
+    values = job["payload"]["values"]
+    for key in ("content_type", "tone", "audience", "purpose", "word_limit"):
+        st.session_state[key] = values[key]
+    st.session_state.selected_prompt = values["topic"]
+    st.session_state.jobs["generation"] = job["id"]
+    st.session_state.generation_error = None
+    st.session_state.step = "generation"
+
+# -------------------------------
+# BACKGROUND EVALUATION
+# -------------------------------
+def content_fingerprint(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def refined_evaluation_key(content: str, content_type: str, tone: str, audience: str, purpose: str) -> str:
+    """Cache key of LLM-refined scores: the content hash plus the settings it was judged against"""
+    identity = json.dumps([content_fingerprint(content), content_type, tone, audience, purpose])
+    return "refined-evaluation:" + hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+def cached_refined_evaluation():
+    """Refined scores already computed for the current content, if any"""
+    cached = cached_response("evaluation", refined_evaluation_key(
+        st.session_state.final_content,
+        st.session_state.content_type,
+        st.session_state.tone,
+        st.session_state.audience,
+        st.session_state.purpose
+    ))
+    return json.loads(cached) if cached else None
+
+def start_background_evaluation():
+    """Queue an evaluation of final_content so the result is ready when asked for"""
+    cancel_background_evaluation()
+    values = evaluation_values(
+        st.session_state.final_content,
+        st.session_state.content_type,
+        st.session_state.tone,
+        st.session_state.audience,
+        st.session_state.purpose
+    )
+    st.session_state.evaluation_job = {
+        "content": content_fingerprint(st.session_state.final_content),
+        "id": get_job_queue().submit(
+            "evaluation", {"values": values}, owner=st.session_state.get("email"), trace=inject().get("traceparent")
+        )
+    }
+
+def cancel_background_evaluation():
+    """Drop this session's background evaluation; if nobody else is waiting on it, its Bedrock call is aborted"""
+    job = st.session_state.pop("evaluation_job", None)
+    if job:
+        get_job_queue().cancel(job["id"])
+
+def current_evaluation_job():
+    """The background evaluation job for the content on screen, if one is queued, running or finished"""
+    job = st.session_state.get("evaluation_job")
+    if not job or job["content"] != content_fingerprint(st.session_state.final_content or ""):
+        return None
+    record = get_job_queue().get(job["id"])
+    if record is None or record["status"] == CANCELLED:
+        return None
+    return record
+
+def background_evaluation_result(timeout: float = 60):
+    """
+    Scores from the background job for the current content, waiting if still
+    in flight. A job still running when a blocking wait times out is
+    cancelled, since nothing will come back for it.
+    """
+    job = current_evaluation_job()
+    if not job:
+        return None
+    job = get_job_queue().wait(job["id"], timeout)
+    if timeout and (job is None or job["status"] in ACTIVE):
+        cancel_background_evaluation()
+        return None
+    return job["result"] if job and job["status"] == DONE else None
+
+def reset_evaluation():
+    st.session_state.show_evaluation = False
+    st.session_state.evaluation_scores = None
+    st.session_state.local_scores = None
+    st.session_state.evaluation_refined = False
+    st.session_state.refine_failed = False
+
+@traced_fragment("fragment.poll_refined_evaluation")
+def poll_refined_evaluation():
+    """Swap in the LLM-refined scores with a full rerun once the background job lands"""
+    job = current_evaluation_job()
+    if job is None:
+        # Cancelled, or swept from the queue: nothing left to wait for
+        st.session_state.refine_failed = True
+        st.rerun()
+    if job["status"] in ACTIVE:
+        st.caption("⚡ Instant estimate · refining with AI...")
+        return
+    scores = background_evaluation_result(timeout=0)
+    if scores:
+        st.session_state.evaluation_scores = scores
+        st.session_state.evaluation_refined = True
+    else:
+        st.session_state.refine_failed = True
+    st.rerun()
 
 # -------------------------------
 # THEME CONFIGURATION
@@ -293,6 +1256,7 @@ def get_theme_colors():
 # -------------------------------
 theme_colors = get_theme_colors()
 
+css_span = get_tracer().start_span("page.css")
 st.markdown(f"""
     <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -750,6 +1714,26 @@ st.markdown(f"""
         height: 16px;
     }}
     
+    .metric-delta {{
+        font-size: 0.8rem;
+        font-weight: 600;
+        margin-left: 0.5rem;
+        color: {theme_colors['text_secondary']};
+        -webkit-text-fill-color: {theme_colors['text_secondary']};
+    }}
+    
+    .evaluation-badge {{
+        display: inline-block;
+        padding: 0.25rem 0.75rem;
+        margin-bottom: 1rem;
+        border-radius: 999px;
+        font-size: 0.8rem;
+        font-weight: 600;
+        color: {theme_colors['text_accent']};
+        background: rgba(139, 92, 246, 0.15);
+        border: 1px solid rgba(139, 92, 246, 0.3);
+    }}
+    
     .overall-score .metric-score {{
         font-size: 1.5rem;
         background: linear-gradient(135deg, #a78bfa, #ec4899);
@@ -956,6 +1940,7 @@ st.markdown(f"""
     }}
     </style>
 """, unsafe_allow_html=True)
+css_span.end()
 
 # -------------------------------
 # TOP USER GREETING
@@ -998,6 +1983,7 @@ with st.sidebar:
         
         # Check if this item was clicked
         if st.button(f"{icon} {label}", key=f"nav_{page_key}", use_container_width=True):
+            cancel_background_evaluation()
             st.session_state.page = page_key
             if page_key == "new_content":
                 st.session_state.step = "input"
@@ -1037,6 +2023,7 @@ with st.sidebar:
     st.markdown("<br>", unsafe_allow_html=True)
     
     if st.button("🚪 Logout", use_container_width=True, key="logout_btn"):
+        cancel_background_evaluation()
         for key in list(st.session_state.keys()):
             del st.session_state[key]
         st.switch_page("pages/Login.py")
@@ -1116,6 +2103,16 @@ if st.session_state.page == "new_content":
         st.caption("Start with your idea and we'll help you craft the perfect prompt")
         st.markdown("<br>", unsafe_allow_html=True)
         
+        resumable = resumable_generation()
+        if resumable:
+            if resumable["status"] == DONE:
+                st.info("✅ The content you started before the page reloaded is ready.")
+            else:
+                st.info("⏳ The content you started before the page reloaded is still being written.")
+            if st.button("▶️ Resume", use_container_width=True, key="resume_generation"):
+                resume_generation(resumable)
+                st.rerun()
+        
         st.markdown('<div class="content-card">', unsafe_allow_html=True)
         st.markdown('<div class="card-title">💭 Share Your Idea</div>', unsafe_allow_html=True)
         st.markdown('<div class="card-subtitle">Tell us what you want to create - be as detailed as you like</div>', unsafe_allow_html=True)
@@ -1136,46 +2133,49 @@ if st.session_state.page == "new_content":
             else:
                 st.session_state.user_idea = idea
                 
-                with st.spinner("🔮 Crafting refined prompts..."):
-                    prompt = f"""Generate 2 different refined prompts from: "{idea}"
-Return JSON: {{"prompt1": {{"title": "...", "prompt": "..."}}, "prompt2": {{"title": "...", "prompt": "..."}}}}"""
-                    
-                    response = call_bedrock_api(prompt, 800, 0.8)
-                    if response:
-                        try:
-                            cleaned = clean_model_output(response)
-                            if "```json" in cleaned:
-                                cleaned = cleaned.split("```json")[1].split("```")[0].strip()
-                            prompts_data = json.loads(cleaned)
-                            st.session_state.generated_prompts = [prompts_data["prompt1"], prompts_data["prompt2"]]
-                            st.session_state.step = "prompt_selection"
-                            st.rerun()
-                        except Exception:
-                           pass
-                    else:
-                        st.error("❌ Connection error. Please check your API settings.")
+                started = time.monotonic()
+                cached_prompts = get_idea_cache().lookup(idea, owner=st.session_state.get("email"))
+                if cached_prompts:
+                    record_cache_hit("prompts", started)
+                    st.session_state.generated_prompts = list(cached_prompts)
+                    st.session_state.step = "prompt_selection"
+                    st.rerun()
+                
+                if resumable:
+                    get_job_queue().ack(resumable["id"])  # Moved on without it
+                
+                # The prompt_selection step queues the job and fills in the cards as options arrive
+                st.session_state.generated_prompts = []
+                st.session_state.prompts_pending = True
+                st.session_state.jobs.pop("prompts", None)
+                st.session_state.step = "prompt_selection"
+                st.rerun()
     
     elif st.session_state.step == "prompt_selection":
         st.markdown('<div class="header-title">Choose Your Direction</div>', unsafe_allow_html=True)
         st.caption("Select the prompt that best aligns with your vision")
         st.markdown("<br>", unsafe_allow_html=True)
         
-        col1, col2 = st.columns(2)
-        
-        for idx, col in enumerate([col1, col2]):
-            with col:
-                opt = st.session_state.generated_prompts[idx]
-                st.markdown(f"""
-                    <div class="prompt-card">
-                        <div class="prompt-title">{opt['title']}</div>
-                        <div class="prompt-text">{opt['prompt']}</div>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                if st.button("Select This Prompt", key=f"sel_{idx}", use_container_width=True):
-                    st.session_state.selected_prompt = opt['prompt']
-                    st.session_state.step = "preferences"
+        if st.session_state.prompts_pending:
+            if "prompts" not in st.session_state.jobs:
+                idea = st.session_state.user_idea
+                prompt = build_prompts_prompt(idea, PROMPT_OPTIONS)
+                max_tokens = prompts_max_tokens(PROMPT_OPTIONS)
+                response = cached_response("prompts", response_cache_key(prompt, max_tokens, 0.8, "prompts"))
+                if response is not None:
+                    st.session_state.prompts_pending = False
+                    settle_prompts(idea, prompt, max_tokens, response, fallback_prompts(idea))
                     st.rerun()
+                submit_job("prompts", {
+                    "values": {"idea": idea, "count": PROMPT_OPTIONS},
+                    "max_tokens": max_tokens,
+                    "stream": BEDROCK_STREAMING,
+                })
+            st.fragment(run_every=JOB_POLL_INTERVAL)(poll_prompts_job)()
+        else:
+            options = st.session_state.generated_prompts
+            for idx, slot in enumerate(prompt_card_slots(len(options))):
+                render_prompt_card(slot, options[idx], idx)
     
     elif st.session_state.step == "preferences":
         st.markdown('<div class="header-title">Content Preferences</div>', unsafe_allow_html=True)
@@ -1254,31 +2254,41 @@ Return JSON: {{"prompt1": {{"title": "...", "prompt": "..."}}, "prompt2": {{"tit
         st.markdown("<br>", unsafe_allow_html=True)
         
         if not st.session_state.final_content:
-            with st.spinner("🎨 Creating your content..."):
-                prompt = f"""Write a {st.session_state.tone} {st.session_state.content_type} in approximately {st.session_state.word_limit} words.
-Audience: {st.session_state.audience}
-Purpose: {st.session_state.purpose}
-Content: {st.session_state.selected_prompt}
-
-Create engaging, authentic content that resonates with the target audience."""
+            if st.session_state.generation_error:
+                show_job_error(st.session_state.generation_error)
+                if st.button("🔄 Try Again", use_container_width=True, key="retry_generation"):
+                    st.session_state.generation_error = None
+                    st.rerun()
+            elif "generation" not in st.session_state.jobs:
+                values = generation_values()
+                prompt = get_prompt_registry().render("generation", **values)
+                bypass_cache = st.session_state.pop("bypass_cache", False)
+                cache = get_response_cache()
+                cache_key = generation_cache_key(get_model_router(), prompt, values["word_limit"], GENERATION_VARIANTS)
                 
-                content = call_bedrock_api(prompt, st.session_state.word_limit + 100, 0.7)
-                if content:
-                    st.session_state.final_content = clean_model_output(content)
-                    
-                    save_to_database(
-                        st.session_state.get("email", ""),
-                        st.session_state.selected_prompt,
-                        st.session_state.content_type,
-                        st.session_state.tone,
-                        st.session_state.audience,
-                        st.session_state.purpose,
-                        st.session_state.word_limit,
-                        st.session_state.final_content
-                    )
+                cached = None
+                if bypass_cache:
+                    cache.record_bypass()
+                else:
+                    cached = cached_response("generation", cache_key)
+                if cached:
+                    variants = json.loads(cached) if GENERATION_VARIANTS > 1 else []
+                    finish_generation({"content": variants[0]["content"] if variants else cached, "variants": variants})
                     st.rerun()
+                
+                # A regenerate must not be handed the result it is replacing
+                submit_job(
+                    "generation",
+                    {"values": values, "variants": GENERATION_VARIANTS, "stream": BEDROCK_STREAMING},
+                    dedup=not bypass_cache
+                )
+            
+            if "generation" in st.session_state.jobs:
+                st.fragment(run_every=JOB_POLL_INTERVAL)(poll_generation_job)()
         
         if st.session_state.final_content:
+            if len(st.session_state.variants) > 1:
+                render_variant_picker()
             st.markdown(f'<div class="generated-output">{st.session_state.final_content}</div>', unsafe_allow_html=True)
             
             col1, col2, col3, col4 = st.columns(4)
@@ -1298,22 +2308,25 @@ Create engaging, authentic content that resonates with the target audience."""
             
             with col3:
                 if st.button("🔄 Regenerate", use_container_width=True):
+                    cancel_background_evaluation()
                     st.session_state.final_content = None
-                    st.session_state.show_evaluation = False
-                    st.session_state.evaluation_scores = None
+                    st.session_state.variants = []
+                    st.session_state.bypass_cache = True
+                    reset_evaluation()
                     st.rerun()
             
             with col4:
                 if st.button("🆕 New Content", use_container_width=True):
+                    cancel_background_evaluation()
                     st.session_state.step = "input"
                     st.session_state.final_content = None
+                    st.session_state.variants = []
                     st.session_state.user_idea = ""
                     st.session_state.content_type = None
                     st.session_state.tone = None
                     st.session_state.audience = None
                     st.session_state.purpose = None
-                    st.session_state.show_evaluation = False
-                    st.session_state.evaluation_scores = None
+                    reset_evaluation()
                     st.rerun()
             
             # Show template save modal AFTER buttons if triggered
@@ -1368,21 +2381,48 @@ Create engaging, authentic content that resonates with the target audience."""
             
             if not st.session_state.show_evaluation:
                 if st.button("✨ Analyze Content Quality", use_container_width=True, key="evaluate_btn"):
-                    with st.spinner("🔍 Analyzing your content..."):
-                        scores = evaluate_content(
+                    if EVALUATION_MODE == "hybrid":
+                        scores = score_content(
                             st.session_state.final_content,
                             st.session_state.content_type,
                             st.session_state.tone,
                             st.session_state.audience,
-                            st.session_state.purpose
+                            st.session_state.purpose,
+                            st.session_state.word_limit
                         )
-                        if scores:
-                            st.session_state.evaluation_scores = scores
-                            st.session_state.show_evaluation = True
-                            st.rerun()
+                        st.session_state.local_scores = scores
+                        refined = cached_refined_evaluation()
+                        if refined:
+                            scores = refined
+                            st.session_state.evaluation_refined = True
+                        elif current_evaluation_job() is None:
+                            start_background_evaluation()
+                    else:
+                        with st.spinner("🔍 Analyzing your content..."):
+                            scores = evaluate_content(
+                                st.session_state.final_content,
+                                st.session_state.content_type,
+                                st.session_state.tone,
+                                st.session_state.audience,
+                                st.session_state.purpose,
+                                st.session_state.word_limit
+                            )
+                    if scores:
+                        st.session_state.evaluation_scores = scores
+                        st.session_state.show_evaluation = True
+                        st.rerun()
             
             # Show evaluation results AFTER the button is clicked
             if st.session_state.show_evaluation and st.session_state.evaluation_scores:
+                if EVALUATION_MODE == "hybrid":
+                    if st.session_state.evaluation_refined:
+                        st.markdown('<span class="evaluation-badge">✨ Refined by AI</span>', unsafe_allow_html=True)
+                    elif st.session_state.refine_failed:
+                        st.caption("⚡ Instant estimate · AI refinement is unavailable right now")
+                    else:
+                        st.fragment(run_every=REFINE_POLL_INTERVAL)(poll_refined_evaluation)()
+                
+                local_scores = st.session_state.local_scores if st.session_state.evaluation_refined else None
                 st.markdown('<div class="evaluation-results">', unsafe_allow_html=True)
                 
                 metrics = [
@@ -1395,12 +2435,15 @@ Create engaging, authentic content that resonates with the target audience."""
                 
                 for metric_name, metric_key, metric_desc in metrics:
                     score = st.session_state.evaluation_scores.get(metric_key, 0)
+                    delta = ""
+                    if local_scores and metric_key in local_scores:
+                        delta = f'<span class="metric-delta">{score - local_scores[metric_key]:+d} vs instant</span>'
                     
                     st.markdown(f"""
                         <div class="evaluation-metric">
                             <div class="metric-label">
                                 <span class="metric-name">{metric_name}</span>
-                                <span class="metric-score">{score}%</span>
+                                <span class="metric-score">{score}%{delta}</span>
                             </div>
                             <div class="metric-bar">
                                 <div class="metric-bar-fill" style="width: {score}%;"></div>
@@ -1409,11 +2452,14 @@ Create engaging, authentic content that resonates with the target audience."""
                     """, unsafe_allow_html=True)
                 
                 overall = st.session_state.evaluation_scores.get("overall", 0)
+                delta = ""
+                if local_scores and "overall" in local_scores:
+                    delta = f'<span class="metric-delta">{overall - local_scores["overall"]:+d} vs instant</span>'
                 st.markdown(f"""
                     <div class="evaluation-metric overall-score">
                         <div class="metric-label">
                             <span class="metric-name" style="font-size: 1.1rem; font-weight: 600;">Overall Score</span>
-                            <span class="metric-score">{overall}%</span>
+                            <span class="metric-score">{overall}%{delta}</span>
                         </div>
                         <div class="metric-bar">
                             <div class="metric-bar-fill" style="width: {overall}%;"></div>
@@ -1424,8 +2470,7 @@ Create engaging, authentic content that resonates with the target audience."""
                 st.markdown('</div>', unsafe_allow_html=True)
                 
                 if st.button("🔄 Re-analyze", use_container_width=True, key="reanalyze_btn"):
-                    st.session_state.show_evaluation = False
-                    st.session_state.evaluation_scores = None
+                    reset_evaluation()
                     st.rerun()
 
 # ========== HISTORY PAGE ==========
@@ -1435,9 +2480,9 @@ elif st.session_state.page == "history":
     st.markdown("<br>", unsafe_allow_html=True)
     
     user_email = st.session_state.get("email", "")
-    history_items = get_user_history(user_email) if user_email else []
+    total_items = sum(user_history_counts(user_email).values()) if user_email else 0
     
-    if not history_items:
+    if not total_items:
         st.markdown(f"""
             <div class="content-card" style="text-align: center; padding: 3rem;">
                 <div style="font-size: 3rem; margin-bottom: 1rem;">📝</div>
@@ -1448,19 +2493,28 @@ elif st.session_state.page == "history":
     else:
         st.markdown(f"""
             <div style="color: {theme_colors['text_secondary']}; margin-bottom: 1.5rem;">
-                📊 You have <strong style="color: {theme_colors['text_accent']};">{len(history_items)}</strong> saved items
+                📊 You have <strong style="color: {theme_colors['text_accent']};">{total_items}</strong> saved items
             </div>
         """, unsafe_allow_html=True)
         
         search = st.text_input("🔍 Search history", placeholder="Search by title or content...", label_visibility="collapsed")
         
-        if search:
-            history_items = [h for h in history_items if search.lower() in h.title.lower() or search.lower() in h.generated_content.lower()]
+        history_items = current_history(user_email, search.strip())
         
         st.markdown("<br>", unsafe_allow_html=True)
         
         for item in history_items:
-            with st.expander(f"📄 {item.title} • {item.created_at.strftime('%d %b %Y, %I:%M %p')}", expanded=False):
+            # Tracking open/closed state lets a closed item skip its body entirely
+            expander = st.expander(
+                f"📄 {item.title} • {item.created_at.strftime('%d %b %Y, %I:%M %p')}",
+                expanded=False,
+                key=f"history_item_{item.id}",
+                on_change="rerun"
+            )
+            if not expander.open:
+                continue
+            with expander:
+                body = history_item_body(item.id)
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -1474,14 +2528,14 @@ elif st.session_state.page == "history":
                 
                 st.markdown("---")
                 st.markdown("### 📝 Content")
-                st.markdown(f'<div class="generated-output">{item.generated_content}</div>', unsafe_allow_html=True)
+                st.markdown(f'<div class="generated-output">{body}</div>', unsafe_allow_html=True)
                 
                 col_a, col_b, col_c = st.columns(3)
                 
                 with col_a:
                     st.download_button(
                         "📥 Download",
-                        item.generated_content,
+                        body,
                         file_name=f"content_{item.id}.txt",
                         key=f"download_{item.id}",
                         use_container_width=True
@@ -1497,9 +2551,15 @@ elif st.session_state.page == "history":
                 with col_c:
                     if st.button("🗑️ Delete", key=f"delete_{item.id}", use_container_width=True):
                         delete_history_item(item.id)
+                        st.session_state.history_items = [h for h in history_items if h.id != item.id]
+                        st.session_state.history_counts = None
+                        st.session_state.history_bodies.pop(item.id, None)
                         st.success("Deleted!")
                         time.sleep(0.5)
                         st.rerun()
+        
+        if st.session_state.history_cursor is not None:
+            st.button("⬇️ Load more", key="history_load_more", on_click=load_more_history, use_container_width=True)
 
 # ========== TEMPLATES PAGE ==========
 elif st.session_state.page == "templates":
@@ -1665,9 +2725,9 @@ elif st.session_state.page == "profile":
     st.markdown('<div class="card-title">📊 Your Activity Statistics</div>', unsafe_allow_html=True)
     
     user_email = st.session_state.get("email", "")
-    history_items = get_user_history(user_email) if user_email else []
+    content_types = user_history_counts(user_email) if user_email else {}
     
-    total_content = len(history_items)
+    total_content = sum(content_types.values())
     total_templates = len(st.session_state.default_templates) + len(st.session_state.user_templates)
     
     col1, col2 = st.columns(2)
@@ -1693,16 +2753,12 @@ elif st.session_state.page == "profile":
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Content Breakdown
-    if history_items:
+    if content_types:
         st.markdown("<br>", unsafe_allow_html=True)
         st.markdown('<div class="content-card">', unsafe_allow_html=True)
         st.markdown('<div class="card-title">📈 Content Breakdown</div>', unsafe_allow_html=True)
         
-        content_types = {}
-        for item in history_items:
-            content_types[item.content_type] = content_types.get(item.content_type, 0) + 1
-        
-        for content_type, count in content_types.items():
+        for content_type, count in sorted(content_types.items(), key=lambda kv: -kv[1]):
             percentage = (count / total_content) * 100
             st.markdown(f"""
                 <div style="margin-bottom: 1rem;">
@@ -1717,3 +2773,5 @@ elif st.session_state.page == "profile":
             """, unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
+
+end_rerun_span()
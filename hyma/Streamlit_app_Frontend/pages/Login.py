@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+import sys
 import base64
 
 # -----------------------------------
@@ -264,6 +265,12 @@ footer {{visibility: hidden;}}
 # -----------------------------------
 API_BASE = "https://infosys-internship-backend.onrender.com"
 
+# Backend requests carry a traceparent header so the backend's spans join this page's trace
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from Auth_Backend.tracing import inject, span
+
 # -----------------------------------
 # LOGIN UI
 # -----------------------------------
@@ -300,10 +307,11 @@ if st.button("Send Login Link", key="login_button"):
         st.warning("⚠️ Please enter a valid email address")
     else:
         try:
-            with st.spinner("🚀 Sending secure login link..."):
+            with st.spinner("🚀 Sending secure login link..."), span("backend.login"):
                 res = requests.post(
                     f"{API_BASE}/login",
                     params={"email": email},
+                    headers=inject(),
                     timeout=10
                 )
 
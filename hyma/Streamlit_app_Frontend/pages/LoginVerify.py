@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
 import time
+import os
+import sys
 
 # -----------------------------------
 # PAGE CONFIG + HIDE SIDEBAR
@@ -26,6 +28,12 @@ st.markdown(
 # -----------------------------------
 API_BASE = "https://infosys-internship-backend.onrender.com"
 
+# Backend requests carry a traceparent header so the backend's spans join this page's trace
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from Auth_Backend.tracing import inject, span
+
 # -----------------------------------
 # MODERN STYLING (SAME AS REGISTER)
 # -----------------------------------
@@ -321,10 +329,11 @@ st.caption("This should only take a moment")
 # VERIFY LOGIN TOKEN
 # -----------------------------------
 try:
-    with st.spinner("🔒 Authenticating..."):
+    with st.spinner("🔒 Authenticating..."), span("backend.login_verify"):
         res = requests.get(
             f"{API_BASE}/login/verify",
             params={"token": token},
+            headers=inject(),
             timeout=10
         )
 
@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+import sys
 import base64
 
 # -----------------------------------
@@ -286,6 +287,12 @@ footer {{visibility: hidden;}}
 # -----------------------------------
 API_BASE = "https://infosys-internship-backend.onrender.com"
 
+# Backend requests carry a traceparent header so the backend's spans join this page's trace
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from Auth_Backend.tracing import inject, span
+
 # -----------------------------------
 # REGISTER UI
 # -----------------------------------
@@ -331,10 +338,11 @@ if st.button("Create Account", key="register_button"):
         st.warning("⚠️ Please enter your full name")
     else:
         try:
-            with st.spinner("🚀 Creating your account..."):
+            with st.spinner("🚀 Creating your account..."), span("backend.register"):
                 res = requests.post(
                     f"{API_BASE}/register",
                     params={"name": name, "email": email},
+                    headers=inject(),
                     timeout=10
                 )
 
@@ -0,0 +1,520 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import queue
+import threading
+import time
+
+import httpx
+
+from utils.concurrency import CALL_SITE, AdaptiveLimiter
+from utils.event_stream import aiter_chunks, text_of
+from utils.prompt_templates import CACHE_POINT, Prompt
+from utils.resilience import CircuitBreaker, CircuitOpenError, LatencyHistogram
+from utils.singleflight import SingleFlight, request_key
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_POOL_MAXSIZE = 20
+DEFAULT_MAX_IN_FLIGHT = 16
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_KEEPALIVE_EXPIRY = 60
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_MIN_DELAY = 0.5
+
+# How often a blocked sync caller checks its cancel event
+CANCEL_POLL_INTERVAL = 0.1
+
+# Responses that mean Bedrock itself is unhealthy or throttling us
+UNHEALTHY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CallCancelled(Exception):
+    """A sync call was abandoned because its cancel event was set; the request was cancelled too"""
+
+
+def model_id_for(url: str) -> str:
+    """Extract the model id from a .../model/<id>/invoke URL"""
+    parts = url.rstrip("/").split("/")
+    if "model" in parts and parts.index("model") + 1 < len(parts):
+        return parts[parts.index("model") + 1]
+    return url
+
+
+def model_url(url: str, model_id: str) -> str:
+    """Point a .../model/<id>/invoke URL at another model"""
+    parts = url.rstrip("/").split("/")
+    if "model" in parts and parts.index("model") + 1 < len(parts):
+        parts[parts.index("model") + 1] = model_id
+        return "/".join(parts)
+    return url
+
+
+def stream_url_for(url: str) -> str:
+    """Map a /invoke model URL to its /invoke-with-response-stream variant"""
+    if url.endswith("/invoke"):
+        return url + "-with-response-stream"
+    return url
+
+
+def build_payload(prompt: str, max_tokens: int = 500, temperature: float = 0.7) -> dict:
+    """
+    Nova messages-API request body for a single user prompt. A templated
+    Prompt sends its static prefix as the system block, followed by a cache
+    point if it has one, and only its body as the user message.
+    """
+    payload = {
+        "messages": [{"role": "user", "content": [{"text": str(prompt)}]}],
+        "inferenceConfig": {"maxTokens": max_tokens, "temperature": temperature}
+    }
+    if isinstance(prompt, Prompt) and prompt.prefix:
+        payload["system"] = [{"text": prompt.prefix}] + ([CACHE_POINT] if prompt.cache_point else [])
+        payload["messages"][0]["content"][0]["text"] = prompt.body
+    return payload
+
+
+def response_text(response: httpx.Response) -> str:
+    """Text of a successful invoke response"""
+    return response.json()["output"]["message"]["content"][0]["text"]
+
+
+def is_unhealthy(error: Exception) -> bool:
+    """Transport failures and throttling/5xx statuses count against Bedrock's health"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in UNHEALTHY_STATUS
+    return True
+
+
+class BedrockClient:
+    """
+    Process-wide Bedrock runtime client.
+
+    The core is asyncio-based: one httpx.AsyncClient with a shared keep-alive
+    pool runs on a dedicated event loop thread, and an adaptive (AIMD) limiter
+    caps the number of requests in flight. The sync methods used by the Streamlit script thread
+    are thin wrappers that submit coroutines to that loop.
+
+    Requests go to the model in `url` unless a model_id is given; every model
+    gets its own circuit breaker and latency windows but shares the pool and limiter.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        hedging: bool = False,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+        hedge_min_delay: float = DEFAULT_HEDGE_MIN_DELAY,
+        breaker: CircuitBreaker = None,
+        limiter: AdaptiveLimiter = None,
+    ):
+        self.url = url
+        self.stream_url = stream_url_for(url)
+        self.model_id = model_id_for(url)
+
+        self._limits = httpx.Limits(
+            max_connections=pool_maxsize,
+            max_keepalive_connections=pool_maxsize,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=read_timeout,
+            pool=read_timeout,
+        )
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        self._limiter = limiter or AdaptiveLimiter(max_limit=max_in_flight)
+        self._singleflight = SingleFlight()
+
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self._latency = {}
+        self._ttft = {}
+        self._breakers = {self.model_id: breaker or CircuitBreaker()}
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._connects = 0
+        self._in_flight = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="bedrock-client", daemon=True
+        )
+        self._thread.start()
+        self.run(self._start())
+
+    async def _start(self):
+        self._http = httpx.AsyncClient(
+            headers=self._headers, limits=self._limits, timeout=self._timeout
+        )
+
+    async def _trace(self, event_name: str, info: dict):
+        # httpcore reports connect_tcp only when a new connection is opened
+        if event_name == "connection.connect_tcp.started":
+            self._count("_connects")
+
+    def _count(self, field: str, delta: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def url_for(self, model_id: str = None) -> str:
+        return model_url(self.url, model_id) if model_id else self.url
+
+    def breaker(self, model_id: str = None) -> CircuitBreaker:
+        """Circuit breaker of a model; new models copy the default model's settings"""
+        model_id = model_id or self.model_id
+        with self._lock:
+            if model_id not in self._breakers:
+                template = self._breakers[self.model_id]
+                self._breakers[model_id] = CircuitBreaker(template.failure_threshold, template.reset_timeout)
+            return self._breakers[model_id]
+
+    def _histogram(self, histograms: dict, model_id: str) -> LatencyHistogram:
+        with self._lock:
+            if model_id not in histograms:
+                histograms[model_id] = LatencyHistogram()
+            return histograms[model_id]
+
+    # -------------------------------
+    # ASYNC API
+    # -------------------------------
+    async def ainvoke(self, payload: dict, model_id: str = None, site: str = None) -> httpx.Response:
+        """
+        POST a payload to the model endpoint over the shared pool.
+        Identical payloads already in flight share that call's response.
+        site (e.g. "evaluation") only groups latency for the limiter.
+        """
+        model_id = model_id or self.model_id
+        url = self.url_for(model_id)
+        token = CALL_SITE.set(site) if site else None
+        try:
+            return await self._singleflight.do(
+                request_key(url, payload), lambda: self._post(url, payload, model_id)
+            )
+        finally:
+            if token is not None:
+                CALL_SITE.reset(token)
+
+    async def _post(self, url: str, payload: dict, model_id: str) -> httpx.Response:
+        """One logical call: breaker check, then a possibly hedged request"""
+        breaker = self.breaker(model_id)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{model_id} is failing; circuit breaker is open")
+        latency = self._histogram(self._latency, model_id)
+        try:
+            response = await self._hedged(lambda: self._send(url, payload, latency), latency)
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            breaker.record_failure()
+            raise
+        if response.status_code in UNHEALTHY_STATUS:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def _send(self, url: str, payload: dict, latency: LatencyHistogram) -> httpx.Response:
+        """A single HTTP request; healthy responses feed the latency histogram"""
+        async with self._limiter.slot("invoke", model_id_for(url)) as slot:
+            self._count("_requests")
+            self._count("_in_flight")
+            started = time.monotonic()
+            try:
+                response = await self._http.post(
+                    url, json=payload, extensions={"trace": self._trace}
+                )
+            except httpx.HTTPError:
+                self._count("_errors")
+                raise
+            finally:
+                self._count("_in_flight", -1)
+            slot.record(response.status_code)
+            if response.status_code not in UNHEALTHY_STATUS:
+                latency.record(time.monotonic() - started)
+            return response
+
+    def _hedge_delay(self, histogram: LatencyHistogram):
+        """Seconds to wait before hedging, or None when hedging is off or there is too little data"""
+        if not self.hedging or len(histogram) < self.hedge_min_samples:
+            return None
+        return max(histogram.percentile(self.hedge_percentile), self.hedge_min_delay)
+
+    async def _hedged(self, attempt, latency: LatencyHistogram):
+        """
+        Run attempt(); if it has not finished within the hedge delay, start an
+        identical second attempt and return whichever healthy response lands first.
+        """
+        delay = self._hedge_delay(latency)
+        if delay is None:
+            return await attempt()
+
+        tasks = [asyncio.ensure_future(attempt())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self._count("_hedges")
+                tasks.append(asyncio.ensure_future(attempt()))
+
+            pending = set(tasks)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    last = task
+                    if task.exception() is None and task.result().status_code not in UNHEALTHY_STATUS:
+                        if task is not tasks[0]:
+                            self._count("_hedge_wins")
+                        return task.result()
+            return last.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _stream_once(self, url: str, payload: dict, ttft: LatencyHistogram, meta: dict = None):
+        async with self._limiter.slot("stream", model_id_for(url)) as slot:
+            self._count("_requests")
+            self._count("_in_flight")
+            started = time.monotonic()
+            first = True
+            try:
+                async with self._http.stream(
+                    "POST",
+                    stream_url_for(url),
+                    json=payload,
+                    headers={"Accept": "application/vnd.amazon.eventstream"},
+                    extensions={"trace": self._trace},
+                ) as response:
+                    slot.record(response.status_code)
+                    response.raise_for_status()
+                    async for event in aiter_chunks(response.aiter_raw()):
+                        if meta is not None:
+                            if "messageStop" in event:
+                                meta["stopReason"] = event["messageStop"].get("stopReason")
+                            elif "metadata" in event:
+                                meta["usage"] = event["metadata"].get("usage")
+                        text = text_of(event)
+                        if text:
+                            if first:
+                                ttft.record(time.monotonic() - started)
+                                first = False
+                            yield text
+            except httpx.HTTPError:
+                self._count("_errors")
+                raise
+            finally:
+                self._count("_in_flight", -1)
+
+    async def astream(self, payload: dict, model_id: str = None, meta: dict = None):
+        """
+        POST a payload to the streaming endpoint and yield text deltas as they arrive.
+        The read timeout applies between chunks, not to the whole response.
+        With hedging on, a second stream is started if the first token is later
+        than the time-to-first-token percentile; the first stream to produce a
+        token wins and the other is cancelled.
+        If meta is given it receives the stopReason and usage reported at the end of the stream.
+        """
+        model_id = model_id or self.model_id
+        url = self.url_for(model_id)
+        breaker = self.breaker(model_id)
+        ttft = self._histogram(self._ttft, model_id)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{model_id} is failing; circuit breaker is open")
+
+        async def first_chunk(stream):
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return ""
+
+        streams = {}
+        stream = self._stream_once(url, payload, ttft, meta)
+        streams[asyncio.ensure_future(first_chunk(stream))] = stream
+        winner = None
+        try:
+            done, _ = await asyncio.wait(streams, timeout=self._hedge_delay(ttft))
+            if not done:
+                self._count("_hedges")
+                hedge = self._stream_once(url, payload, ttft, meta)
+                streams[asyncio.ensure_future(first_chunk(hedge))] = hedge
+
+            pending = set(streams)
+            error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+            if winner is None:
+                raise error
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            if is_unhealthy(e):
+                breaker.record_failure()
+            raise
+        finally:
+            for task, other in streams.items():
+                if task is not winner:
+                    if not task.done():
+                        task.cancel()
+                        try:
+                            await task
+                        except BaseException:
+                            pass
+                    await other.aclose()
+
+        if winner is not next(iter(streams)):
+            self._count("_hedge_wins")
+        stream = streams[winner]
+        try:
+            if winner.result():
+                yield winner.result()
+            async for text in stream:
+                yield text
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            if is_unhealthy(e):
+                breaker.record_failure()
+            raise
+        finally:
+            await stream.aclose()
+        breaker.record_success()
+
+    # -------------------------------
+    # SYNC WRAPPERS
+    # -------------------------------
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the client loop; returns a concurrent.futures.Future.
+        The caller's context variables (e.g. telemetry tags) are carried over.
+        """
+        return asyncio.run_coroutine_threadsafe(self._in_context(coro, contextvars.copy_context()), self._loop)
+
+    @staticmethod
+    async def _in_context(coro, context: contextvars.Context):
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    def run(self, coro, timeout: float = None, cancel: threading.Event = None):
+        """
+        Run a coroutine on the client loop and wait for its result. If the
+        cancel event is set first, the coroutine is cancelled (aborting its
+        request) and CallCancelled is raised.
+        """
+        future = self.submit(coro)
+        if cancel is None:
+            return future.result(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancel.is_set():
+                future.cancel()
+                raise CallCancelled()
+            wait = CANCEL_POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise concurrent.futures.TimeoutError()
+            try:
+                return future.result(wait)
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise  # The coroutine's own timeout, not our wait running out
+
+    def invoke(self, payload: dict, model_id: str = None, cancel: threading.Event = None) -> httpx.Response:
+        return self.run(self.ainvoke(payload, model_id), cancel=cancel)
+
+    def invoke_stream(self, payload: dict, model_id: str = None, meta: dict = None, cancel: threading.Event = None,
+                      site: str = None):
+        """Sync iterator over astream(); closing it early, or setting cancel, cancels the request"""
+        deltas = queue.Queue()
+        done = object()
+
+        async def pump():
+            if site:
+                CALL_SITE.set(site)  # This task's own context
+            try:
+                async for text in self.astream(payload, model_id, meta):
+                    deltas.put(text)
+            except asyncio.CancelledError:
+                deltas.put(done)
+                raise
+            except Exception as e:
+                deltas.put(e)
+            else:
+                deltas.put(done)
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item = deltas.get(timeout=CANCEL_POLL_INTERVAL if cancel is not None else None)
+                except queue.Empty:
+                    item = None
+                if cancel is not None and cancel.is_set():
+                    raise CallCancelled()
+                if item is None:
+                    continue
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        """
+        Connection pool statistics.
+        A hit is a request served on an already-open connection,
+        a miss is a request that had to open a new one.
+        """
+        with self._lock:
+            requests_sent = self._requests
+            misses = min(self._connects, requests_sent)
+            models = sorted(set(self._breakers) | set(self._latency) | set(self._ttft))
+            return {
+                "requests": requests_sent,
+                "errors": self._errors,
+                "in_flight": self._in_flight,
+                "pool_hits": requests_sent - misses,
+                "pool_misses": misses,
+                "hit_rate": round((requests_sent - misses) / requests_sent, 3) if requests_sent else 0.0,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "singleflight": self._singleflight.stats(),
+                "limiter": self._limiter.stats(),
+                "models": {
+                    model_id: {
+                        "latency": self._latency[model_id].snapshot() if model_id in self._latency else None,
+                        "time_to_first_token": self._ttft[model_id].snapshot() if model_id in self._ttft else None,
+                        "circuit": self._breakers[model_id].snapshot() if model_id in self._breakers else None,
+                    }
+                    for model_id in models
+                },
+            }
+
+    def close(self):
+        self.run(self._http.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_INITIAL_LIMIT = 8
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 32
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT = 20
+DEFAULT_BACKOFF = 0.5
+DEFAULT_LATENCY_BACKOFF = 0.9
+DEFAULT_LATENCY_TOLERANCE = 2.0
+
+# Statuses that mean "slow down"
+THROTTLE_STATUS = {429, 503}
+
+# The call site a request is made for ("generation", "evaluation", ...), set
+# by whoever knows it. Latency baselines are kept per site, model and mode,
+# so a long generation is not judged against short evaluation calls.
+CALL_SITE = contextvars.ContextVar("call_site", default=None)
+
+
+class LimiterRejected(Exception):
+    """Raised when a request cannot get a slot: the wait queue is full or the wait timed out"""
+
+
+class _Slot:
+    def __init__(self, limiter, latency_class):
+        self._limiter = limiter
+        self._latency_class = latency_class
+        self._started = None
+        self._recorded = False
+
+    def record(self, status_code: int):
+        """Report the upstream outcome so the limit can adapt"""
+        self._recorded = True
+        self._limiter._on_result(status_code, time.monotonic() - self._started, self._latency_class)
+
+    async def __aenter__(self):
+        await self._limiter._acquire()
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self._recorded and exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self._limiter._on_error()
+        self._limiter._release()
+        return False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter shared by every session in the process.
+
+    The limit grows by roughly one slot per limit's worth of successes
+    (additive increase) and is cut multiplicatively on 429/503 responses
+    or transport errors. Latency well above the running baseline for the
+    same kind of request trims it gently; other 4xx responses say nothing
+    about capacity and leave it alone. Requests beyond the limit wait in a bounded FIFO queue with a
+    timeout instead of hitting the endpoint. Must be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = DEFAULT_INITIAL_LIMIT,
+        min_limit: int = DEFAULT_MIN_LIMIT,
+        max_limit: int = DEFAULT_MAX_LIMIT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+        backoff: float = DEFAULT_BACKOFF,
+        latency_backoff: float = DEFAULT_LATENCY_BACKOFF,
+        latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._baselines = {}
+        self._last_decrease = 0.0
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0, "throttled": 0,
+                          "client_errors": 0, "decreases": 0}
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), self.min_limit)
+
+    # -------------------------------
+    # ADMISSION
+    # -------------------------------
+    def slot(self, mode: str = "invoke", model: str = None):
+        """
+        async with limiter.slot(mode, model) as slot: ... slot.record(status)
+        Latency is compared with earlier requests of the same CALL_SITE, model
+        and mode (e.g. "invoke" for full responses, "stream" for first bytes).
+        """
+        return _Slot(self, (CALL_SITE.get(), model, mode))
+
+    async def _acquire(self):
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise LimiterRejected("Too many requests waiting for Bedrock")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._counters["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            raise LimiterRejected("Timed out waiting for a Bedrock slot")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we were cancelled; give it back
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._counters["admitted"] += 1
+
+    def _release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    # -------------------------------
+    # ADAPTATION
+    # -------------------------------
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        # One cut per second at most, so a burst of 429s from one wave doesn't collapse the limit
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self._limit = max(self._limit * factor, self.min_limit)
+        self._counters["decreases"] += 1
+
+    def _on_result(self, status_code: int, latency: float, latency_class: tuple = None):
+        if status_code in THROTTLE_STATUS:
+            self._counters["throttled"] += 1
+            self._decrease(self.backoff)
+            return
+        if status_code >= 500:
+            self._decrease(self.backoff)
+            return
+        if status_code >= 400:
+            self._counters["client_errors"] += 1
+            return  # Our request was bad; no signal about Bedrock's capacity
+
+        baseline = self._baselines.get(latency_class)
+        baseline = latency if baseline is None else 0.95 * baseline + 0.05 * latency
+        self._baselines[latency_class] = baseline
+
+        if latency > baseline * self.latency_tolerance:
+            self._decrease(self.latency_backoff)
+        else:
+            self._limit = min(self._limit + 1.0 / self._limit, float(self.max_limit))
+            self._wake()
+
+    def _on_error(self):
+        self._decrease(self.backoff)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "latency_baselines": {
+                "/".join(str(part) for part in latency_class): round(baseline, 4)
+                for latency_class, baseline in self._baselines.items()
+            },
+            **self._counters,
+        }
+
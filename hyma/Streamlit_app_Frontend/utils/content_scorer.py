@@ -0,0 +1,285 @@
+import re
+
+import numpy as np
+
+# -------------------------------
+# LEXICONS
+# -------------------------------
+TONE_LEXICON = {
+    "Professional": "deliver delivered results strategy team project experience responsible achieve collaborate "
+                    "collaborated expertise objective stakeholders initiative impact growth opportunity pleased "
+                    "grateful proud professional organization development",
+    "Confident": "led built delivered achieved proven drove launched exceeded will certain confident expert "
+                 "mastered owned secured outperformed accomplished definitely clearly",
+    "Friendly": "thanks thank happy glad love excited hey hi welcome cheers folks friends together fun enjoy "
+                "awesome wonderful smile",
+    "Inspirational": "dream dreams believe journey inspire inspired passion courage never possible hope purpose "
+                     "future overcome resilience vision keep start brave",
+    "Conversational": "you you're your i'm i've it's let's here's honestly actually really just so well think "
+                      "guess okay anyway",
+}
+
+AUDIENCE_LEXICON = {
+    "Recruiters": "skills experience role team results achieved led certified certification hiring career "
+                  "opportunity responsible impact collaborated project internship position",
+    "General Audience": "everyone people story simple life community together share day learn easy world friends "
+                        "family help everyday",
+    "Technical Professionals": "api architecture python model models data cloud deployment latency algorithm "
+                               "framework pipeline code system performance scalable ai ml database "
+                               "infrastructure open source stack",
+    "Business Leaders": "revenue roi growth strategy market customers efficiency cost value scale stakeholders "
+                        "outcomes leadership business competitive profit",
+}
+
+PURPOSE_LEXICON = {
+    "Share Experience": "learned experience journey lesson lessons story realized remember when challenge challenges",
+    "Showcase Skills": "built developed designed implemented skills expertise using created engineered optimized",
+    "Inspire Others": "you can believe dream never start keep inspire possible anyone",
+    "Announce Achievement": "excited proud thrilled announce won awarded achieved honored milestone happy first",
+}
+
+SLANG = "gonna wanna gotta lol omg btw kinda sorta ya u ur dude stuff crazy totally yeah nope lit tbh imo"
+
+# Expected (min, max) hashtags and emoji per content type
+CONTENT_TYPE_NORMS = {
+    "LinkedIn Post": {"hashtags": (1, 5), "emoji": (0, 3)},
+    "Email": {"hashtags": (0, 0), "emoji": (0, 0)},
+    "Blog Post": {"hashtags": (0, 0), "emoji": (0, 1)},
+    "Tweet Thread": {"hashtags": (1, 4), "emoji": (0, 4)},
+    "Instagram Caption": {"hashtags": (3, 15), "emoji": (1, 8)},
+}
+DEFAULT_NORMS = {"hashtags": (0, 5), "emoji": (0, 3)}
+
+# Tones where informal writing is expected rather than penalised
+RELAXED_TONES = {"Friendly", "Conversational"}
+
+SCORE_KEYS = ["clarity", "engagement", "tone_consistency", "audience_relevance", "professionalism"]
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+WORD_RE = re.compile(r"[A-Za-z0-9']+")
+SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*")
+VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+SILENT_E_RE = re.compile(r"[^aeiouy\W]e\b")
+COMPLEX_WORD_RE = re.compile(r"\b(?:[^aeiouy\W]*[aeiouy]+){3,}[^aeiouy\W]*\b")
+HASHTAG_RE = re.compile(r"#\w+")
+MENTION_RE = re.compile(r"@\w+")
+EMOJI_RE = re.compile("[\U0001F300-\U0001FAFF☀-➿⭐✅]")
+CAPS_RE = re.compile(r"\b[A-Z]{4,}\b")
+REPEATED_PUNCT_RE = re.compile(r"[!?]{2,}|\.{4,}")
+LOWER_START_RE = re.compile(r"(?:^|[.!?]\s+)[a-z]")
+LOWER_I_RE = re.compile(r"(?:^|\s)i(?:\s|'m|'ve|'ll|'d)")
+CTA_RE = re.compile(
+    r"\b(?:comment|share|let me know|reach out|connect|follow|dm me|message me|learn more|sign up|join|"
+    r"check out|what do you think|thoughts\?|click|subscribe|reply|drop a)\b",
+    re.IGNORECASE,
+)
+
+
+def _categories():
+    categories = []
+    for group, lexicon in (("tone", TONE_LEXICON), ("audience", AUDIENCE_LEXICON), ("purpose", PURPOSE_LEXICON)):
+        for name, words in lexicon.items():
+            categories.append((group, name, set(words.split())))
+    categories.append(("slang", "slang", set(SLANG.split())))
+    return categories
+
+
+CATEGORIES = _categories()
+VOCAB = sorted(set().union(*(words for _, _, words in CATEGORIES)))
+VOCAB_INDEX = {word: i for i, word in enumerate(VOCAB)}
+
+# vocab x category membership; document-term counts @ this = lexicon hits per category
+CATEGORY_MATRIX = np.zeros((len(VOCAB), len(CATEGORIES)), dtype=np.float32)
+for column, (_, _, words) in enumerate(CATEGORIES):
+    for word in words:
+        CATEGORY_MATRIX[VOCAB_INDEX[word], column] = 1.0
+
+
+def _columns(group: str) -> dict:
+    return {name: i for i, (g, name, _) in enumerate(CATEGORIES) if g == group}
+
+
+TONE_COLUMNS = _columns("tone")
+AUDIENCE_COLUMNS = _columns("audience")
+PURPOSE_COLUMNS = _columns("purpose")
+SLANG_COLUMN = _columns("slang")["slang"]
+
+FEATURES = [
+    "words", "sentences", "syllables", "complex_words", "sentence_std", "long_sentences", "first_sentence_words",
+    "questions", "exclamations", "ctas", "hashtags", "mentions", "emoji", "caps_words",
+    "repeated_punct", "lower_starts", "lower_i", "numbers", "you",
+]
+F = {name: i for i, name in enumerate(FEATURES)}
+
+
+# -------------------------------
+# FEATURES
+# -------------------------------
+def extract_features(content: str):
+    """Surface counts for one text, plus the vocab ids of its lexicon words"""
+    text = content or ""
+    lower = text.lower()
+    tokens = TOKEN_RE.findall(lower)
+    words = len(WORD_RE.findall(text))
+
+    sentence_lengths = [len(WORD_RE.findall(s)) for s in SENTENCE_RE.findall(text)]
+    sentence_lengths = [n for n in sentence_lengths if n] or [words or 1]
+
+    syllables = len(VOWEL_GROUP_RE.findall(lower)) - len(SILENT_E_RE.findall(lower))
+    features = [
+        words,
+        len(sentence_lengths),
+        max(syllables, words),
+        len(COMPLEX_WORD_RE.findall(lower)),
+        float(np.std(sentence_lengths)),
+        sum(n > 30 for n in sentence_lengths),
+        sentence_lengths[0],
+        text.count("?"),
+        text.count("!"),
+        len(CTA_RE.findall(text)),
+        len(HASHTAG_RE.findall(text)),
+        len(MENTION_RE.findall(text)),
+        len(EMOJI_RE.findall(text)),
+        len(CAPS_RE.findall(text)),
+        len(REPEATED_PUNCT_RE.findall(text)),
+        len(LOWER_START_RE.findall(text)),
+        len(LOWER_I_RE.findall(text)),
+        sum(token.isdigit() for token in tokens),
+        sum(token in ("you", "your", "you're") for token in tokens),
+    ]
+    ids = [VOCAB_INDEX[token] for token in tokens if token in VOCAB_INDEX]
+    return features, ids
+
+
+def _pick(matrix: np.ndarray, columns: dict, names: list) -> np.ndarray:
+    """Per-row value of the column named for that row; NaN where the name is unknown"""
+    index = np.array([columns.get(name, -1) for name in names])
+    picked = matrix[np.arange(len(names)), np.maximum(index, 0)]
+    return np.where(index >= 0, picked, np.nan)
+
+
+def _norm_penalty(counts: np.ndarray, norms: list) -> np.ndarray:
+    low = np.array([n[0] for n in norms], dtype=float)
+    high = np.array([n[1] for n in norms], dtype=float)
+    return np.maximum(low - counts, 0) + np.maximum(counts - high, 0)
+
+
+# -------------------------------
+# SCORING
+# -------------------------------
+def score_many(items: list) -> list:
+    """
+    Score many texts at once. Each item is a dict with content and optionally
+    content_type, tone, audience, purpose and word_limit. Returns score dicts
+    in the same order and shape as score_content.
+
+    The per-text regex pass dominates: LinkedIn-sized posts take about
+    0.6-0.9 ms each, so 10k texts take 6-8 s, about 1.5x faster than calling
+    score_content() in a loop (benchmarks/content_scorer_bench.py).
+    """
+    n = len(items)
+    if n == 0:
+        return []
+
+    raw = np.zeros((n, len(FEATURES)))
+    term_counts = np.zeros((n, len(VOCAB)), dtype=np.float32)
+    for row, item in enumerate(items):
+        features, ids = extract_features(item.get("content"))
+        raw[row] = features
+        np.add.at(term_counts[row], ids, 1.0)
+    hits = term_counts @ CATEGORY_MATRIX
+
+    words = np.maximum(raw[:, F["words"]], 1)
+    per_100 = 100.0 / words
+    sentences = np.maximum(raw[:, F["sentences"]], 1)
+    words_per_sentence = words / sentences
+    tones = [item.get("tone") for item in items]
+    relaxed = np.array([tone in RELAXED_TONES for tone in tones])
+    norms = [CONTENT_TYPE_NORMS.get(item.get("content_type"), DEFAULT_NORMS) for item in items]
+
+    # Clarity: Flesch reading ease, sentence length, run-on sentences and share of 3+ syllable words
+    reading_ease = 206.835 - 1.015 * words_per_sentence - 84.6 * (raw[:, F["syllables"]] / words)
+    readability = np.clip(reading_ease * 100 / 65, 0, 100)
+    length_penalty = np.clip((words_per_sentence - 22) * 3, 0, 40) + np.clip((6 - words_per_sentence) * 6, 0, 30)
+    complex_penalty = np.clip((raw[:, F["complex_words"]] / words - 0.15) * 200, 0, 25)
+    run_on_penalty = np.clip(raw[:, F["long_sentences"]] * 10, 0, 30)
+    clarity = 0.6 * readability + 40 - length_penalty - complex_penalty - run_on_penalty
+
+    # Engagement: sentence rhythm, hook, questions, calls to action, reader focus, format fit
+    variation = raw[:, F["sentence_std"]] / words_per_sentence
+    rhythm = 15 * (1 - np.clip(np.abs(variation - 0.5) / 0.5, 0, 1))
+    hook = 8 * ((raw[:, F["first_sentence_words"]] <= 12) | (raw[:, F["numbers"]] > 0))
+    questions = 5 * np.minimum(raw[:, F["questions"]], 2)
+    ctas = 7.5 * np.minimum(raw[:, F["ctas"]], 2)
+    reader_focus = np.clip(raw[:, F["you"]] * per_100 * 2, 0, 10)
+    numbers = 2 * np.minimum(raw[:, F["numbers"]], 3)
+    hashtag_miss = _norm_penalty(raw[:, F["hashtags"]], [n["hashtags"] for n in norms])
+    emoji_miss = _norm_penalty(raw[:, F["emoji"]], [n["emoji"] for n in norms])
+    format_fit = 10 - np.clip(hashtag_miss * 3, 0, 10) - np.clip(emoji_miss * 3, 0, 10)
+    engagement = 40 + rhythm + hook + questions + ctas + reader_focus + numbers + format_fit
+
+    # Tone: share and density of the selected tone's vocabulary among all tone vocabulary
+    tone_hits = hits[:, list(TONE_COLUMNS.values())] * per_100[:, None]
+    target_tone = _pick(hits * per_100[:, None], TONE_COLUMNS, tones)
+    tone_share = np.where(tone_hits.sum(axis=1) > 0, target_tone / np.maximum(tone_hits.sum(axis=1), 1e-9), 0.3)
+    slang_density = hits[:, SLANG_COLUMN] * per_100
+    formal_slang = np.where(relaxed, 0, np.clip(slang_density * 10, 0, 20))
+    tone_consistency = np.where(
+        np.isnan(target_tone),
+        70,
+        55 + 35 * np.nan_to_num(tone_share) + np.clip(np.nan_to_num(target_tone) * 4, 0, 15) - formal_slang,
+    )
+
+    # Audience: audience and purpose vocabulary, reader focus, word-limit adherence
+    audience_density = np.nan_to_num(_pick(hits * per_100[:, None], AUDIENCE_COLUMNS, [i.get("audience") for i in items]), nan=2.5)
+    purpose_density = np.nan_to_num(_pick(hits * per_100[:, None], PURPOSE_COLUMNS, [i.get("purpose") for i in items]), nan=1.5)
+    limits = np.array([item.get("word_limit") or 0 for item in items], dtype=float)
+    adherence = np.where(limits > 0, np.abs(raw[:, F["words"]] - limits) / np.maximum(limits, 1), 0)
+    audience_relevance = (
+        50
+        + np.clip(audience_density * 6, 0, 30)
+        + np.clip(purpose_density * 5, 0, 15)
+        + np.clip(raw[:, F["you"]] * per_100, 0, 5)
+        - np.clip((adherence - 0.1) * 60, 0, 30)
+    )
+
+    # Professionalism: slang, shouting, punctuation runs, emoji overuse, capitalisation slips
+    relax = np.where(relaxed, 0.5, 1.0)
+    lower_starts = raw[:, F["lower_starts"]] / sentences
+    professionalism = (
+        98
+        - relax * (
+            slang_density * 8
+            + raw[:, F["caps_words"]] * 4
+            + raw[:, F["repeated_punct"]] * 5
+            + raw[:, F["exclamations"]] * per_100 * 3
+        )
+        - np.clip(emoji_miss * 4, 0, 20)
+        - lower_starts * 20
+        - raw[:, F["lower_i"]] * 3
+    )
+
+    scores = np.clip(np.stack([clarity, engagement, tone_consistency, audience_relevance, professionalism], axis=1), 0, 100)
+    scores = np.round(scores).astype(int)
+    empty = raw[:, F["words"]] == 0
+    scores[empty] = 0
+
+    results = []
+    for row in scores:
+        result = dict(zip(SCORE_KEYS, (int(v) for v in row)))
+        result["overall"] = int(sum(result.values()) / len(result))
+        results.append(result)
+    return results
+
+
+def score_content(content: str, content_type: str = None, tone: str = None, audience: str = None,
+                  purpose: str = None, word_limit: int = None) -> dict:
+    """Local quality scores (0-100) for one text, in the evaluation UI's score-dict shape"""
+    return score_many([{
+        "content": content,
+        "content_type": content_type,
+        "tone": tone,
+        "audience": audience,
+        "purpose": purpose,
+        "word_limit": word_limit,
+    }])[0]
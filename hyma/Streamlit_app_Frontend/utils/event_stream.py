@@ -0,0 +1,151 @@
+import base64
+import json
+import struct
+import zlib
+
+# -------------------------------
+# AWS EVENT STREAM FRAMING
+# -------------------------------
+# Bedrock's invoke-with-response-stream answers with
+# application/vnd.amazon.eventstream frames:
+#   total_length (4) | headers_length (4) | prelude_crc (4)
+#   headers | payload | message_crc (4)
+
+PRELUDE_LENGTH = 12
+TRAILER_LENGTH = 4
+
+
+class EventStreamError(Exception):
+    """Raised when the stream carries an exception message or is malformed"""
+
+
+def _decode_headers(raw: bytes) -> dict:
+    headers = {}
+    pos = 0
+    while pos < len(raw):
+        name_len = raw[pos]
+        pos += 1
+        name = raw[pos:pos + name_len].decode("utf-8")
+        pos += name_len
+        value_type = raw[pos]
+        pos += 1
+
+        if value_type in (0, 1):
+            value = value_type == 0
+        elif value_type == 2:
+            value = struct.unpack_from("!b", raw, pos)[0]
+            pos += 1
+        elif value_type == 3:
+            value = struct.unpack_from("!h", raw, pos)[0]
+            pos += 2
+        elif value_type == 4:
+            value = struct.unpack_from("!i", raw, pos)[0]
+            pos += 4
+        elif value_type in (5, 8):
+            value = struct.unpack_from("!q", raw, pos)[0]
+            pos += 8
+        elif value_type in (6, 7):
+            length = struct.unpack_from("!H", raw, pos)[0]
+            pos += 2
+            value = raw[pos:pos + length]
+            if value_type == 7:
+                value = value.decode("utf-8")
+            pos += length
+        elif value_type == 9:
+            value = raw[pos:pos + 16]
+            pos += 16
+        else:
+            raise EventStreamError(f"Unknown header type {value_type}")
+
+        headers[name] = value
+    return headers
+
+
+class MessageDecoder:
+    """Incrementally split raw bytes into (headers, payload) event stream messages"""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk: bytes):
+        if chunk:
+            self._buffer += chunk
+        messages = []
+        while len(self._buffer) >= PRELUDE_LENGTH:
+            total_length, headers_length = struct.unpack_from("!II", self._buffer, 0)
+            if len(self._buffer) < total_length:
+                break
+            headers_end = PRELUDE_LENGTH + headers_length
+            headers = _decode_headers(self._buffer[PRELUDE_LENGTH:headers_end])
+            payload = self._buffer[headers_end:total_length - TRAILER_LENGTH]
+            self._buffer = self._buffer[total_length:]
+            messages.append((headers, payload))
+        return messages
+
+    def close(self):
+        if self._buffer:
+            raise EventStreamError("Stream ended in the middle of a message")
+
+
+def decode_chunk(headers: dict, payload: bytes):
+    """
+    Decode one Bedrock stream message into its model chunk dict,
+    e.g. {"contentBlockDelta": {"delta": {"text": "..."}}}, or None for non-chunk events.
+    """
+    message_type = headers.get(":message-type", "event")
+    if message_type != "event":
+        detail = headers.get(":exception-type") or headers.get(":error-code") or "stream error"
+        try:
+            detail = f"{detail}: {json.loads(payload).get('message', '')}"
+        except ValueError:
+            pass
+        raise EventStreamError(detail)
+
+    if headers.get(":event-type") != "chunk":
+        return None
+
+    body = json.loads(payload)
+    if "bytes" not in body:
+        return None
+    return json.loads(base64.b64decode(body["bytes"]))
+
+
+def text_of(event: dict):
+    """Text delta carried by a model chunk, if any"""
+    return event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+
+
+async def aiter_chunks(chunks):
+    """Decode an async iterable of raw bytes into model chunk dicts"""
+    decoder = MessageDecoder()
+    async for chunk in chunks:
+        for headers, payload in decoder.feed(chunk):
+            event = decode_chunk(headers, payload)
+            if event is not None:
+                yield event
+    decoder.close()
+
+
+def encode_message(headers: dict, payload: bytes) -> bytes:
+    """Encode one event stream message (string headers only), CRCs included"""
+    raw_headers = b""
+    for name, value in headers.items():
+        name_bytes = name.encode("utf-8")
+        value_bytes = str(value).encode("utf-8")
+        raw_headers += struct.pack("!B", len(name_bytes)) + name_bytes
+        raw_headers += struct.pack("!BH", 7, len(value_bytes)) + value_bytes
+
+    total_length = PRELUDE_LENGTH + len(raw_headers) + len(payload) + TRAILER_LENGTH
+    prelude = struct.pack("!II", total_length, len(raw_headers))
+    prelude += struct.pack("!I", zlib.crc32(prelude))
+    message = prelude + raw_headers + payload
+    return message + struct.pack("!I", zlib.crc32(message))
+
+
+def encode_chunk(event: dict) -> bytes:
+    """Wrap a model chunk dict the way Bedrock does: base64 JSON inside a 'chunk' event"""
+    body = {"bytes": base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii")}
+    return encode_message(
+        {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"},
+        json.dumps(body).encode("utf-8"),
+    )
@@ -0,0 +1,80 @@
+from sqlalchemy import func, or_, tuple_
+
+from Auth_Backend.models import ContentHistory
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_PAGE_SIZE = 20
+
+HISTORY_INDEX_NAME = "ix_content_history_user_created_id"
+
+# What the Saved Drafts list shows; generated_content is fetched per item
+# with history_body() when it is opened
+LIST_COLUMNS = (
+    ContentHistory.id,
+    ContentHistory.title,
+    ContentHistory.content_type,
+    ContentHistory.tone,
+    ContentHistory.audience,
+    ContentHistory.purpose,
+    ContentHistory.word_limit,
+    ContentHistory.created_at,
+)
+
+
+def create_history_index(engine):
+    """users.db files from before pagination lack the index; create it if missing"""
+    for index in ContentHistory.__table__.indexes:
+        if index.name == HISTORY_INDEX_NAME:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _search_filter(search: str):
+    """Case-insensitive substring match on title or content; % and _ in the search are literal"""
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    return or_(
+        ContentHistory.title.ilike(pattern, escape="\\"),
+        ContentHistory.generated_content.ilike(pattern, escape="\\"),
+    )
+
+
+def history_page(db, email: str, limit: int = DEFAULT_PAGE_SIZE, after: tuple = None, search: str = None):
+    """
+    One page of a user's history (LIST_COLUMNS rows, no content), newest
+    first, and the cursor for the next page (None on the last one). Pass
+    that cursor back as `after`: it is the (created_at, id) of the last item
+    shown, so pages stay stable while new drafts are saved and never need
+    an OFFSET.
+    """
+    query = db.query(*LIST_COLUMNS).filter(ContentHistory.user_email == email)
+    if search:
+        query = query.filter(_search_filter(search))
+    if after is not None:
+        query = query.filter(tuple_(ContentHistory.created_at, ContentHistory.id) < tuple_(*after))
+    rows = (
+        query.order_by(ContentHistory.created_at.desc(), ContentHistory.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    items = rows[:limit]
+    cursor = (items[-1].created_at, items[-1].id) if len(rows) > limit else None
+    return items, cursor
+
+
+def history_counts(db, email: str) -> dict:
+    """Number of saved items per content type, without loading any of them"""
+    rows = (
+        db.query(ContentHistory.content_type, func.count(ContentHistory.id))
+        .filter(ContentHistory.user_email == email)
+        .group_by(ContentHistory.content_type)
+        .all()
+    )
+    return dict(rows)
+
+
+def history_body(db, item_id: int):
+    """The generated content of one history item, or None if it is gone"""
+    row = db.query(ContentHistory.generated_content).filter(ContentHistory.id == item_id).first()
+    return row[0] if row else None
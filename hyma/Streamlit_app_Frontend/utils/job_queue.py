@@ -0,0 +1,366 @@
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_WORKERS = 4
+DEFAULT_RESULT_TTL = 3600
+DEFAULT_PROGRESS_INTERVAL = 0.15
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (PENDING, RUNNING)
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.check() once a running job has been cancelled"""
+
+
+def job_key(kind: str, payload: dict) -> str:
+    """Canonical identity of a job: same kind and same payload means same result"""
+    canonical = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobContext:
+    """
+    What a handler gets besides its payload: the job id, its owner, the
+    submitter's trace context (a traceparent string), a throttled progress
+    reporter and a cancel flag. Handlers pass cancel_event to blocking calls
+    that can abort (BedrockClient.run and friends) and call check() before
+    doing anything that outlives the job, such as writing a cache.
+    """
+
+    def __init__(self, jobs: "JobQueue", job_id: str, interval: float, owner: str = None, trace: str = None,
+                 cancel_event: threading.Event = None):
+        self.id = job_id
+        self.owner = owner
+        self.trace = trace
+        self.cancel_event = cancel_event or threading.Event()
+        self._jobs = jobs
+        self._interval = interval
+        self._reported_at = 0.0
+
+    def progress(self, value, force: bool = False):
+        """Publish partial output (any JSON value) for pollers, at most once per interval"""
+        now = time.monotonic()
+        if force or now - self._reported_at >= self._interval:
+            self._reported_at = now
+            self._jobs._set_progress(self.id, value)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+
+class JobQueue:
+    """
+    Background jobs that outlive the script run which started them.
+
+    Jobs are rows in SQLite and run on a pool of worker threads, so a rerun
+    or a browser refresh does not cancel or repeat them: the page keeps the
+    job id, polls get(), and picks up the result whenever it lands. A job
+    submitted while an identical one is pending, running or recently done
+    gets that job's id instead, and a job is only cancelled once every
+    submitter has cancelled it. Jobs left pending or running by a
+    previous process are run again on start().
+    """
+
+    def __init__(
+        self,
+        path: str = "jobs.db",
+        workers: int = DEFAULT_WORKERS,
+        result_ttl: float = DEFAULT_RESULT_TTL,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.progress_interval = progress_interval
+
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._queue = queue.Queue()
+        self._finished = {}
+        self._running = {}
+        self._threads = []
+        self._counters = {"submitted": 0, "deduplicated": 0, "recovered": 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                owner TEXT,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                error_type TEXT,
+                subscribers INTEGER NOT NULL DEFAULT 1,
+                trace TEXT,
+                acked INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "trace" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN trace TEXT")  # jobs.db files from before tracing
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_jobs_key ON jobs (key, status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_jobs_owner ON jobs (owner, kind, created_at)")
+        self._db.commit()
+
+    # -------------------------------
+    # SETUP
+    # -------------------------------
+    def register(self, kind: str, handler):
+        """handler(payload, job: JobContext) -> JSON-serialisable result; exceptions fail the job"""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Requeue work left over from a previous process and start the workers"""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (PENDING, RUNNING))
+            self._db.commit()
+            leftover = [row[0] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (PENDING,)
+            )]
+            self._counters["recovered"] += len(leftover)
+        for job_id in leftover:
+            self._queue.put(job_id)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    # -------------------------------
+    # SUBMIT / POLL
+    # -------------------------------
+    def submit(self, kind: str, payload: dict, owner: str = None, dedup: bool = True, trace: str = None) -> str:
+        key = job_key(kind, payload)
+        now = time.time()
+        with self._lock:
+            if dedup:
+                row = self._db.execute(
+                    """
+                    SELECT id FROM jobs
+                    WHERE key = ? AND (status IN (?, ?) OR (status = ? AND finished_at > ?))
+                    ORDER BY created_at DESC LIMIT 1
+                    """,
+                    (key, PENDING, RUNNING, DONE, now - self.result_ttl),
+                ).fetchone()
+                cancel_event = self._running.get(row[0]) if row else None
+                if row and not (cancel_event and cancel_event.is_set()):  # Not one that is being cancelled
+                    self._db.execute("UPDATE jobs SET subscribers = subscribers + 1 WHERE id = ?", (row[0],))
+                    self._db.commit()
+                    self._counters["deduplicated"] += 1
+                    return row[0]
+
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, key, owner, status, payload, trace, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, owner, PENDING, json.dumps(payload), trace, now),
+            )
+            self._db.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished_at < ?",
+                (PENDING, RUNNING, now - self.result_ttl),
+            )
+            self._db.commit()
+            self._counters["submitted"] += 1
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id: str):
+        """The job as a dict (payload, progress and result decoded), or None if unknown or purged"""
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        for field in ("payload", "progress", "result"):
+            job[field] = json.loads(job[field]) if job[field] is not None else None
+        return job
+
+    def wait(self, job_id: str, timeout: float = None):
+        """Block until the job has finished (or timeout) and return it"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Register before reading the status, under the same lock _finish
+            # and _signal take, so a job finishing in between still wakes us
+            with self._lock:
+                row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None or row[0] not in ACTIVE:
+                    self._finished.pop(job_id, None)
+                    break
+                event = self._finished.setdefault(job_id, threading.Event())
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            event.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+        return self.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Drop one submitter's interest in a job. Once nobody is waiting for it
+        any more, a pending job is cancelled outright and a running job has
+        its cancel flag set, which aborts its in-flight calls; it then ends as
+        cancelled, without a result.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET subscribers = MAX(subscribers - 1, 0) WHERE id = ? AND status IN (?, ?)",
+                (job_id, PENDING, RUNNING),
+            )
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ? AND subscribers = 0",
+                (CANCELLED, time.time(), job_id, PENDING),
+            )
+            self._db.commit()
+            if cursor.rowcount > 0:
+                self._counters[CANCELLED] += 1
+            else:
+                row = self._db.execute(
+                    "SELECT 1 FROM jobs WHERE id = ? AND status = ? AND subscribers = 0", (job_id, RUNNING)
+                ).fetchone()
+                cancel_event = self._running.get(job_id)
+                if row is None or cancel_event is None:
+                    return False
+                cancel_event.set()  # The worker finishes it as cancelled
+                return True
+        self._signal(job_id)
+        return True
+
+    def ack(self, job_id: str):
+        """Mark a finished job's result as delivered to its owner"""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET acked = 1 WHERE id = ?", (job_id,))
+            self._db.commit()
+
+    def latest(self, owner: str, kind: str, max_age: float):
+        """The owner's newest undelivered job of a kind, e.g. to resume after a browser refresh"""
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT id FROM jobs
+                WHERE owner = ? AND kind = ? AND acked = 0 AND status IN (?, ?, ?) AND created_at > ?
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (owner, kind, PENDING, RUNNING, DONE, time.time() - max_age),
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    # -------------------------------
+    # WORKERS
+    # -------------------------------
+    def _set_progress(self, job_id: str, value):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(value), job_id))
+            self._db.commit()
+
+    def _signal(self, job_id: str):
+        with self._lock:
+            event = self._finished.pop(job_id, None)
+        if event:
+            event.set()
+
+    def _claim(self, job_id: str):
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, PENDING),
+            )
+            self._db.commit()
+            if cursor.rowcount == 0:
+                return None
+            return self._db.execute("SELECT kind, payload, owner, trace FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _finish(self, job_id: str, status: str, result=None, error: Exception = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, error_type = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    str(error) if error else None,
+                    type(error).__name__ if error else None,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._db.commit()
+            self._counters[status] += 1
+        self._signal(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            claimed = self._claim(job_id)
+            if claimed is None:
+                continue  # Cancelled, or already taken
+            kind, payload, owner, trace = claimed
+            handler = self._handlers.get(kind)
+            cancel_event = threading.Event()
+            with self._lock:
+                self._running[job_id] = cancel_event
+            try:
+                if handler is None:
+                    raise LookupError(f"no handler registered for {kind!r} jobs")
+                result = handler(
+                    json.loads(payload),
+                    JobContext(self, job_id, self.progress_interval, owner, trace, cancel_event),
+                )
+            except Exception as e:
+                if cancel_event.is_set():
+                    self._finish(job_id, CANCELLED)
+                else:
+                    self._finish(job_id, FAILED, error=e)
+            else:
+                if cancel_event.is_set():
+                    self._finish(job_id, CANCELLED)
+                else:
+                    self._finish(job_id, DONE, result)
+            finally:
+                with self._lock:
+                    self._running.pop(job_id, None)
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            wait, run = self._db.execute(
+                """
+                SELECT AVG(started_at - created_at), AVG(finished_at - started_at)
+                FROM jobs WHERE status IN (?, ?) AND started_at IS NOT NULL
+                """,
+                (DONE, FAILED),
+            ).fetchone()
+            return {
+                **self._counters,
+                "queued": self._queue.qsize(),
+                "statuses": statuses,
+                "mean_wait_seconds": round(wait, 4) if wait is not None else None,
+                "mean_run_seconds": round(run, 4) if run is not None else None,
+            }
@@ -0,0 +1,282 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from utils.bedrock_client import UNHEALTHY_STATUS, CallCancelled
+from utils.concurrency import LimiterRejected
+from utils.resilience import CircuitOpenError, LatencyHistogram
+
+# -------------------------------
+# MODELS AND ROUTES
+# -------------------------------
+NOVA_MICRO = "amazon.nova-micro-v1:0"
+NOVA_LITE = "amazon.nova-lite-v1:0"
+NOVA_PRO = "amazon.nova-pro-v1:0"
+
+# USD per 1,000 tokens as (input, output), on-demand pricing
+MODEL_PRICES = {
+    NOVA_MICRO: (0.000035, 0.00014),
+    NOVA_LITE: (0.00006, 0.00024),
+    NOVA_PRO: (0.0008, 0.0032),
+}
+
+# Call site -> latency SLO in seconds (the primary's smoothed latency at that
+# call site). A route may also name its "primary" and "fallback" models
+# (BEDROCK_ROUTES in secrets). Without a primary the site uses the client's
+# own model, i.e. the one in BEDROCK_URL.
+DEFAULT_ROUTES = {
+    "prompts": {"slo": 5.0},
+    "generation": {"slo": 15.0},
+    "evaluation": {"slo": 5.0},
+}
+
+# Without a fallback of its own, a site falls back to the first of these
+# that is not its primary
+FALLBACK_MODELS = (NOVA_LITE, NOVA_MICRO)
+
+DEFAULT_PROBE_INTERVAL = 30
+DEFAULT_SMOOTHING = 0.2
+
+
+def usage_of(response: httpx.Response):
+    """Token usage block of an invoke response, if present"""
+    try:
+        return response.json().get("usage")
+    except ValueError:
+        return None
+
+
+class ModelRouter:
+    """
+    Picks the Bedrock model for each call site from a routing table.
+
+    Every call is recorded against its (call site, model) with latency,
+    status, tokens and cost. When the primary model's smoothed latency at a
+    call site is over the route's SLO, traffic moves to the fallback model,
+    with one probe call every probe_interval seconds so the primary can win
+    its traffic back. A call that errors on one model is retried once on the
+    other; queue rejections are not, since the limiter is shared.
+
+    If a sink is given, every call record is also passed to it (e.g.
+    TelemetryWriter.record_call).
+    """
+
+    def __init__(
+        self,
+        client,
+        routes: dict = None,
+        prices: dict = None,
+        probe_interval: float = DEFAULT_PROBE_INTERVAL,
+        smoothing: float = DEFAULT_SMOOTHING,
+        sink=None,
+    ):
+        self.client = client
+        self.sink = sink
+        self.routes = {site: dict(route) for site, route in DEFAULT_ROUTES.items()}
+        for site, route in (routes or {}).items():
+            self.routes.setdefault(site, {}).update(route)
+        self.prices = {**MODEL_PRICES, **(prices or {})}
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._sites = {}
+        self._models = {}
+        self._probed_at = {}
+
+    # -------------------------------
+    # ROUTING
+    # -------------------------------
+    def primary(self, site: str) -> str:
+        return self.routes.get(site, {}).get("primary") or self.client.model_id
+
+    def fallback(self, site: str):
+        """The site's own fallback, else the first of FALLBACK_MODELS that is not its primary"""
+        primary = self.primary(site)
+        fallback = self.routes.get(site, {}).get("fallback")
+        if fallback and fallback != primary:
+            return fallback
+        return next((model_id for model_id in FALLBACK_MODELS if model_id != primary), None)
+
+    def plan(self, site: str) -> list:
+        """Models to try for a call, in order, each with the reason it was picked"""
+        route = self.routes.get(site, {})
+        primary = self.primary(site)
+        fallback = self.fallback(site)
+        if not fallback:
+            return [(primary, "primary")]
+
+        slo = route.get("slo")
+        with self._lock:
+            stats = self._sites.get((site, primary))
+            breached = slo is not None and stats is not None and stats["smoothed"] is not None and stats["smoothed"] > slo
+            if breached:
+                now = time.monotonic()
+                if now - self._probed_at.get(site, 0.0) < self.probe_interval:
+                    return [(fallback, "slo_breach"), (primary, "error_fallback")]
+                self._probed_at[site] = now
+                return [(primary, "probe"), (fallback, "error_fallback")]
+        return [(primary, "primary"), (fallback, "error_fallback")]
+
+    def cost(self, model_id: str, usage: dict) -> float:
+        if not usage:
+            return 0.0
+        input_price, output_price = self.prices.get(model_id, (0.0, 0.0))
+        return (usage.get("inputTokens", 0) * input_price + usage.get("outputTokens", 0) * output_price) / 1000
+
+    def _record(self, site: str, model_id: str, reason: str, started: float, status, usage: dict = None) -> dict:
+        latency = time.monotonic() - started
+        ok = status == 200
+        usage = usage or {}
+        call = {
+            "time": time.time(),
+            "site": site,
+            "model": model_id,
+            "reason": reason,
+            "status": status,
+            "latency": round(latency, 4),
+            "input_tokens": usage.get("inputTokens", 0),
+            "output_tokens": usage.get("outputTokens", 0),
+            "cost": self.cost(model_id, usage),
+        }
+        with self._lock:
+            stats = self._sites.get((site, model_id))
+            if stats is None:
+                stats = {"latency": LatencyHistogram(), "smoothed": None, "calls": 0, "errors": 0}
+                self._sites[(site, model_id)] = stats
+            stats["calls"] += 1
+            if ok:
+                stats["latency"].record(latency)
+                if stats["smoothed"] is None:
+                    stats["smoothed"] = latency
+                else:
+                    stats["smoothed"] += self.smoothing * (latency - stats["smoothed"])
+            else:
+                stats["errors"] += 1
+
+            totals = self._models.setdefault(
+                model_id, {"calls": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+            )
+            totals["calls"] += 1
+            totals["errors"] += 0 if ok else 1
+            totals["input_tokens"] += call["input_tokens"]
+            totals["output_tokens"] += call["output_tokens"]
+            totals["cost"] += call["cost"]
+        if self.sink:
+            self.sink(call)
+        return call
+
+    # -------------------------------
+    # CALLS
+    # -------------------------------
+    async def ainvoke(self, site: str, payload: dict, timeout: float = None):
+        """
+        Route one invoke call; returns (response, model_id). timeout bounds
+        the whole call, fallbacks included; running out raises TimeoutError.
+        """
+        response, model_id, error = None, None, None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for model_id, reason in self.plan(site):
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(self.client.ainvoke(payload, model_id, site), remaining)
+            except asyncio.CancelledError:
+                self._record(site, model_id, reason, started, "cancelled")
+                raise
+            except LimiterRejected:
+                self._record(site, model_id, reason, started, "rejected")
+                raise
+            except (CircuitOpenError, httpx.HTTPError, asyncio.TimeoutError) as e:
+                self._record(site, model_id, reason, started, type(e).__name__)
+                response, error = None, e
+                continue
+            self._record(site, model_id, reason, started, response.status_code, usage_of(response))
+            if response.status_code not in UNHEALTHY_STATUS:
+                return response, model_id
+        if response is not None:
+            return response, model_id
+        raise error
+
+    def invoke(self, site: str, payload: dict, cancel=None):
+        return self.client.run(self.ainvoke(site, payload), cancel=cancel)
+
+    async def ainvoke_many(self, site: str, payloads: list, timeout: float = None) -> list:
+        """
+        Route several calls concurrently, each with its own timeout; each
+        result is (response, model_id) or the exception it raised
+        """
+        return await asyncio.gather(
+            *(self.ainvoke(site, payload, timeout) for payload in payloads), return_exceptions=True
+        )
+
+    def invoke_many(self, site: str, payloads: list, timeout: float = None, cancel=None) -> list:
+        return self.client.run(self.ainvoke_many(site, payloads, timeout), cancel=cancel)
+
+    def invoke_stream(self, site: str, payload: dict, meta: dict = None, cancel=None):
+        """
+        Route a streaming call and yield its text deltas. Falls back to the
+        next model only if the stream fails before its first token. The chosen
+        model is stored in meta["model"] along with stopReason and usage.
+        """
+        meta = {} if meta is None else meta
+        plan = self.plan(site)
+        for attempt, (model_id, reason) in enumerate(plan):
+            started = time.monotonic()
+            stream = self.client.invoke_stream(payload, model_id, meta, cancel, site)
+            try:
+                first = next(stream, "")
+            except LimiterRejected:
+                self._record(site, model_id, reason, started, "rejected")
+                raise
+            except CallCancelled:
+                self._record(site, model_id, reason, started, "cancelled")
+                raise
+            except Exception as e:
+                stream.close()
+                self._record(site, model_id, reason, started, type(e).__name__)
+                if attempt == len(plan) - 1:
+                    raise
+                continue
+            break
+
+        meta["model"] = model_id
+        try:
+            if first:
+                yield first
+            yield from stream
+        except (GeneratorExit, CallCancelled):
+            self._record(site, model_id, reason, started, "cancelled")
+            raise
+        except Exception as e:
+            self._record(site, model_id, reason, started, type(e).__name__)
+            raise
+        finally:
+            stream.close()
+        self._record(site, model_id, reason, started, 200, meta.get("usage"))
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            sites = {}
+            for (site, model_id), stats in self._sites.items():
+                sites.setdefault(site, {})[model_id] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "smoothed_latency": stats["smoothed"],
+                    "latency": stats["latency"].snapshot(),
+                }
+            return {
+                "routes": {
+                    site: {**route, "primary": self.primary(site), "fallback": self.fallback(site)}
+                    for site, route in self.routes.items()
+                },
+                "sites": sites,
+                "models": {model_id: dict(totals) for model_id, totals in self._models.items()},
+            }
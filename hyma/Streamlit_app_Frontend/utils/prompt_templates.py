@@ -0,0 +1,113 @@
+from utils.token_budget import estimate_tokens
+
+# -------------------------------
+# RENDERED PROMPTS
+# -------------------------------
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Bedrock only caches a prefix from this many tokens up (Nova models: 1K per cache checkpoint)
+DEFAULT_MIN_CACHE_TOKENS = 1024
+
+
+class Prompt(str):
+    """
+    A rendered prompt. As a str it is the full text, so cache keys, re-asks
+    and logging keep working; build_payload() sends the static prefix as
+    the system block (followed by a cache point when cache_point is set)
+    and only the per-call body as the user message.
+    """
+
+    def __new__(cls, prefix: str, body: str, cache_point: bool = False):
+        prompt = super().__new__(cls, f"{prefix}\n\n{body}" if prefix else body)
+        prompt.prefix = prefix
+        prompt.body = body
+        prompt.cache_point = cache_point
+        return prompt
+
+    def extend(self, text: str) -> "Prompt":
+        """Same prefix, more body (continuations and follow-ups reuse the cached prefix)"""
+        return Prompt(self.prefix, f"{self.body}{text}", self.cache_point)
+
+
+class PromptTemplate:
+    """A call site's prompt: a static prefix shared by every call, then the per-call body"""
+
+    def __init__(self, prefix: str, body: str):
+        self.prefix = prefix.strip()
+        self.body = body.strip()
+        self.prefix_tokens = estimate_tokens(self.prefix)
+
+    def render(self, cache_point: bool = False, **values) -> Prompt:
+        return Prompt(self.prefix, self.body.format(**values), cache_point)
+
+
+# -------------------------------
+# TEMPLATES
+# -------------------------------
+# Prefixes must stay byte-identical between calls: no user values, dates or counts in them.
+TEMPLATES = {
+    "prompts": PromptTemplate(
+        prefix="""
+Refine a rough idea into writing prompts, each taking a different angle.
+Return JSON keyed prompt1, prompt2, ...: {"prompt1": {"title": "...", "prompt": "..."}, "prompt2": {"title": "...", "prompt": "..."}}
+""",
+        body="""
+Generate {count} different refined prompts from: "{idea}"
+""",
+    ),
+    "generation": PromptTemplate(
+        prefix="""
+Create engaging, authentic content that resonates with the target audience.
+Return only the content, with no preamble.
+""",
+        body="""
+Write a {tone} {content_type} in approximately {word_limit} words.
+Audience: {audience}
+Purpose: {purpose}
+Content: {topic}
+""",
+    ),
+    "evaluation": PromptTemplate(
+        prefix="""
+Analyze the content below and score each criterion from 0 to 100 against its expected characteristics.
+Return only JSON in exactly this format, no other text:
+{"clarity": 85, "engagement": 78, "tone_consistency": 92, "audience_relevance": 88, "professionalism": 90}
+""",
+        body="""
+Content type: {content_type}
+Expected characteristics:
+- Tone: {tone}
+- Audience: {audience}
+- Purpose: {purpose}
+
+Content to evaluate:
+{content}
+""",
+    ),
+}
+
+
+class PromptRegistry:
+    """
+    Renders call-site prompts from TEMPLATES. A cache point is added after
+    the static prefix when cache points are enabled and the prefix is long
+    enough for the provider to cache it.
+    """
+
+    def __init__(self, templates: dict = None, cache_points: bool = True,
+                 min_cache_tokens: int = DEFAULT_MIN_CACHE_TOKENS):
+        self.templates = templates or TEMPLATES
+        self.cache_points = cache_points
+        self.min_cache_tokens = min_cache_tokens
+
+    def render(self, site: str, **values) -> Prompt:
+        template = self.templates[site]
+        cache_point = self.cache_points and template.prefix_tokens >= self.min_cache_tokens
+        return template.render(cache_point, **values)
+
+    def stats(self) -> dict:
+        return {
+            site: {"prefix_tokens": template.prefix_tokens,
+                   "cache_point": self.cache_points and template.prefix_tokens >= self.min_cache_tokens}
+            for site, template in self.templates.items()
+        }
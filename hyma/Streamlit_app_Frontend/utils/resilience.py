@@ -0,0 +1,126 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_WINDOW = 500
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+
+class LatencyHistogram:
+    """
+    Rolling latency window. Keeps the last `window` samples in arrival order
+    plus a sorted copy so percentiles are a simple index lookup.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._samples = deque()
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            if len(self._samples) >= self.window:
+                oldest = self._samples.popleft()
+                del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+            self._samples.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float):
+        """p in 0-100; None when there are no samples yet"""
+        with self._lock:
+            if not self._sorted:
+                return None
+            index = min(int(len(self._sorted) * p / 100), len(self._sorted) - 1)
+            return self._sorted[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": len(self),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+    closed: calls flow; consecutive failures are counted.
+    open: calls fail fast until reset_timeout has passed.
+    half_open: a single probe is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counters = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream right now"""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._counters["opened"] += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                **self._counters,
+            }
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_MEMORY_BYTES = 8 * 1024 * 1024
+DEFAULT_DISK_BYTES = 64 * 1024 * 1024
+
+
+def make_cache_key(model: str, prompt: str, max_tokens: int, temperature: float) -> str:
+    """Canonical hash of everything that determines a model response"""
+    canonical = json.dumps(
+        {
+            "model": model,
+            "prompt": prompt,
+            "max_tokens": int(max_tokens),
+            "temperature": round(float(temperature), 4),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache: an in-memory LRU in front of a SQLite store
+    that survives restarts. Both tiers are bounded by total stored bytes.
+    """
+
+    def __init__(
+        self,
+        path: str = "response_cache.db",
+        max_memory_bytes: int = DEFAULT_MEMORY_BYTES,
+        max_disk_bytes: int = DEFAULT_DISK_BYTES,
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "writes": 0,
+            "evictions": 0,
+            "bytes_served": 0,
+        }
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_response_cache_last_access ON response_cache (last_access)"
+        )
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()[0]
+
+    # -------------------------------
+    # LOOKUP
+    # -------------------------------
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss or expiry"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    self._counters["bytes_served"] += len(value.encode("utf-8"))
+                    return value
+                self._drop_memory(key)
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._drop_disk(key)
+                self._counters["misses"] += 1
+                return None
+
+            value, expires_at = row
+            self._db.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self._put_memory(key, value, expires_at)
+            self._counters["disk_hits"] += 1
+            self._counters["bytes_served"] += len(value.encode("utf-8"))
+            return value
+
+    def record_bypass(self):
+        """Count a lookup that was skipped on purpose (e.g. Regenerate)"""
+        with self._lock:
+            self._counters["bypassed"] += 1
+
+    # -------------------------------
+    # STORE
+    # -------------------------------
+    def set(self, key: str, value: str, ttl: float):
+        """Store value in both tiers for ttl seconds"""
+        now = time.time()
+        expires_at = now + ttl
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+
+            old = self._db.execute(
+                "SELECT size FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, expires_at, now),
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict_disk(now)
+            self._db.commit()
+            self._counters["writes"] += 1
+
+    # -------------------------------
+    # EVICTION
+    # -------------------------------
+    def _put_memory(self, key: str, value: str, expires_at: float):
+        self._drop_memory(key)
+        self._memory[key] = (value, expires_at)
+        self._memory_bytes += len(value.encode("utf-8"))
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[0].encode("utf-8"))
+
+    def _drop_disk(self, key: str):
+        row = self._db.execute("SELECT size FROM response_cache WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self._disk_bytes -= row[0]
+
+    def _evict_disk(self, now: float):
+        expired = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM response_cache WHERE expires_at <= ?", (now,)
+        ).fetchone()
+        if expired[1]:
+            self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            self._disk_bytes -= expired[0]
+            self._counters["evictions"] += expired[1]
+
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._db.execute(
+                "SELECT key, size FROM response_cache ORDER BY last_access LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._disk_bytes -= size
+                self._counters["evictions"] += 1
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+            counters.update({
+                "hit_rate": round((lookups - counters["misses"]) / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            })
+        return counters
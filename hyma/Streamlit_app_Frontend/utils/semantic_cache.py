@@ -0,0 +1,183 @@
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_DIM = 512
+DEFAULT_NGRAM = 3
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_MAX_ENTRIES = 20000
+
+# Words that can change between two phrasings of the same idea. They are left
+# out of the vectors, so "won a hackathon" and "we won the hackathon today"
+# land on the same point.
+STOPWORDS = frozenset("""
+a an the and or but of in on at to for from with by as about into over after before
+i i'm im me my mine we our us you your it its this that these those
+is am are was were be been being have has had do did does will would can could
+just so very really also finally recently today
+""".split())
+
+
+def normalize_text(text: str) -> str:
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def fact_words(text: str) -> frozenset:
+    """The content words and numbers of a text, ignoring order, case and filler"""
+    return frozenset(word for word in normalize_text(text).split(" ") if word and word not in STOPWORDS)
+
+
+def key_facts(text: str) -> frozenset:
+    """
+    Numbers and proper nouns (capitalised words that do not start a
+    sentence), lowercased. Changing one of these changes the idea, however
+    close the rest of the text is: "joined Google" is not "joined Meta".
+    """
+    keys = set()
+    for sentence in re.split(r"[.!?\n]+", text):
+        for i, word in enumerate(re.findall(r"\w+", sentence)):
+            lowered = word.lower()
+            if lowered in STOPWORDS:
+                continue
+            if any(c.isdigit() for c in word) or (i > 0 and word[0].isupper()):
+                keys.add(lowered)
+    return frozenset(keys)
+
+
+def hash_features(text: str, ngram: int = DEFAULT_NGRAM):
+    """Fact word tokens plus character n-grams of each, as stable hashes"""
+    features = []
+    for word in normalize_text(text).split(" "):
+        if not word or word in STOPWORDS:
+            continue
+        features.append(zlib.crc32(b"w:" + word.encode("utf-8")))
+        padded = f" {word} "
+        for i in range(max(len(padded) - ngram + 1, 1)):
+            features.append(zlib.crc32(padded[i:i + ngram].encode("utf-8")))
+    return features
+
+
+def vectorize(text: str, dim: int = DEFAULT_DIM, ngram: int = DEFAULT_NGRAM) -> np.ndarray:
+    """L2-normalised hashed n-gram vector (signed hashing trick)"""
+    vector = np.zeros(dim, dtype=np.float32)
+    hashes = np.array(hash_features(text, ngram), dtype=np.uint32)
+    if hashes.size == 0:
+        return vector
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class SemanticCache:
+    """
+    Near-duplicate lookup over previously seen texts.
+    Vectors live in a preallocated NumPy matrix and are matched by cosine
+    similarity; when the index is full the least recently used row is reused.
+
+    Entries belong to an owner and are only ever returned to that owner.
+    Vectors cover only the fact words, so rephrasing with different filler
+    scores 1.0. A close vector is not enough on its own: every number or
+    proper noun in either text must also appear in the other (key_facts()).
+    """
+
+    def __init__(
+        self,
+        dim: int = DEFAULT_DIM,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ngram: int = DEFAULT_NGRAM,
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ngram = ngram
+
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((max_entries, dim), dtype=np.float32)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._owners = np.zeros(max_entries, dtype=np.int32)
+        self._owner_ids = {}
+        self._texts = [None] * max_entries
+        self._facts = [None] * max_entries
+        self._keys = [None] * max_entries
+        self._values = [None] * max_entries
+        self._slots = {}
+        self._size = 0
+        self._counters = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0}
+
+    def __len__(self):
+        return self._size
+
+    def _owner_id(self, owner) -> int:
+        owner_id = self._owner_ids.get(owner)
+        if owner_id is None:
+            owner_id = self._owner_ids[owner] = len(self._owner_ids) + 1
+        return owner_id
+
+    def _same_key_facts(self, slot: int, facts: frozenset, keys: frozenset) -> bool:
+        return keys <= self._facts[slot] and self._keys[slot] <= facts
+
+    def lookup(self, text: str, owner: str = None):
+        """Return the value stored by this owner for the same idea (close vector, same key facts), else None"""
+        query = vectorize(text, self.dim, self.ngram)
+        facts, keys = fact_words(text), key_facts(text)
+        with self._lock:
+            owner_id = self._owner_ids.get(owner)
+            if owner_id is not None and self._size:
+                scores = self._matrix[:self._size] @ query
+                scores[self._owners[:self._size] != owner_id] = -1.0
+                candidates = np.flatnonzero(scores >= self.threshold)
+                for slot in candidates[np.argsort(-scores[candidates])]:
+                    slot = int(slot)
+                    if self._same_key_facts(slot, facts, keys):
+                        self._last_used[slot] = time.monotonic()
+                        self._counters["hits"] += 1
+                        return self._values[slot]
+            self._counters["misses"] += 1
+            return None
+
+    def add(self, text: str, value, owner: str = None):
+        """Index text with its value for an owner, evicting the least recently used entry when full"""
+        vector = vectorize(text, self.dim, self.ngram)
+        with self._lock:
+            owner_id = self._owner_id(owner)
+            key = (owner_id, normalize_text(text))
+            slot = self._slots.get(key)
+            if slot is None:
+                if self._size < self.max_entries:
+                    slot = self._size
+                    self._size += 1
+                else:
+                    slot = int(np.argmin(self._last_used))
+                    self._slots.pop((int(self._owners[slot]), normalize_text(self._texts[slot])), None)
+                    self._counters["evictions"] += 1
+                self._slots[key] = slot
+                self._counters["inserts"] += 1
+
+            self._matrix[slot] = vector
+            self._owners[slot] = owner_id
+            self._texts[slot] = text
+            self._facts[slot] = fact_words(text)
+            self._keys[slot] = key_facts(text)
+            self._values[slot] = value
+            self._last_used[slot] = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = self._size
+            counters["owners"] = len(self._owner_ids)
+            counters["max_entries"] = self.max_entries
+            counters["matrix_bytes"] = int(self._matrix.nbytes)
+        return counters
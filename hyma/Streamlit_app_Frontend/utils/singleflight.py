@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import json
+
+
+def request_key(url: str, payload: dict) -> str:
+    """Canonical identity of a request: same URL and same body means same answer"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{url}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Collapse identical concurrent calls into one upstream call.
+
+    The first caller for a key starts the work as a task; callers that arrive
+    while it is running wait on the same task and receive the same result or
+    exception. A waiter being cancelled does not cancel the shared task unless
+    it was the last one waiting. Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._counters = {"calls": 0, "upstream": 0, "collapsed": 0}
+
+    async def do(self, key: str, factory):
+        self._counters["calls"] += 1
+        call = self._calls.get(key)
+        if call is None:
+            call = {"task": asyncio.ensure_future(factory()), "waiters": 0}
+            self._calls[key] = call
+            call["task"].add_done_callback(lambda _task: self._forget(key, call))
+            self._counters["upstream"] += 1
+        else:
+            self._counters["collapsed"] += 1
+
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        finally:
+            call["waiters"] -= 1
+            if call["waiters"] == 0 and not call["task"].done():
+                call["task"].cancel()
+
+    def _forget(self, key: str, call: dict):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        counters = dict(self._counters)
+        counters["in_flight_keys"] = len(self._calls)
+        counters["collapse_rate"] = (
+            round(counters["collapsed"] / counters["calls"], 3) if counters["calls"] else 0.0
+        )
+        return counters
@@ -0,0 +1,419 @@
+import json
+import re
+import threading
+
+from utils.content_scorer import SCORE_KEYS
+
+# -------------------------------
+# SCHEMAS
+# -------------------------------
+# A small JSON Schema subset: type, properties, required, additionalProperties,
+# minProperties, minLength, minimum, maximum. "x-prune-invalid" drops
+# additionalProperties members that fail validation instead of failing the whole object.
+PROMPT_SCHEMA = {
+    "type": "object",
+    "required": ["title", "prompt"],
+    "properties": {
+        "title": {"type": "string", "minLength": 1},
+        "prompt": {"type": "string", "minLength": 1},
+    },
+}
+
+SCHEMAS = {
+    "prompts": {
+        "type": "object",
+        "minProperties": 1,
+        "additionalProperties": PROMPT_SCHEMA,
+        "x-prune-invalid": True,
+    },
+    "evaluation": {
+        "type": "object",
+        "required": SCORE_KEYS,
+        "properties": {key: {"type": "integer", "minimum": 0, "maximum": 100} for key in SCORE_KEYS},
+    },
+}
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+FENCE_RE = re.compile(r"```(?:json|JSON)?[ \t]*\n?(.*?)(?:```|$)", re.S)
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a reply cannot be turned into JSON that matches its schema"""
+
+
+# -------------------------------
+# TOLERANT EXTRACTION
+# -------------------------------
+def _string_end(text: str, start: int, quote: str) -> int:
+    i = start + 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == quote:
+            return i
+        i += 1
+    return len(text) - 1
+
+
+def _scan(text: str, start: int):
+    """
+    Walk a JSON-ish value from text[start]. Returns (end, None) when the
+    outermost container closes, or (None, stack) when the text runs out;
+    stack holds (opener, cut) per open container, cut being where its last
+    complete member ends.
+    """
+    stack = []
+    i = start
+    while i < len(text):
+        c = text[i]
+        if c in "\"'":
+            i = _string_end(text, i, c) + 1
+            continue
+        if c in "{[":
+            stack.append([c, i + 1])
+        elif c in "}]":
+            stack.pop()
+            if not stack:
+                return i, None
+        elif c == "," and stack:
+            stack[-1][1] = i
+        i += 1
+    return None, stack
+
+
+def _close_truncated(text: str, stack: list) -> str:
+    """Drop the member being written when the text ran out, then close every open container"""
+    closers = "".join("}" if opener == "{" else "]" for opener, _ in reversed(stack))
+    return text[:stack[-1][1]] + closers
+
+
+def _normalize(text: str):
+    """Single quotes, Python literals, unquoted keys and trailing commas, outside of strings"""
+    out = []
+    repairs = set()
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            end = _string_end(text, i, '"')
+            out.append(text[i:end + 1])
+            i = end + 1
+        elif c == "'":
+            end = _string_end(text, i, "'")
+            inner = text[i + 1:end].replace("\\'", "'").replace('"', '\\"')
+            out.append(f'"{inner}"')
+            repairs.add("single_quotes")
+            i = end + 1
+        elif c == ",":
+            ahead = i + 1
+            while ahead < len(text) and text[ahead].isspace():
+                ahead += 1
+            if ahead < len(text) and text[ahead] in "}]":
+                repairs.add("trailing_comma")
+            else:
+                out.append(c)
+            i += 1
+        elif c.isalpha() or c == "_":
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[i:end]
+            ahead = end
+            while ahead < len(text) and text[ahead].isspace():
+                ahead += 1
+            if ahead < len(text) and text[ahead] == ":":
+                out.append(json.dumps(word))
+                repairs.add("unquoted_keys")
+            elif word in PYTHON_LITERALS:
+                out.append(PYTHON_LITERALS[word])
+                repairs.add("python_literals")
+            else:
+                out.append(word)
+            i = end
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out), sorted(repairs)
+
+
+def extract_json(text: str):
+    """
+    Pull the first JSON object or array out of a model reply. Tolerates code
+    fences, prose before and after, single quotes, Python literals, unquoted
+    keys, trailing commas and truncation. Returns (value, repairs).
+    """
+    repairs = []
+    body = text or ""
+    fence = FENCE_RE.search(body)
+    if fence:
+        body = fence.group(1)
+        repairs.append("fence")
+
+    starts = [i for i in (body.find("{"), body.find("[")) if i != -1]
+    if not starts:
+        raise StructuredOutputError("no JSON object in the reply")
+    start = min(starts)
+    if body[:start].strip():
+        repairs.append("leading_prose")
+
+    end, stack = _scan(body, start)
+    if end is None:
+        candidate = _close_truncated(body[start:], [[opener, cut - start] for opener, cut in stack])
+        repairs.append("truncated")
+    else:
+        candidate = body[start:end + 1]
+        if body[end + 1:].strip():
+            repairs.append("trailing_prose")
+
+    try:
+        return json.loads(candidate), repairs
+    except ValueError:
+        pass
+    normalized, fixes = _normalize(candidate)
+    try:
+        return json.loads(normalized), repairs + fixes
+    except ValueError as e:
+        raise StructuredOutputError(f"invalid JSON: {e}")
+
+
+class MemberStream:
+    """
+    Incremental parser for a streamed JSON object. feed() takes text deltas
+    and returns the top-level (key, value) members that completed in them,
+    so each can be used before the rest of the object has arrived. Anything
+    before the first "{" (prose, a code fence) is skipped.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._quote = None
+        self._escape = False
+        self._member_start = None
+        self._emitted = False
+        self.closed = False
+
+    def _member(self, end: int):
+        start, self._member_start = self._member_start, None
+        if self._emitted:
+            return None
+        self._emitted = True
+        try:
+            value, _ = extract_json("{" + self._text[start:end] + "}")
+        except StructuredOutputError:
+            return None
+        return next(iter(value.items()), None) if isinstance(value, dict) else None
+
+    def feed(self, chunk: str) -> list:
+        self._text += chunk
+        members = []
+        while self._pos < len(self._text) and not self.closed:
+            i, c = self._pos, self._text[self._pos]
+            self._pos += 1
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == self._quote:
+                    self._quote = None
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+                    self._emitted = False
+                continue
+            if c in "\"'":
+                self._quote = c
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.closed = True
+                    member = self._member(i)
+                elif self._depth == 1:
+                    # A nested value just closed; its member is complete
+                    member = self._member(i + 1)
+                    self._member_start = i + 1
+                    self._emitted = True
+                else:
+                    continue
+                if member:
+                    members.append(member)
+            elif c == "," and self._depth == 1:
+                member = self._member(i)
+                if member:
+                    members.append(member)
+                self._member_start = i + 1
+                self._emitted = False
+        return members
+
+
+# -------------------------------
+# SCHEMA VALIDATION
+# -------------------------------
+def conform(value, schema: dict, path: str = "$"):
+    """
+    Validate value against schema, coercing numeric strings and whole floats
+    to integers. Returns (value, errors, repairs).
+    """
+    errors, repairs = [], []
+    kind = schema.get("type")
+
+    if kind == "object":
+        if not isinstance(value, dict):
+            return value, [f"{path} should be an object"], repairs
+        properties = schema.get("properties", {})
+        extra = schema.get("additionalProperties")
+        result = {}
+        for key, item in value.items():
+            member = properties.get(key, extra if isinstance(extra, dict) else None)
+            if member is None:
+                result[key] = item
+                continue
+            item, item_errors, item_repairs = conform(item, member, f"{path}.{key}")
+            if item_errors and key not in properties and schema.get("x-prune-invalid"):
+                repairs.append("dropped_invalid")
+                continue
+            errors += item_errors
+            repairs += item_repairs
+            result[key] = item
+        for key in schema.get("required", []):
+            if key not in result:
+                errors.append(f"{path}.{key} is missing")
+        if len(result) < schema.get("minProperties", 0):
+            errors.append(f"{path} should have at least {schema['minProperties']} entries")
+        return result, errors, repairs
+
+    if kind in ("integer", "number"):
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().rstrip("%"))
+                repairs.append("coerced")
+            except ValueError:
+                return value, [f"{path} should be a number"], repairs
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value, [f"{path} should be a number"], repairs
+        if kind == "integer" and not isinstance(value, int):
+            if value != int(value):
+                repairs.append("coerced")
+            value = int(round(value))
+        if "minimum" in schema and value < schema["minimum"]:
+            errors.append(f"{path} should be at least {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            errors.append(f"{path} should be at most {schema['maximum']}")
+        return value, errors, repairs
+
+    if kind == "string":
+        if not isinstance(value, str):
+            return value, [f"{path} should be a string"], repairs
+        if len(value.strip()) < schema.get("minLength", 0):
+            errors.append(f"{path} should not be empty")
+        return value, errors, repairs
+
+    return value, errors, repairs
+
+
+# -------------------------------
+# PARSE, REPAIR, RE-ASK
+# -------------------------------
+class StructuredOutput:
+    """
+    Per-call-site structured replies: tolerant extraction and local repair
+    first, then at most one targeted re-ask. Keeps counters per call site
+    so parse-failure and repair rates can be watched.
+    """
+
+    def __init__(self, schemas: dict = None):
+        self.schemas = schemas or SCHEMAS
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._repairs = {}
+
+    def _count(self, site: str, outcome: str, repairs: list = ()):
+        with self._lock:
+            counters = self._counters.setdefault(
+                site, {"calls": 0, "clean": 0, "repaired": 0, "reasked": 0, "reask_recovered": 0, "failed": 0}
+            )
+            counters[outcome] += 1
+            kinds = self._repairs.setdefault(site, {})
+            for repair in repairs:
+                kinds[repair] = kinds.get(repair, 0) + 1
+
+    def parse(self, site: str, text: str):
+        """Value matching the site's schema plus the repairs it needed; raises StructuredOutputError"""
+        value, repairs = extract_json(text)
+        value, errors, more = conform(value, self.schemas[site])
+        if errors:
+            raise StructuredOutputError("; ".join(errors[:5]))
+        return value, repairs + more
+
+    def reask_prompt(self, site: str, text: str, error: Exception) -> str:
+        return f"""Your previous reply could not be used: {error}.
+Reply again with only a JSON object matching this JSON schema, no other text:
+{json.dumps(self.schemas[site])}
+
+Previous reply:
+{(text or "")[:1500]}"""
+
+    def resolve(self, site: str, text: str, reask=None):
+        """
+        Returns (value, outcome) with outcome one of clean, repaired, reasked
+        or failed. reask(prompt) -> reply text is called at most once.
+        """
+        self._count(site, "calls")
+        try:
+            value, repairs = self.parse(site, text)
+            outcome = "repaired" if repairs else "clean"
+            self._count(site, outcome, repairs)
+            return value, outcome
+        except StructuredOutputError as e:
+            error = e
+        if reask is None:
+            self._count(site, "failed")
+            return None, "failed"
+        self._count(site, "reasked")
+        retry_text = reask(self.reask_prompt(site, text, error))
+        if retry_text:
+            try:
+                value, repairs = self.parse(site, retry_text)
+                self._count(site, "reask_recovered", repairs)
+                return value, "reasked"
+            except StructuredOutputError:
+                pass
+        self._count(site, "failed")
+        return None, "failed"
+
+    def members(self, site: str, chunks):
+        """
+        Yield (key, value) for each top-level member of a streamed reply as
+        soon as it completes and matches the site's schema. Members that do
+        not match are skipped here; resolve() on the full text decides.
+        """
+        schema = self.schemas[site]
+        parser = MemberStream()
+        for chunk in chunks:
+            for key, value in parser.feed(chunk):
+                member = schema.get("properties", {}).get(key, schema.get("additionalProperties"))
+                if isinstance(member, dict):
+                    value, errors, _ = conform(value, member)
+                    if errors:
+                        continue
+                yield key, value
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for site, counters in self._counters.items():
+                calls = counters["calls"]
+                stats[site] = {
+                    **counters,
+                    "parse_failure_rate": round((calls - counters["clean"] - counters["repaired"]) / calls, 3) if calls else 0.0,
+                    "repair_rate": round(counters["repaired"] / calls, 3) if calls else 0.0,
+                    "repairs": dict(self._repairs.get(site, {})),
+                }
+            return stats
@@ -0,0 +1,324 @@
+import atexit
+import contextvars
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# -------------------------------
+# DEFAULTS
+# -------------------------------
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_BUFFER = 10000
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+
+COLUMNS = (
+    "ts", "site", "model", "user", "content_type", "status", "reason",
+    "cache_hit", "input_tokens", "output_tokens", "latency_ms", "cost",
+)
+ROLLUP_KEYS = ("user", "content_type", "site", "model", "status")
+FILTER_KEYS = ROLLUP_KEYS + ("cache_hit",)
+PERCENTILE_FIELDS = ("latency_ms", "input_tokens", "output_tokens", "cost")
+
+# Who and what a call is for. Set around a unit of work with tagged(); read
+# when the call is recorded, so the router does not need to know about users.
+CALL_TAGS = contextvars.ContextVar("call_tags", default={})
+
+
+@contextmanager
+def tagged(**tags):
+    """Attribute every call recorded inside the block to these tags (user, content_type)"""
+    token = CALL_TAGS.set({**CALL_TAGS.get(), **{k: v for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        CALL_TAGS.reset(token)
+
+
+def _where(since: float = None, filters: dict = None):
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("ts >= ?")
+        params.append(since)
+    for key, value in (filters or {}).items():
+        if key not in FILTER_KEYS:
+            raise ValueError(f"cannot filter calls by {key!r}")
+        clauses.append(f"{key} = ?")
+        params.append(int(value) if key == "cache_hit" else value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class TelemetryWriter:
+    """
+    Per-call telemetry (call site, model, user, content type, tokens,
+    latency, status, cache hit, cost) kept in one narrow SQLite table.
+
+    record() only appends a tuple to an in-memory buffer; a background thread
+    writes the buffer out in batches every flush_interval seconds, or sooner
+    once batch_size records are waiting. If the writer falls behind, the
+    oldest unwritten records are dropped (and counted) rather than letting
+    the buffer grow without bound.
+
+    The same thread also snapshots the stats() of every component passed to
+    watch() every snapshot_interval seconds, one JSON row per component in
+    the stats table, so pool hit rates, limiter limits, cache hit rates and
+    parse failure rates can be followed over time next to the calls.
+    """
+
+    def __init__(
+        self,
+        path: str = "telemetry.db",
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_buffer: int = DEFAULT_MAX_BUFFER,
+        snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._buffer = deque(maxlen=max_buffer)
+        self._wake = threading.Event()
+        self._closed = False
+        self._sources = {}
+        self._last_snapshot = time.monotonic()
+        self._counters = {
+            "recorded": 0, "written": 0, "dropped": 0, "flushes": 0, "write_errors": 0,
+            "snapshots": 0, "snapshot_errors": 0,
+        }
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS calls (
+                ts REAL NOT NULL,
+                site TEXT NOT NULL,
+                model TEXT,
+                user TEXT,
+                content_type TEXT,
+                status TEXT NOT NULL,
+                reason TEXT,
+                cache_hit INTEGER NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                latency_ms INTEGER NOT NULL,
+                cost REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_calls_ts ON calls (ts)")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stats (
+                ts REAL NOT NULL,
+                source TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_stats_source_ts ON stats (source, ts)")
+        self._db.commit()
+
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)  # Keep the last partial batch on shutdown
+
+    # -------------------------------
+    # RECORDING
+    # -------------------------------
+    def record(
+        self,
+        site: str,
+        model: str = None,
+        status="200",
+        latency: float = 0.0,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cost: float = 0.0,
+        cache_hit: bool = False,
+        reason: str = None,
+        user: str = None,
+        content_type: str = None,
+    ):
+        """Buffer one call; user and content_type default to the current tagged() values"""
+        tags = CALL_TAGS.get()
+        row = (
+            time.time(), site, model,
+            user or tags.get("user"), content_type or tags.get("content_type"),
+            str(status), reason, int(bool(cache_hit)),
+            int(input_tokens or 0), int(output_tokens or 0), int(round(latency * 1000)), float(cost or 0.0),
+        )
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._counters["dropped"] += 1
+            self._buffer.append(row)
+            self._counters["recorded"] += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def record_call(self, call: dict):
+        """Sink for ModelRouter: one of its call records"""
+        self.record(
+            call["site"], call["model"], call["status"], call["latency"],
+            call["input_tokens"], call["output_tokens"], call["cost"], reason=call["reason"],
+        )
+
+    def flush(self):
+        with self._lock:
+            rows = list(self._buffer)
+            self._buffer.clear()
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        try:
+            with self._db_lock:
+                self._db.executemany(f"INSERT INTO calls ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows)
+                self._db.commit()
+        except sqlite3.Error:
+            with self._lock:
+                self._counters["write_errors"] += 1
+                self._counters["dropped"] += len(rows)
+            return
+        with self._lock:
+            self._counters["written"] += len(rows)
+            self._counters["flushes"] += 1
+
+    def close(self):
+        atexit.unregister(self.flush)
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+                self.snapshot()
+
+    # -------------------------------
+    # COMPONENT STATS
+    # -------------------------------
+    def watch(self, source: str, stats):
+        """Snapshot stats() (any callable returning a JSON-able dict) under this name"""
+        with self._lock:
+            self._sources[source] = stats
+
+    def snapshot(self):
+        """Write one stats row per watched component now"""
+        self._last_snapshot = time.monotonic()
+        with self._lock:
+            sources = list(self._sources.items())
+        now, rows = time.time(), []
+        for source, stats in sources:
+            try:
+                rows.append((now, source, json.dumps(stats(), default=str)))
+            except Exception:
+                # One broken component must not stop the others being recorded
+                with self._lock:
+                    self._counters["snapshot_errors"] += 1
+        if not rows:
+            return
+        try:
+            with self._db_lock:
+                self._db.executemany("INSERT INTO stats (ts, source, data) VALUES (?, ?, ?)", rows)
+                self._db.commit()
+        except sqlite3.Error:
+            with self._lock:
+                self._counters["snapshot_errors"] += 1
+            return
+        with self._lock:
+            self._counters["snapshots"] += len(rows)
+
+    # -------------------------------
+    # QUERIES
+    # -------------------------------
+    def _query(self, sql: str, params: list) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def percentiles(self, field: str = "latency_ms", qs=(50, 95, 99), since: float = None, **filters) -> dict:
+        """
+        Nearest-rank percentiles of a field over the written calls, e.g.
+        percentiles(site="generation", cache_hit=False, since=time.time() - 3600).
+        """
+        if field not in PERCENTILE_FIELDS:
+            raise ValueError(f"no percentiles for {field!r}")
+        where, params = _where(since, filters)
+        count = self._query(f"SELECT COUNT(*) FROM calls{where}", params)[0][0]
+        result = {"count": count}
+        for q in qs:
+            if not count:
+                result[f"p{q}"] = None
+                continue
+            offset = min(count - 1, max(0, math.ceil(q / 100 * count) - 1))
+            result[f"p{q}"] = self._query(
+                f"SELECT {field} FROM calls{where} ORDER BY {field} LIMIT 1 OFFSET ?", params + [offset]
+            )[0][0]
+        return result
+
+    def latest_stats(self) -> dict:
+        """The most recent snapshot of each watched component, with its ts"""
+        rows = self._query(
+            """
+            SELECT source, ts, data FROM stats
+            WHERE ts = (SELECT MAX(ts) FROM stats AS latest WHERE latest.source = stats.source)
+            """,
+            [],
+        )
+        return {source: {"ts": ts, **json.loads(data)} for source, ts, data in rows}
+
+    def stats_history(self, source: str, since: float = None) -> list:
+        """Every snapshot of one component, oldest first, e.g. to chart a hit rate"""
+        where, params = " WHERE source = ?", [source]
+        if since is not None:
+            where += " AND ts >= ?"
+            params.append(since)
+        rows = self._query(f"SELECT ts, data FROM stats{where} ORDER BY ts", params)
+        return [{"ts": ts, **json.loads(data)} for ts, data in rows]
+
+    def rollup(self, by: str = "user", since: float = None, **filters) -> list:
+        """Totals per user, content_type, site, model or status, most expensive first"""
+        if by not in ROLLUP_KEYS:
+            raise ValueError(f"cannot roll calls up by {by!r}")
+        where, params = _where(since, filters)
+        rows = self._query(
+            f"""
+            SELECT {by}, COUNT(*), SUM(status != '200'), SUM(cache_hit),
+                   SUM(input_tokens), SUM(output_tokens), SUM(cost), AVG(latency_ms)
+            FROM calls{where}
+            GROUP BY {by}
+            ORDER BY SUM(cost) DESC, COUNT(*) DESC
+            """,
+            params,
+        )
+        return [
+            {
+                by: key,
+                "calls": calls,
+                "errors": errors,
+                "cache_hits": cache_hits,
+                "cache_hit_rate": round(cache_hits / calls, 3),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost": round(cost, 6),
+                "mean_latency_ms": round(latency, 1),
+            }
+            for key, calls, errors, cache_hits, input_tokens, output_tokens, cost, latency in rows
+        ]
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "buffered": len(self._buffer)}
@@ -0,0 +1,196 @@
+import math
+import re
+import threading
+
+# -------------------------------
+# TOKEN ESTIMATION
+# -------------------------------
+WORD_RE = re.compile(r"\S+")
+PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Rough tokens per word by content type before any history has been seen;
+# hashtags, emoji and short lines cost more tokens per word
+DEFAULT_TOKENS_PER_WORD = 1.35
+CONTENT_TYPE_TOKENS_PER_WORD = {
+    "LinkedIn Post": 1.45,
+    "Email": 1.3,
+    "Blog Post": 1.35,
+    "Tweet Thread": 1.6,
+    "Instagram Caption": 1.75,
+}
+
+# Models overshoot or undershoot the requested word count; learned per content type
+DEFAULT_LENGTH_RATIO = 1.1
+HEADROOM = 1.2
+MIN_TOKENS = 120
+MAX_TOKENS = 4096
+PRIOR_WEIGHT = 5
+
+# A reply that ends like this finished on its own
+COMPLETE_ENDING_RE = re.compile(r"""([.!?…)\]"'”’*]|#\w+|[\U0001F300-\U0001FAFF☀-➿]️?)\s*$""")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate: letter runs count one token per ~4 characters,
+    digit runs one per ~3, and each punctuation mark or emoji one.
+    """
+    tokens = 0
+    for piece in PIECE_RE.findall(text or ""):
+        if piece.isalpha():
+            tokens += max(1, round(len(piece) / 4))
+        elif piece.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def count_words(text: str) -> int:
+    return len(WORD_RE.findall(text or ""))
+
+
+def looks_truncated(text: str) -> bool:
+    """Text shape check for when no stop reason is available"""
+    text = (text or "").rstrip()
+    return bool(text) and not COMPLETE_ENDING_RE.search(text)
+
+
+def continuation_prompt(prompt: str, partial: str) -> str:
+    """The original prompt plus the partial text; a templated Prompt keeps its cacheable prefix"""
+    request = f"""
+
+The text below was cut off before it was finished. Continue it from exactly where it stops.
+Do not repeat any of it, do not add a preamble, and bring it to a natural close.
+
+Text so far:
+{partial}"""
+    return prompt.extend(request) if hasattr(prompt, "extend") else prompt + request
+
+
+def stitch(partial: str, continuation: str, max_overlap: int = 30) -> str:
+    """Join a continuation onto the partial text, dropping words it repeats from the partial's tail"""
+    head = partial.rstrip()
+    tail = continuation.strip()
+    head_words = head.split()
+    tail_words = tail.split()
+    for size in range(min(max_overlap, len(head_words), len(tail_words)), 0, -1):
+        if head_words[-size:] == tail_words[:size]:
+            tail = tail.split(None, size)[size] if len(tail_words) > size else ""
+            break
+    if not tail:
+        return head
+    # A continuation that starts mid-word or with punctuation is glued on directly
+    joiner = "" if head.endswith(("-", "\n")) or tail[0] in ",.;:!?)'’" else " "
+    return head + joiner + tail
+
+
+# -------------------------------
+# BUDGET PLANNER
+# -------------------------------
+class TokenBudgetPlanner:
+    """
+    Picks maxTokens for a generation from the requested word count and two
+    ratios learned per content type: tokens per word and words written per
+    word requested. Ratios start from built-in priors and move towards the
+    observed averages as history and finished generations are fed in.
+
+    Also counts, per content type, how often generations were truncated and
+    how many continuation calls were made to finish them.
+    """
+
+    def __init__(self, headroom: float = HEADROOM, min_tokens: int = MIN_TOKENS, max_tokens: int = MAX_TOKENS):
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._ratios = {}
+        self._counters = {}
+
+    def _ratio(self, content_type: str) -> dict:
+        ratio = self._ratios.get(content_type)
+        if ratio is None:
+            ratio = {
+                "tokens_per_word": CONTENT_TYPE_TOKENS_PER_WORD.get(content_type, DEFAULT_TOKENS_PER_WORD),
+                "length_ratio": DEFAULT_LENGTH_RATIO,
+                "samples": 0,
+            }
+            self._ratios[content_type] = ratio
+        return ratio
+
+    def _counter(self, content_type: str) -> dict:
+        return self._counters.setdefault(
+            content_type, {"generations": 0, "truncated": 0, "continuations": 0, "unfinished": 0}
+        )
+
+    # -------------------------------
+    # LEARNING
+    # -------------------------------
+    def observe(self, content_type: str, word_limit: int, content: str, output_tokens: int = None):
+        """
+        Learn from one finished piece of content. output_tokens, when the API
+        reported it, is used instead of the local estimate.
+        """
+        words = count_words(content)
+        if not words or not word_limit:
+            return
+        tokens = output_tokens or estimate_tokens(content)
+        with self._lock:
+            ratio = self._ratio(content_type)
+            weight = 1 / (PRIOR_WEIGHT + ratio["samples"] + 1)
+            ratio["tokens_per_word"] += weight * (tokens / words - ratio["tokens_per_word"])
+            ratio["length_ratio"] += weight * (words / word_limit - ratio["length_ratio"])
+            ratio["samples"] += 1
+
+    def learn(self, rows):
+        """Seed the ratios from stored history: an iterable of (content_type, word_limit, content)"""
+        for content_type, word_limit, content in rows:
+            if content_type and content:
+                self.observe(content_type, word_limit, content)
+
+    # -------------------------------
+    # PLANNING
+    # -------------------------------
+    def plan(self, content_type: str, word_limit: int) -> int:
+        """maxTokens for a piece of about word_limit words"""
+        with self._lock:
+            ratio = self._ratio(content_type)
+            tokens = word_limit * max(ratio["length_ratio"], 1.0) * ratio["tokens_per_word"] * self.headroom
+        return int(min(self.max_tokens, max(self.min_tokens, tokens)))
+
+    def plan_continuation(self, content_type: str, word_limit: int, partial: str) -> int:
+        """maxTokens for finishing partial; never less than a short closing paragraph"""
+        remaining = max(word_limit - count_words(partial), word_limit // 4)
+        return self.plan(content_type, remaining)
+
+    def is_truncated(self, text: str, stop_reason: str = None) -> bool:
+        if stop_reason:
+            return stop_reason == "max_tokens"
+        return looks_truncated(text)
+
+    def record(self, content_type: str, truncated: bool, continuations: int = 0, finished: bool = True):
+        with self._lock:
+            counter = self._counter(content_type)
+            counter["generations"] += 1
+            counter["truncated"] += 1 if truncated else 0
+            counter["continuations"] += continuations
+            counter["unfinished"] += 0 if finished else 1
+
+    # -------------------------------
+    # STATS
+    # -------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for content_type in sorted(set(self._ratios) | set(self._counters)):
+                ratio = self._ratio(content_type)
+                counter = dict(self._counter(content_type))
+                generations = counter["generations"]
+                stats[content_type] = {
+                    **counter,
+                    "truncation_rate": round(counter["truncated"] / generations, 3) if generations else 0.0,
+                    "tokens_per_word": round(ratio["tokens_per_word"], 3),
+                    "length_ratio": round(ratio["length_ratio"], 3),
+                    "samples": ratio["samples"],
+                }
+            return stats